@@ -12,17 +12,23 @@ __all__ = ['Cli']
 
 ####################################################################################################
 
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path, PurePosixPath
 from pprint import pprint
-from typing import Iterable
+from typing import Iterable, TextIO
 
 # import logging
-import difflib
+import csv
 import html
 import inspect
+import json
 import os
 import re
 import subprocess
+import sys
+import threading
+import time
 import traceback
 
 # See also [cmd — Support for line-oriented command interpreters — Python documentation](https://docs.python.org/3/library/cmd.html)
@@ -37,8 +43,11 @@ from prompt_toolkit.shortcuts import ProgressBar
 
 from .WikiJsApi import WikiJsApi, ApiError, Node, Page
 from . import config
+from .catalogue import PageCatalogue
+from . import bulk
+from .diff import ContentCache, diff_directory, unified_diff
 from . import sync
-from .printer import STYLE, printc, CommandError
+from .printer import STYLE, batch, printc, CommandError
 from .unicode import usorted
 
 ####################################################################################################
@@ -58,6 +67,68 @@ type Tag = str   # aka Path
 
 ####################################################################################################
 
+def batched(func):
+    """Print the output of a listing command in bulk, see :func:`printer.batch`"""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with batch(pager=self._pager):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+####################################################################################################
+
+class CompletionCache:
+
+    """LRU cache of the completions per context and prefix
+
+    The completions of a prefix are filtered from the ones of a shorter prefix, so typing narrows the
+    completions without computing the words again.
+    """
+
+    ##############################################
+
+    def __init__(self, size: int, timeout: float) -> None:
+        self._size = int(size)
+        self._timeout = float(timeout)
+        self._cache = OrderedDict()   # (context, prefix) -> (time, words)
+        self._lock = threading.Lock()
+
+    ##############################################
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def get(self, context: tuple, prefix: str) -> list[str] | None:
+        now = time.monotonic()
+        with self._lock:
+            # longest cached prefix
+            for i in range(len(prefix), -1, -1):
+                key = (context, prefix[:i])
+                _ = self._cache.get(key)
+                if _ is not None:
+                    if now - _[0] > self._timeout:
+                        del self._cache[key]
+                        continue
+                    self._cache.move_to_end(key)
+                    words = _[1]
+                    break
+            else:
+                return None
+        if i < len(prefix):
+            words = [_ for _ in words if _.startswith(prefix)]
+            self.put(context, prefix, words)
+        return words
+
+    def put(self, context: tuple, prefix: str, words: list[str]) -> None:
+        with self._lock:
+            self._cache[(context, prefix)] = (time.monotonic(), words)
+            self._cache.move_to_end((context, prefix))
+            while len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+
+####################################################################################################
+
 class CustomCompleter(Completer):
 
     """
@@ -77,8 +148,15 @@ class CustomCompleter(Completer):
     :param pattern: Optional compiled regex for finding the word before
         the cursor to complete. When given, use this regex pattern instead of
         default one (see document._FIND_WORD_RE)
+
+    The completions run in a thread, see ``complete_in_thread`` in :meth:`Cli.cli`, since the
+    tags are fetched on the network and the folders are sorted with ICU.
     """
 
+    CACHE_SIZE = 256   # contexts and prefixes
+    CACHE_TIMEOUT = 30   # s
+    TAGS_TIMEOUT = 2   # s, don't hold the prompt on a slow server
+
     ##############################################
 
     def __init__(self, cli, commands: list[str]) -> Node:
@@ -92,6 +170,12 @@ class CustomCompleter(Completer):
         self.sentence = False
         self.match_middle = False
         self.pattern = None
+        self._cache = CompletionCache(self.CACHE_SIZE, self.CACHE_TIMEOUT)
+
+    ##############################################
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
 
     ##############################################
 
@@ -113,18 +197,43 @@ class CustomCompleter(Completer):
             words: list[str],
             separator: str,
             get_word_before_cursor,
+            context: tuple = None,
     ) -> Iterable[Completion]:
+        # `words` can be a callable, called when the completions are not cached for `context`
         word_before_cursor = get_word_before_cursor(document, separator)
 
         def word_matches(word: str) -> bool:
             return word.startswith(word_before_cursor)
 
-        for _ in words:
-            if word_matches(_):
-                yield Completion(
-                    text=_,
-                    start_position=-len(word_before_cursor),
-                )
+        def completion(word: str) -> Completion:
+            return Completion(
+                text=word,
+                start_position=-len(word_before_cursor),
+            )
+
+        matches = None
+        if context is not None:
+            matches = self._cache.get(context, word_before_cursor)
+        if matches is not None:
+            for _ in matches:
+                yield completion(_)
+            return
+
+        # the completions are shown as they are found, then cached if the iteration was completed
+        if callable(words):
+            words = words()
+        matches = []
+        try:
+            for _ in words:
+                if word_matches(_):
+                    matches.append(_)
+                    yield completion(_)
+        except OSError:
+            # requests.RequestException, e.g. the tags request timed out
+            return
+        # a partial tree is not cached
+        if context is not None and not self._cli._is_loading():
+            self._cache.put(context, word_before_cursor, matches)
 
     ##############################################
 
@@ -161,6 +270,7 @@ class CustomCompleter(Completer):
 
         separator = ' '
         get_word_before_cursor = self._get_word_before_cursor1
+        context = None
 
         def handle_cd(root_path, current_path, right_word, folder: bool):
             if '/' in right_word:
@@ -169,11 +279,13 @@ class CustomCompleter(Completer):
             if right_word.startswith('/'):
                 current_path = root_path
             cwd = current_path.find(right_word)
+            nonlocal context
+            context = (cwd, folder)
             if folder:
-                return cwd.folder_names
+                return lambda: cwd.folder_names
             else:
                 # return cwd.leaf_names
-                return cwd.leaf_names + cwd.folder_names
+                return lambda: cwd.leaf_names + cwd.folder_names
 
         if command is None:
             # case "du" -> "dump"
@@ -194,8 +306,8 @@ class CustomCompleter(Completer):
                     # match command:
                     #     case 'create' | 'update':
                     cwd = Path().cwd()
-                    filenames = sorted(cwd.glob('*.md'))
-                    words = [_.name for _ in filenames]
+                    context = ('FilePath', cwd)
+                    words = lambda: [_.name for _ in sorted(cwd.glob('*.md'))]
                 case 'PagePath':
                     words = handle_cd(self._cli._page_tree, self._cli._current_path, right_word, folder=False)
                 case 'PageFolder':
@@ -205,13 +317,17 @@ class CustomCompleter(Completer):
                 case 'Tag':
                     # Fixme: 'list[Tag]' type is list
                     # Fixme: tag can have space !
-                    words = [_.tag for _ in self._cli._api.tags()]
-        yield from self._get_completions(document, complete_event, words, separator, get_word_before_cursor)
+                    context = ('Tag',)
+                    words = lambda: (_.tag for _ in self._cli._api.tags(timeout=self.TAGS_TIMEOUT))
+        yield from self._get_completions(document, complete_event, words, separator, get_word_before_cursor, context)
 
 ####################################################################################################
 
 class Cli:
 
+    # text is the styled output, the others are streamed records for the scripts, see _emit
+    FORMATS = ('text', 'ndjson', 'csv')
+
     ##############################################
 
     @staticmethod
@@ -235,8 +351,15 @@ class Cli:
 
     ############################################################################
 
-    def __init__(self, api: WikiJsApi) -> None:
+    def __init__(self, api: WikiJsApi, output_format: str = 'text') -> None:
         self._api = api
+        if output_format not in self.FORMATS:
+            raise ValueError(f'Invalid format {output_format}')
+        self._format = output_format
+        self._csv_writer = None
+        # set by the daemon to send the output of a command to its client
+        self._stdout = None
+        self._sink = None
         self.COMMANDS = [
             _
             for _ in dir(self)
@@ -249,6 +372,15 @@ class Cli:
         self._current_path = None
         self._asset_tree = None
         self._current_asset_folder = None
+        # set when the trees loaded in background are complete, see _start_loading
+        self._loaded = None
+        self._loading_error = None
+        self._catalogue = PageCatalogue(api)
+        self._catalogue_changed = False
+        self._content_cache = ContentCache()
+        # number of failed commands, see daemon.run_command
+        self._errors = 0
+        self._pager = False
 
     ##############################################
 
@@ -263,18 +395,28 @@ class Cli:
             if command == 'quit':
                 return False
             method = getattr(self, command)
+            # a CSV header per command
+            self._csv_writer = None
             try:
                 method(*argument)
             except KeyboardInterrupt:
+                self._errors += 1
                 self.print(f"{LINESEP}<red>Interrupted</red>")
             except ApiError as e:
+                self._errors += 1
                 self.print(f'API error: <red>{e}</red>')
             except CommandError as e:
+                self._errors += 1
                 self.print(e)
+            except BrokenPipeError:
+                # the reader of the output has gone, e.g. head
+                raise
             except Exception as e:
-                print(traceback.format_exc())
-                print(e)
+                self._errors += 1
+                print(traceback.format_exc(), file=self._output)
+                print(e, file=self._output)
         except AttributeError:
+            self._errors += 1
             self.print(f"<red>Invalid command</red> <blue>{query}</blue>")
             self.usage()
         return True
@@ -283,17 +425,20 @@ class Cli:
 
     def run(self, query: str) -> bool:
         commands = filter(bool, [_.strip() for _ in query.split(';')])
-        for _ in commands:
-            if not self._run_line(_):
-                return False
-        return True
+        try:
+            for _ in commands:
+                if not self._run_line(_):
+                    return False
+            return True
+        finally:
+            # a command can change the pages, the tags or the files
+            self._completer.clear_cache()
 
     ##############################################
 
     def cli(self, query: str) -> None:
-        self.print("<red>Build tree...</red>")
-        self._init()
-        self.print("<red>Done</red>")
+        # the prompt is usable while the trees are loaded
+        self._start_loading()
 
         if query:
             if not self.run(query):
@@ -302,6 +447,8 @@ class Cli:
         history = FileHistory(config.CLI_HISTORY_PATH)
         session = PromptSession(
             completer=self._completer,
+            # the completions stream from a thread, the stale ones are cancelled on input
+            complete_in_thread=True,
             history=history,
         )
         self.usage()
@@ -327,8 +474,43 @@ class Cli:
 
     ##############################################
 
+    @property
+    def _output(self) -> TextIO:
+        return self._stdout or sys.stdout
+
     def print(self, message: str = '') -> None:
-        printc(message)
+        if self._sink is not None:
+            self._sink(str(message))
+        else:
+            printc(message)
+
+    def _emit(self, record: dict | None, markup: str = None) -> None:
+        """Print the markup of a listing, or write the record in NDJSON or CSV
+
+        A record is written at once on stdout, without markup or escaping.  The list values are
+        joined by a space in CSV.
+        """
+        match self._format:
+            case 'text':
+                if markup is not None:
+                    self.print(markup)
+            case 'ndjson':
+                if record is not None:
+                    self._output.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            case 'csv':
+                if record is not None:
+                    if self._csv_writer is None:
+                        self._csv_writer = csv.DictWriter(self._output, fieldnames=list(record), lineterminator='\n')
+                        self._csv_writer.writeheader()
+                    self._csv_writer.writerow({
+                        key: ' '.join(map(str, value)) if isinstance(value, (list, tuple)) else value
+                        for key, value in record.items()
+                    })
+
+    @property
+    def _sorted(self) -> bool:
+        # the records are streamed in the API order
+        return self._format == 'text'
 
     ##############################################
 
@@ -343,6 +525,15 @@ class Cli:
         """Clear the console"""
         shortcuts.clear()
 
+    def pager(self, enabled: bool = None) -> None:
+        """Toggle the pager for the listings"""
+        if enabled is None:
+            self._pager = not self._pager
+        else:
+            self._pager = self._to_bool(enabled)
+        _ = 'on' if self._pager else 'off'
+        self.print(f"<blue>Pager</blue> <green>{_}</green>")
+
     ############################################################################
     #
     # Help
@@ -403,17 +594,84 @@ class Cli:
 
     def reset(self) -> None:
         """Reset page and folder tree"""
+        if self._loaded is not None:
+            # don't build the trees twice at the same time
+            self._loaded.wait()
+            self._loaded = None
         # Fixme: can be slow
-        self._page_tree = self._api.build_page_tree(ProgressBar)
+        # no progress bar without a terminal, e.g. -c in a script or the daemon
+        progress_bar_cls = ProgressBar if sys.stdin.isatty() and sys.stdout.isatty() else None
+        self._page_tree = self._api.build_page_tree(progress_bar_cls)
         self._asset_tree = self._api.build_asset_tree()
         self._current_path = self._page_tree
         self._current_asset_folder = self._asset_tree
         # reset current_path ?
 
     def _init(self) -> None:
+        if self._loaded is not None:
+            self._wait_loading()
         if self._page_tree is None:
             self.reset()
 
+    ##############################################
+
+    def _is_loading(self) -> bool:
+        return self._loaded is not None and not self._loaded.is_set()
+
+    def _start_loading(self) -> None:
+        """Build the trees in a background thread
+
+        The trees are readable at once, the completions use the partial trees and the commands
+        wait on them in :meth:`_init`.
+        """
+        self._page_tree = Node()
+        self._asset_tree = Node()
+        self._current_path = self._page_tree
+        self._current_asset_folder = self._asset_tree
+        self._loading_error = None
+        self._loaded = threading.Event()
+        threading.Thread(target=self._load_trees, name='tree-loader', daemon=True).start()
+
+    def _load_trees(self) -> None:
+        try:
+            self._api.build_page_tree(None, root=self._page_tree)
+            self._api.build_asset_tree(root=self._asset_tree)
+        except Exception as e:
+            self._loading_error = e
+        finally:
+            self._loaded.set()
+
+    def _wait_loading(self) -> None:
+        if not self._loaded.is_set():
+            # not in a machine-readable output
+            self._emit(None, "<red>Wait for the tree...</red>")
+            self._loaded.wait()
+        self._loaded = None
+        if self._loading_error is not None:
+            # the next command retries
+            self._page_tree = None
+            error, self._loading_error = self._loading_error, None
+            raise error
+
+    ##############################################
+
+    CATALOGUE_REFRESH_TIME = 60   # s
+
+    def _get_catalogue(self) -> PageCatalogue:
+        # the first call loads the catalogue, then it is refreshed incrementally when it is older
+        #  than CATALOGUE_REFRESH_TIME, or when a command changed the pages
+        if self._catalogue_changed or self._catalogue.age > self.CATALOGUE_REFRESH_TIME:
+            self._catalogue.refresh()
+            self._catalogue_changed = False
+        return self._catalogue
+
+    def _pages_changed(self, moved: bool = False) -> None:
+        if moved:
+            # a move doesn't change updatedAt, reload on next use
+            self._catalogue.clear()
+        else:
+            self._catalogue_changed = True
+
     ############################################################################
 
     def emc(self, dst: FilePath) -> None:
@@ -468,6 +726,7 @@ class Cli:
 
     def cwd(self) -> None:
         """Show current working directry"""
+        self._init()
         self.print(f"<blue>Current path</blue> <green>{self._current_path.path}</green>")
         self.print(f"<blue>Current asset path</blue> <green>{self._current_asset_folder}</green>")
 
@@ -478,91 +737,125 @@ class Cli:
 
     # list clashes with list[]
 
+    @batched
     def pages(self, complete: bool = False) -> None:
         """List the pages"""
         complete = self._to_bool(complete)
         for page in self._api.list_pages():
+            record = dict(path=page.path_str, title=page.title, locale=page.locale, id=page.id)
             if complete:
                 # page.complete()
-                self.print(f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> {len(page.content):5} @{page.locale} {page.id:3}")
+                record['length'] = len(page.content)
+                self._emit(record, f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> {len(page.content):5} @{page.locale} {page.id:3}")
             else:
-                self.print(f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> @{page.locale} {page.id:3}")
+                self._emit(record, f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> @{page.locale} {page.id:3}")
+
+    def _emit_page(self, page) -> None:
+        self._emit(
+            dict(path=page.path_str, title=page.title, locale=page.locale, id=page.id),
+            f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> @{page.locale} {page.id:3}",
+        )
 
     ##############################################
 
+    @batched
     def with_path(self, path: PagePath) -> None:
         """List the pages matching a path pattern"""
-        for page in self._api.list_pages():
-            if path in page.path.lower():
-                self.print(f"<green>{page.path:60}</green> <blue>{page.title:40}</blue> @{page.locale} {page.id:3}")
+        catalogue = self._get_catalogue()
+        rows = catalogue.sort(catalogue.with_path(path))
+        for page in catalogue.pages(rows):
+            self._emit_page(page)
 
     ##############################################
 
     # def with_tags(self, *tags: list[Tag]) -> None:
+    @batched
     def with_tags(self, tag1: Tag, tag2: Tag = None, tag3: Tag = None, tag4: Tag = None) -> None:
         """List the pages having those tags"""
         tags = [_ for _ in (tag1, tag2, tag3, tag4) if _]
-        for page in self._api.list_page_for_tags(tags):
-            self.print(f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue> @{page.locale} {page.id:3}")
+        catalogue = self._get_catalogue()
+        rows = catalogue.sort(catalogue.with_tags(tags))
+        for page in catalogue.pages(rows):
+            self._emit_page(page)
 
     ##############################################
 
+    @batched
     def search(self, query: str) -> None:
         """Search page"""
         response = self._api.search(query)
         if response.suggestions:
             _ = ', '.join(response.suggestions)
-            self.print(f'Suggestions: <blue>{_}</blue>')
+            self._emit(None, f'Suggestions: <blue>{_}</blue>')
         for _ in response.results:
-            self.print(f'<blue>{_.path:60}</blue> <green>{_.title}</green>')
+            self._emit(
+                dict(path=_.path, title=_.title, locale=_.locale, id=_.id),
+                f'<blue>{_.path:60}</blue> <green>{_.title}</green>',
+            )
 
     ##############################################
 
+    @batched
     def last(self) -> None:
         """List the last updated pages"""
-        for page in self._api.list_pages(order_by='UPDATED', reverse=True, limit=10):
-            self.print(f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue>{LINESEP}  {page.updated_at}   @{page.locale}   {page.id:3}")
+        catalogue = self._get_catalogue()
+        rows = catalogue.sort(key='updated', reverse=True)[:10]
+        for page in catalogue.pages(rows):
+            self._emit(
+                dict(path=page.path_str, title=page.title, updated_at=page.updated_at, locale=page.locale, id=page.id),
+                f"<green>{page.path_str:60}</green> <blue>{page.title:40}</blue>{LINESEP}  {page.updated_at}   @{page.locale}   {page.id:3}",
+            )
 
     ##############################################
 
+    @batched
     def tree(self, path: PagePath) -> None:
         """Show page tree"""
         path = self._absolut_path(path)
-        items = list(self._api.tree(path))
+        items = self._api.tree(path)
         # items.sort(key=lambda _: _.path)
-        items = usorted(items, 'path_str')
+        if self._sorted:
+            items = usorted(items, 'path_str')
+        self._emit_tree(items)
+
+    def _emit_tree(self, items: Iterable) -> None:
         for item in items:
             is_folder = '/' if item.isFolder else ''
             path = f"{item.path}{is_folder}"
-            self.print(f"<green>{path:60}</green> <blue>{item.title:40}</blue> #{item.id}")
+            self._emit(
+                dict(path=item.path, title=item.title, id=item.id, folder=item.isFolder),
+                f"<green>{path:60}</green> <blue>{item.title:40}</blue> #{item.id}",
+            )
 
+    @batched
     def itree(self, id: int) -> None:
         """Show page tree"""
         # items = list(self._api.itree(id))
         items = self._api.itree(id)
-        items = usorted(items, 'path_str')
-        for item in items:
-            is_folder = '/' if item.isFolder else ''
-            path = f"{item.path}{is_folder}"
-            self.print(f"<green>{path:60}</green> <blue>{item.title:40}</blue> #{item.id}")
+        if self._sorted:
+            items = usorted(items, 'path_str')
+        self._emit_tree(items)
 
     ##############################################
 
+    @batched
     def ls(self) -> None:
         """List the current path"""
         self._init()
-        self.print(f"<red>CWD</red> <blue>{self._current_path.path}</blue>")
+        self._emit(None, f"<red>CWD</red> <blue>{self._current_path.path}</blue>")
         # for _ in self._current_path.folder_childs:
         #     self.print(f"  {_.name}")
         for _ in self._current_path.childs:
+            title = _.page.title if _.page is not None else None
+            record = dict(path=_.path, name=_.name, title=title, folder=bool(_.is_folder))
             if _.is_folder:
                 if _.page is not None:
-                    has_page = f' : <orange>{_.page.title}</orange>'
+                    has_page = f' : <orange>{title}</orange>'
                 else:
                     has_page = ''
-                self.print(f"  <green>{_.name} /</green>{has_page}")
+                self._emit(record, f"  <green>{_.name} /</green>{has_page}")
             else:
-                self.print(f"  <blue>{_.name}</blue> : <orange>{_.page.title}</orange>")
+                self._emit(record, f"  <blue>{_.name}</blue> : <orange>{title}</orange>")
 
     ############################################################################
     #
@@ -598,15 +891,40 @@ class Cli:
         _ += f"  <blue>{page.title}</blue>{LINESEP}"
         self.print(_)
         response = self._api.create_page(page)
+        self._pages_changed()
         self.print(f"<red>{response.message}</red>")
 
     ##############################################
 
+    def publish(self, src: FilePath, dryrun: bool = False) -> None:
+        """Create or update the pages of a directory"""
+        dryrun = self._to_bool(dryrun)
+        summary = bulk.publish_pages(self._api, src, dryrun=dryrun)
+        if not dryrun:
+            self._pages_changed()
+        for title, paths in (
+            ('Created', summary.created),
+            ('Updated', summary.updated),
+            ('Conflict', summary.conflicts),
+        ):
+            for _ in sorted(paths):
+                self.print(f"<blue>{title}</blue> {_}")
+        for path, message in summary.errors:
+            self.print(f"<red>Error</red> {path}: <red>{message}</red>")
+        if dryrun:
+            self.print("<red>Dry run</red>")
+        self.print(
+            f"<blue>Created</blue> {len(summary.created)}  <blue>Updated</blue> {len(summary.updated)}  "
+            f"<blue>Unchanged</blue> {len(summary.unchanged)}  <red>Conflicts</red> {len(summary.conflicts)}  "
+            f"<red>Errors</red> {len(summary.errors)}  in {summary.elapsed:.1f} s"
+        )
+
+    ##############################################
+
     def dump(self, path: PagePath, output: str = None) -> None:
         """dump a page"""
         path = self._absolut_path(path)
-        page = self._api.page(path)   # locale=
-        # page.complete()
+        page = self._api.page(path, profile='metadata', content=True)   # locale=
         # Fixme: write dump on stdout
         _ = f"<green>{page.path_str}</green> @{page.locale}{LINESEP}"
         _ += f"  <blue>{page.title}</blue>{LINESEP}"
@@ -621,10 +939,43 @@ class Cli:
                 page.write(output)
         else:
             rule = '\u2500' * 100
-            print(rule)
+            print(rule, file=self._output)
             # print(page.content)
-            print(page.export())
-            print(rule)
+            print(page.export(), file=self._output)
+            print(rule, file=self._output)
+
+    ##############################################
+
+    def _rows_for_list(self, catalogue: PageCatalogue, path: Path) -> list[int]:
+        # one page path per line
+        row_for_path = {_: row for row, _ in enumerate(catalogue.paths)}
+        rows = []
+        for line in Path(path).read_text(encoding='utf8').splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            row = row_for_path.get(line.lstrip('/'))
+            if row is None:
+                self.print(f"<red>Page not found</red> <green>{line}</green>")
+            else:
+                rows.append(row)
+        return rows
+
+    def bulk_dump(self, dst: FilePath, selection: PagePath, overwrite: bool = False) -> None:
+        """Dump the pages of a folder, a #tag or an @list_file"""
+        overwrite = self._to_bool(overwrite)
+        catalogue = self._get_catalogue()
+        if selection.startswith('#'):
+            rows = catalogue.with_tags((selection[1:],))
+        elif selection.startswith('@'):
+            rows = self._rows_for_list(catalogue, selection[1:])
+        else:
+            rows = catalogue.with_prefix(str(self._absolut_path(selection)))
+        start = time.time()
+        written = bulk.dump_pages(self._api, catalogue.pages(rows), dst, overwrite)
+        for _ in sorted(written):
+            self.print(f"<blue>Wrote</blue> {_}")
+        self.print(f"<blue>Dumped</blue> {len(written)}/{len(rows)} pages in {time.time() - start:.1f} s")
 
     ##############################################
 
@@ -678,21 +1029,8 @@ class Cli:
 
     ##############################################
 
-    def diff(self, input: FilePath = None) -> None:
-        """Diff a page"""
-        file_page = Page.read(input, self._api)
-        wiki_page = file_page.reload()
-        # wiki_page.complete()
-        self.print(f"<red>Wiki:</red> <blue>{wiki_page.updated_at}</blue>")
-        self.print(f"<red>File:</red> <blue>{file_page.updated_at}</blue>")
-        for _ in difflib.unified_diff(
-                wiki_page.content.splitlines(),
-                file_page.content.splitlines(),
-                fromfile='wiki',
-                tofile='disk',
-                n=3,
-                lineterm='',
-        ):
+    def _print_diff(self, lines: Iterable[str]) -> None:
+        for _ in lines:
             _ = html.escape(_)
             if _.startswith('---') or _.startswith('+++'):
                 _ = f'<green>{_}</green>'
@@ -704,6 +1042,40 @@ class Cli:
                 _ = f'<green>+</green>{_[1:]}'
             self.print(_)
 
+    def diff(self, input: FilePath = None) -> None:
+        """Diff a page"""
+        file_page = Page.read(input, self._api)
+        # the content is cached by updatedAt
+        wiki_page = self._api.page(file_page.path, file_page.locale, profile='minimal', cache=False)
+        wiki_content = self._content_cache.content(wiki_page)
+        self.print(f"<red>Wiki:</red> <blue>{wiki_page.updated_at}</blue>")
+        self.print(f"<red>File:</red> <blue>{file_page.updated_at}</blue>")
+        self._print_diff(unified_diff(
+            wiki_content.splitlines(),
+            file_page.content.splitlines(),
+            fromfile='wiki',
+            tofile='disk',
+        ))
+
+    ##############################################
+
+    def diff_dir(self, path: FilePath = None) -> None:
+        """Diff the pages of a directory"""
+        if path is None:
+            path = Path('.', 'sync')
+        catalogue = self._get_catalogue()
+        for file_path, file_page, wiki_content in diff_directory(self._api, catalogue, path, self._content_cache):
+            if wiki_content is None:
+                self.print(f"<red>Not on the wiki</red> <green>{file_path}</green>")
+                continue
+            self.print(f"<red>Changed</red> <green>{file_path}</green>")
+            self._print_diff(unified_diff(
+                wiki_content.splitlines(),
+                file_page.content.splitlines(),
+                fromfile=f'wiki {file_page.path_str}',
+                tofile=f'disk {file_path}',
+            ))
+
     ##############################################
 
     def update(self, input: FilePath = None) -> None:
@@ -714,6 +1086,7 @@ class Cli:
         _ += f"  {page.id}{LINESEP}"
         self.print(_)
         response = page.update()
+        self._pages_changed()
         self.print(f"<red>{response.message}</red>")
 
     ##############################################
@@ -724,21 +1097,28 @@ class Cli:
         # relative page -> folder
         dryrun = self._to_bool(dryrun)
         # self.print(f"  Move: <green>{old_path}</green> <red>-></red> <blue>{new_path}</blue>")
-        for page in self._api.list_pages():
-            path = page.path
-            if path.startswith(old_path):
-                dest = path.replace(old_path, new_path)
-                self.print(f"  Move page: <green>{path}</green> <red>-></red> <blue>{dest}</blue>")
-                if not dryrun:
-                    response = page.move(dest)
-                    self.print(f"<red>{response.message}</red>")
+        old_path = str(old_path).lstrip('/')
+        new_path = str(new_path).lstrip('/')
+        catalogue = self._get_catalogue()
+        rows = catalogue.sort(catalogue.with_prefix(old_path))
+        for page in catalogue.pages(rows):
+            path = page.path_str
+            dest = new_path + path[len(old_path):]
+            if dest == path:
+                continue
+            self.print(f"  Move page: <green>{path}</green> <red>-></red> <blue>{dest}</blue>")
+            if not dryrun:
+                response = page.to_page().move(dest)
+                self.print(f"<red>{response.message}</red>")
+        if rows and not dryrun:
+            self._pages_changed(moved=True)
 
     ##############################################
 
     def _move_impl(self, path: str, new_path: str, rename: bool = False, dryrun: bool = False) -> None:
         """Move a page"""
         path = self._absolut_path(path)
-        page = self._api.page(path)   # locale=
+        page = self._api.page(path, profile='minimal')   # locale=
         new_path = self._absolut_path(new_path)
         if not rename:
             dest = new_path.joinpath(page.path.name)
@@ -746,6 +1126,7 @@ class Cli:
         dryrun = self._to_bool(dryrun)
         if not dryrun:
             response = page.move(dest)
+            self._pages_changed(moved=True)
             self.print(f"<red>{response.message}</red>")
 
 
@@ -763,37 +1144,45 @@ class Cli:
     # Tags
     #
 
+    @batched
     def tags(self) -> None:
         """List the tags"""
-        for _ in usorted(self._api.tags(), 'tag'):
-            self.print(f'<blue>{_.tag:30}</blue> <green>{_.title}</green>')
+        tags = self._api.tags()
+        if self._sorted:
+            tags = usorted(tags, 'tag')
+        for _ in tags:
+            self._emit(dict(tag=_.tag, title=_.title), f'<blue>{_.tag:30}</blue> <green>{_.title}</green>')
 
     ##############################################
 
+    @batched
     def search_tags(self, query: str) -> None:
         """Search the tags"""
         for _ in self._api.search_tags(query):
-            self.print(f'<blue>{_}</blue>')
+            self._emit(dict(tag=_), f'<blue>{_}</blue>')
 
     ############################################################################
     #
     # Asset
     #
 
+    @batched
     def lsa(self) -> None:
         """List the current asset folder"""
         self._init()
-        self.print(f"<red>CWD</red> <blue>{self._current_asset_folder.path}</blue>")
+        self._emit(None, f"<red>CWD</red> <blue>{self._current_asset_folder.path}</blue>")
         # for _ in self._current_path.folder_childs:
         #     self.print(f"  {_.name}")
         for _ in self._current_asset_folder.childs:
+            record = dict(path=_.path, name=_.name, folder=bool(_.is_folder))
             if _.is_folder:
-                self.print(f"  <green>{_.name} /</green>")
+                self._emit(record, f"  <green>{_.name} /</green>")
             else:
-                self.print(f"  <blue>{_.name}</blue>")
+                self._emit(record, f"  <blue>{_.name}</blue>")
 
     ##############################################
 
+    @batched
     def asset(self, show_files: bool = True, show_folder_path: bool = False) -> None:
         """List the assets"""
         show_files = self._to_bool(show_files)
@@ -801,18 +1190,21 @@ class Cli:
             indent_str = '  '*indent
             if show_files:
                 for asset in self._api.list_asset(folder_id):
-                    self.print(f"{indent_str}- <blue>{asset.filename}</blue>   {asset.updated_at}   <green>{asset.id}</green>")
                     url = '/'.join([self._api.api_url] + stack + [asset.filename])
-                    self.print(f"{indent_str}  {url}")
+                    self._emit(
+                        dict(type='asset', path='/'.join(stack), id=asset.id, filename=asset.filename, updated_at=asset.updated_at, url=url),
+                        f"{indent_str}- <blue>{asset.filename}</blue>   {asset.updated_at}   <green>{asset.id}</green>{LINESEP}{indent_str}  {url}",
+                    )
             for _ in self._api.list_asset_subfolder(folder_id):
                 path = '/'.join(stack + [_.name])
                 # print(f"{indent_str}- {_.name} {_.slug} {_.id}")
+                record = dict(type='folder', path=path, id=_.id, filename=None, updated_at=None, url=None)
                 if show_folder_path:
-                    self.print(f"<red>{path}</red>    <green>{_.id}</green>")
+                    self._emit(record, f"<red>{path}</red>    <green>{_.id}</green>")
                 else:
-                    self.print(f"{indent_str}+ <red>{_.name}</red>    <green>{_.id}</green>")
+                    self._emit(record, f"{indent_str}+ <red>{_.name}</red>    <green>{_.id}</green>")
                 show_folder(_.id, indent + 1, stack + [_.name])
-        self.print('<blue>/</blue>')
+        self._emit(None, '<blue>/</blue>')
         show_folder()
 
     ##############################################
@@ -863,58 +1255,117 @@ class Cli:
     # Check
     #
 
+    @staticmethod
+    def _dead_links(content: str, page_paths: list[str], page_path_set: set[str]) -> list[tuple[str, str, list[str]]]:
+        """Return the links of `content` to missing pages, their line and the pages of the same name"""
+        dead_links = []
+        for line in content.splitlines():
+            start = 0
+            while True:
+                i = line.find('](', start)
+                if i != -1:
+                    start = i+2
+                    j = line.find(')', start)
+                    if j != -1:
+                        path = line[start:j].strip()
+                        if path.startswith('/'):
+                            path = path[1:]
+                        _ = path.rfind('.')
+                        if _ != -1:
+                            extension = path[_:]
+                        else:
+                            extension = None
+                        if (not re.match('^https?\\://', path)
+                            and extension not in ('.png', '.jpg', '.webp', '.ods', '.pdf')
+                            and path not in page_path_set):
+                            if path:
+                                parts = path.split('/')
+                                name = parts[-1]
+                                found = []
+                                for _ in page_paths:
+                                    name2 = _.split('/')[-1]
+                                    if name in name2:
+                                        found.append(_)
+                                dead_links.append((path, line, found))
+                else:
+                    break
+        return dead_links
+
+    @batched
     def check(self) -> None:
         """Check pages"""
-        pages = list(self._api.list_pages())
-        page_paths = [_.path for _ in pages]
-        for page in pages:
+        catalogue = self._get_catalogue()
+        page_paths = catalogue.paths
+        page_path_set = set(page_paths)
+        for page in catalogue.pages():
             # print(f"Checking {page.path_str}")
             # page.complete()
-            dead_links = []
-            for line in page.content.splitlines():
-                start = 0
-                while True:
-                    i = line.find('](', start)
-                    if i != -1:
-                        start = i+2
-                        j = line.find(')', start)
-                        if j != -1:
-                            path = line[start:j].strip()
-                            if path.startswith('/'):
-                                path = path[1:]
-                            _ = path.rfind('.')
-                            if _ != -1:
-                                extension = path[_:]
-                            else:
-                                extension = None
-                            if (not re.match('^https?\\://', path)
-                                and extension not in ('.png', '.jpg', '.webp', '.ods', '.pdf')
-                                and path not in page_paths):
-                                message = f"  <green>{path}</green>{LINESEP}    |{line}"
-                                if path:
-                                    parts = path.split('/')
-                                    name = parts[-1]
-                                    for _ in page_paths:
-                                        name2 = _.split('/')[-1]
-                                        if name in name2:
-                                            message += f"{LINESEP}    <blue>found</blue> <green>{_}</green>"
-                                    dead_links.append(message)
-                    else:
-                        break
+            dead_links = self._dead_links(page.content, page_paths, page_path_set)
             if dead_links:
+                messages = []
+                for path, line, found in dead_links:
+                    self._emit(dict(page=page.path_str, url=page.url, link=path, line=line, found=found))
+                    message = f"  <green>{path}</green>{LINESEP}    |{line}"
+                    for _ in found:
+                        message += f"{LINESEP}    <blue>found</blue> <green>{_}</green>"
+                    messages.append(message)
                 _ = f"<red>Page</red> <blue>{page.url}</blue> <red>as deak link</red>" + LINESEP
-                _ += LINESEP.join(dead_links)
-                self.print(_)
+                _ += LINESEP.join(messages)
+                self._emit(None, _)
 
     ##############################################
 
+    @batched
     def links(self) -> None:
         """List the page links"""
-        pages = list(self._api.links())
+        pages = self._api.links()
         # pages.sort(key=lambda _: _.path)
-        pages = usorted(pages, 'path')
+        if self._sorted:
+            pages = usorted(pages, 'path')
         for page in pages:
-            self.print(f'<blue>{page.path:60}</blue>')
             # sorted()
+            markup = f'<blue>{page.path:60}</blue>'
             for _ in page.links:
-                self.print(f'  <green>{_}</green>')
+                markup += f'{LINESEP}  <green>{_}</green>'
+            self._emit(dict(path=page.path, links=page.links), markup)
+
+    ############################################################################
+    #
+    # Statistics
+    #
+
+    def stats(self) -> None:
+        """Show the request and cache statistics"""
+        operations = self._api.stats.operations
+        if operations:
+            self.print(
+                f"<blue>{'operation':32} {'count':>6} {'errors':>6} {'conn':>5} {'total s':>8} {'mean ms':>8} {'max ms':>8}"
+                f" {'wait %':>6} {'xfer %':>6} {'parse %':>7} {'sent':>10} {'received':>10}</blue>"
+            )
+        for name, _ in operations.items():
+            time_ = _.time or 1
+            self.print(
+                f"<green>{name:32}</green> {_.count:6} {_.errors:6} {_.connections:5} {_.time:8.2f}"
+                f" {_.mean_time * 1000:8.1f} {_.max_time * 1000:8.1f}"
+                f" {_.wait / time_:6.0%} {_.transfer / time_:6.0%} {_.parse / time_:7.0%}"
+                f" {_.sent:10} {_.received:10}"
+            )
+        for name, _ in self._api.stats.caches.items():
+            self.print(f"<blue>Cache</blue> <green>{name:10}</green> {_.hits:6} hits {_.misses:6} misses {_.hit_rate:6.0%}")
+
+    ##############################################
+
+    def stats_reset(self) -> None:
+        """Reset the statistics"""
+        self._api.stats.reset()
+
+    ##############################################
+
+    def stats_export(self, dst: FilePath, trace: bool = False) -> None:
+        """Export the statistics as JSON or the requests as a Chrome trace"""
+        dst = Path(dst).expanduser()
+        if self._to_bool(trace):
+            self._api.stats.dump_chrome_trace(dst)
+        else:
+            self._api.stats.dump_json(dst)
+        self.print(f"<blue>Wrote</blue> {dst}")
@@ -6,7 +6,7 @@
 #
 ####################################################################################################
 
-__all__ = ['ApiError', 'WikiJsApi', 'Node', 'Page']
+__all__ = ['ApiError', 'ConflictError', 'WikiJsApi', 'Node', 'Page', 'PageListItem']
 
 # Fime: use PurePosixPath
 
@@ -15,19 +15,22 @@ __all__ = ['ApiError', 'WikiJsApi', 'Node', 'Page']
 from dataclasses import dataclass
 from datetime import datetime
 from functools import wraps
+from http import HTTPStatus
 from pathlib import Path, PurePosixPath
 from pprint import pprint
 from typing import Any
 from typing import Iterator
 
+import json
 import os
+import threading
 import types
 
-import requests
-
 from . import config
 from . import query as Q
 from .date import date2str
+from .instrumentation import RequestStats, RequestTimer, operation_name
+from .jsonstream import JsonArrayStream
 from .node import Node
 from .printer import printc, html_escape
 from time import time
@@ -250,7 +253,8 @@ class BasePage:
             if tag[0] != tag[-1] != "'":
                 raise ValueError()
             return tag[1:-1]
-        return [on_tag(_) for _ in tags[1:-1].split(',')]
+        # [] is an empty list
+        return [on_tag(_) for _ in tags[1:-1].split(',') if _.strip()]
 
     ##############################################
 
@@ -340,9 +344,7 @@ class BasePage:
         # Ensure trailing line sep
         # content = content.strip() + LINESEP
         #! data['content'] = content
-        print('pprint data')
-        pprint(data)
-        pprint(content)
+        # pprint(data)
         page = Page(api, **data)
         page._content = content
         return page
@@ -359,6 +361,7 @@ class BasePage:
 class Page(BasePage):
     # Merge PageListItem
     #  irrelevant attributes are set to None
+    #  attributes that are not selected by the query profile are also set to None
 
     api: 'WikiJsApi'
 
@@ -366,18 +369,18 @@ class Page(BasePage):
     path: PurePosixPath
     locale: str
 
-    title: str
-    description: str
-    contentType: str
-    tags: list[str]
+    title: str = None
+    description: str = None
+    contentType: str = None
+    tags: list[str] = None
 
-    createdAt: str
-    updatedAt: str
+    createdAt: str = None
+    updatedAt: str = None
 
-    isPublished: bool
+    isPublished: bool = None
 
-    isPrivate: bool
-    privateNS: str
+    isPrivate: bool = None
+    privateNS: str = None
 
     publishStartDate: str = None
     publishEndDate: str = None
@@ -471,6 +474,133 @@ class Page(BasePage):
 
 ####################################################################################################
 
+class PageListItem:
+
+    """Lightweight record for a row of `pages.list`
+
+    Bulk consumers only read a few fields, thus paths and dates are parsed on demand and cached.
+    Use :meth:`to_page` to promote it to a :class:`Page`.
+    """
+
+    FIELDS = (
+        'id',
+        'path',
+        'locale',
+        'title',
+        'description',
+        'contentType',
+        'isPublished',
+        'isPrivate',
+        'privateNS',
+        'createdAt',
+        'updatedAt',
+        'tags',
+    )
+
+    __slots__ = (
+        'api',
+        'id',
+        'path_str',
+        'locale',
+        'title',
+        'description',
+        'contentType',
+        'isPublished',
+        'isPrivate',
+        'privateNS',
+        'createdAt',
+        'updatedAt',
+        'tags',
+        '_path',
+        '_updated_at',
+        '_page',
+    )
+
+    ##############################################
+
+    def __init__(
+            self,
+            api: 'WikiJsApi',
+            id: int,
+            path: str,
+            locale: str,
+            title: str = None,
+            description: str = None,
+            contentType: str = None,
+            isPublished: bool = None,
+            isPrivate: bool = None,
+            privateNS: str = None,
+            createdAt: str = None,
+            updatedAt: str = None,
+            tags: list[str] = None,
+    ) -> None:
+        self.api = api
+        self.id = id
+        self.path_str = path
+        self.locale = locale
+        self.title = title
+        self.description = description
+        self.contentType = contentType
+        self.isPublished = isPublished
+        self.isPrivate = isPrivate
+        self.privateNS = privateNS
+        self.createdAt = createdAt
+        self.updatedAt = updatedAt
+        self.tags = tags
+        self._path = None
+        self._updated_at = None
+        self._page = None
+
+    ##############################################
+
+    def __repr__(self) -> str:
+        return f'PageListItem({self.id}, @{self.locale} {self.path_str})'
+
+    ##############################################
+
+    @property
+    def path(self) -> PurePosixPath:
+        if self._path is None:
+            self._path = PurePosixPath(self.path_str)
+        return self._path
+
+    @property
+    def split_path(self) -> list[str]:
+        return self.path_str.split('/')
+
+    @property
+    def url(self) -> str:
+        return f'{self.api.api_url}/{self.locale}/{self.path_str}'
+
+    ##############################################
+
+    @property
+    def created_at(self) -> datetime:
+        if self.createdAt:
+            return datetime.fromisoformat(self.createdAt)
+        else:
+            return None
+
+    @property
+    def updated_at(self) -> datetime:
+        if self._updated_at is None and self.updatedAt:
+            self._updated_at = datetime.fromisoformat(self.updatedAt)
+        return self._updated_at
+
+    ##############################################
+
+    def to_page(self) -> Page:
+        """Promote to a Page, the content is then fetched on demand"""
+        if self._page is None:
+            self._page = Page(api=self.api, **{_: getattr(self, _) for _ in self.FIELDS if _ != 'path'}, path=self.path_str)
+        return self._page
+
+    @property
+    def content(self) -> str:
+        return self.to_page().content
+
+####################################################################################################
+
 @dataclass
 class PageVersion(BasePage):
     """Store a previous page version"""
@@ -768,6 +898,9 @@ def xpath(data: dict, path: str) -> dict:
 class ApiError(NameError):
     pass
 
+class ConflictError(ApiError):
+    pass
+
 ####################################################################################################
 
 class WikiJsApi:
@@ -785,6 +918,10 @@ class WikiJsApi:
         }
         self._expire_time = int(expire_time)
         self._cache = {_: dict() for _ in ('itree', 'page')}
+        self._cache_lock = threading.Lock()
+        # requests.Session is not thread safe, thus each thread has its own session and connection pool
+        self._local = threading.local()
+        self.stats = RequestStats()
         self.info()
 
     ##############################################
@@ -806,10 +943,43 @@ class WikiJsApi:
 
     ##############################################
 
+    @property
+    def _session(self) -> 'requests.Session':
+        # a thread uses one connection at a time, thus the default pool is enough
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            # requests is loaded on first use, it is slow to import
+            import requests
+            session = requests.Session()
+            session.headers.update(self._headers)
+            self._local.session = session
+        return session
+
+    def _connection_count(self, url: str) -> int:
+        # number of connections opened by the pools of the thread, to detect a new connection
+        try:
+            pools = self._session.get_adapter(url).poolmanager.pools
+            return sum(pools[_].num_connections for _ in pools.keys())
+        except (AttributeError, KeyError):
+            return 0
+
+    def _send(self, timer: RequestTimer, method: str, url: str, **kwargs) -> 'requests.Response':
+        """Send a request, read the body and time the phases"""
+        connections = self._connection_count(url)
+        response = self._session.request(method, url, stream=True, **kwargs)
+        timer.lap('wait')
+        timer.received = len(response.content)
+        timer.lap('transfer')
+        timer.connected = self._connection_count(url) > connections
+        return response
+
+    ##############################################
+
     def _lookup_cache(self, cache_name: str, key: str) -> Any | None:
         cache = self._cache[cache_name]
         now = time()
-        cached = cache.get(key, None)
+        with self._cache_lock:
+            cached = cache.get(key, None)
         if cached is not None:
             delta = now - cached[0]
             # printc(f"Cached {cache_name} {key}")
@@ -820,13 +990,22 @@ class WikiJsApi:
     def _store_cache(self, cache_name: str, key: str, value: Any):
         # printc(f"Cache {cache_name} {key}")
         cache = self._cache[cache_name]
-        cache[key] = (time(), value)
+        with self._cache_lock:
+            cache[key] = (time(), value)
+
+    def discard_page(self, path: str) -> None:
+        """Drop the cached versions of a page, whatever the profile"""
+        path = self._to_path(str(path))
+        prefixes = (path, '/' + path)
+        cache = self._cache['page']
+        with self._cache_lock:
+            for key in [_ for _ in cache if any(_ == p or _.startswith(p + '/') for p in prefixes)]:
+                del cache[key]
 
     # Decorator
     # Fixme: do we need is_generator
     def cache(cache_name: str):
         def decorator(func):
-            print('Cache func', func)
             @wraps(func)
             def wrapper(self, *args, **kwargs):
                 cache = kwargs.pop('cache', True)
@@ -838,8 +1017,8 @@ class WikiJsApi:
                     value = self._lookup_cache(cache_name, cache_key)
                     # if value is not None:
                     #     printc(f'Found in cache {cache_key}')
+                    self.stats.cache(cache_name, value is not None)
                 if value is None:
-                    print(f'Call {func}')   # Fixme: <>
                     value = func(self, *args, **kwargs)
                     # We cannot mix return and yield in a function !
                     is_generator = isinstance(value, types.GeneratorType)
@@ -853,38 +1032,100 @@ class WikiJsApi:
 
     ##############################################
 
-    def query_wikijs(self, query: dict) -> dict:
+    def _prepare_query(self, query: dict) -> None:
         query['query'] = Q.clean_query(query['query'])
         if config.DEBUG:
             _ = Q.dump_query(query)
             printc(f"<blue>API Query:</blue> {_}")
-        response = requests.post(f'{self._api_url}/graphql', json=query, headers=self._headers)
-        # if response.status_code != requests.codes.ok:
-        #     raise NameError(f"Error {response}")
-        data = response.json()
-        if 'errors' in data:
-            d = data['errors'][0]
-            path = '/'.join(d.get('path', ''))
-            message = d['message']
-            stacktrace = LINESEP.join(d['extensions']['exception']['stacktrace'])
-            stacktrace = html_escape(stacktrace)
-            location = d['locations'][0]['column']
-            query = query['query']
-            query_location = query[max(0, location-1):min(location+20, len(query))]
-            message = f'{stacktrace}{LINESEP}{LINESEP}Path: {path}{LINESEP}@ {query_location}...{LINESEP}{LINESEP}{message}'
-            raise ApiError(message)
-        else:
-            return data
+
+    def _raise_error(self, query: dict, data: dict) -> None:
+        d = data['errors'][0]
+        path = '/'.join(d.get('path', ''))
+        message = d['message']
+        stacktrace = LINESEP.join(d['extensions']['exception']['stacktrace'])
+        stacktrace = html_escape(stacktrace)
+        location = d['locations'][0]['column']
+        query = query['query']
+        query_location = query[max(0, location-1):min(location+20, len(query))]
+        message = f'{stacktrace}{LINESEP}{LINESEP}Path: {path}{LINESEP}@ {query_location}...{LINESEP}{LINESEP}{message}'
+        raise ApiError(message)
+
+    JSON_HEADERS = {'Content-Type': 'application/json'}
+
+    def query_wikijs(self, query: dict) -> dict:
+        self._prepare_query(query)
+        with self.stats.timer(operation_name(query['query'])) as timer:
+            body = json.dumps(query).encode('utf8')
+            timer.sent = len(body)
+            response = self._send(timer, 'POST', f'{self._api_url}/graphql', data=body, headers=self.JSON_HEADERS)
+            # if response.status_code != requests.codes.ok:
+            #     raise NameError(f"Error {response}")
+            data = json.loads(response.content)
+            timer.lap('parse')
+            if 'errors' in data:
+                self._raise_error(query, data)
+            else:
+                return data
+
+    ##############################################
+
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def stream_wikijs(self, query: dict, path: str, timeout: float = None) -> Iterator[Any]:
+        """Run a query and yield the elements of the array at `path` as they are received
+
+        Use it for list queries, the memory usage is then independent of the number of elements.
+        `timeout` bounds the connection and the wait for each chunk.
+        """
+        self._prepare_query(query)
+        url = f'{self._api_url}/graphql'
+        # the body is parsed while it is received, thus the parse time is included in the transfer time
+        with self.stats.timer(operation_name(query['query'])) as timer:
+            body = json.dumps(query).encode('utf8')
+            timer.sent = len(body)
+            connections = self._connection_count(url)
+            with self._session.post(url, data=body, headers=self.JSON_HEADERS, stream=True, timeout=timeout) as response:
+                timer.lap('wait')
+                timer.connected = self._connection_count(url) > connections
+                def chunks():
+                    for _ in response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                        timer.received += len(_)
+                        yield _
+                stream = JsonArrayStream(chunks(), path)
+                yield from stream
+                timer.lap('transfer')
+            if 'errors' in stream.extra:
+                self._raise_error(query, stream.extra)
 
     ############################################################################
 
     def get(self, url: str) -> bytes:
         url = f'{self._api_url}/{url}'
-        response = requests.get(url, headers=self._headers)
-        if response.status_code != requests.codes.ok:
+        with self.stats.timer('GET') as timer:
+            response = self._send(timer, 'GET', url)
+        if response.status_code != HTTPStatus.OK:
             raise NameError(f"Error {response}")
         return response.content
 
+    def get_range(self, url: str, offset: int, size: int) -> tuple[int, bytes]:
+        """Get `size` bytes at `offset` using a HTTP Range request
+
+        Return the offset of the data and the data.  If the server ignores the range, the data is
+        the whole file at offset 0.
+        """
+        url = f'{self._api_url}/{url}'
+        headers = {'Range': f'bytes={offset}-{offset + size - 1}'}
+        with self.stats.timer('GET range') as timer:
+            response = self._send(timer, 'GET', url, headers=headers)
+        match response.status_code:
+            case HTTPStatus.PARTIAL_CONTENT:
+                return offset, response.content
+            case HTTPStatus.OK:
+                return 0, response.content
+            case HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                return offset, b''
+        raise NameError(f"Error {response}")
+
     ##############################################
 
     def upload(self, folder_id: int, path: Path | str, name: str = None) -> None:
@@ -898,8 +1139,10 @@ class WikiJsApi:
         )
         # _ = requests.Request('POST', f'{self._api_url}/u', files=multipart_form_data)
         # print(_.prepare().body[:100])
-        response = requests.post(f'{self._api_url}/u', files=multipart_form_data, headers=self._headers)
-        if response.status_code != requests.codes.ok:
+        with self.stats.timer('POST upload') as timer:
+            timer.sent = len(payload)
+            response = self._send(timer, 'POST', f'{self._api_url}/u', files=multipart_form_data)
+        if response.status_code != HTTPStatus.OK:
             raise NameError(f"Error {response}")
         # pprint(response)
 
@@ -935,20 +1178,54 @@ class WikiJsApi:
     ##############################################
 
     @cache(cache_name='page')
-    def page(self, path: str, locale: str = 'fr') -> Page:
+    def page(self, path: str, locale: str = 'fr', profile: str = 'full', content: bool = False) -> Page:
+        """Get a page
+
+        `profile` selects the fields to fetch, see `query.PAGE_PROFILES`.
+        When `content` is set, the content is fetched by the same request.
+        """
         path = self._to_path(path)
         query = {
             'variables': {
                 'path': path,
                 'locale': locale,
             },
-            'query': Q.PAGE,
+            'query': Q.PAGE(profile, content),
         }
         data = self.query_wikijs(query)
         _ = xpath(data, 'data/pages/singleByPath')
-        _['tags'] = [_['tag'] for _ in _['tags']]
         # pprint(_)
-        return Page(api=self, **_)
+        return self._to_page(_, content)
+
+    ##############################################
+
+    def _to_page(self, data: dict, content: bool) -> Page:
+        if 'tags' in data:
+            data['tags'] = [_['tag'] for _ in data['tags']]
+        page_content = data.pop('content', None)
+        page = Page(api=self, **data)
+        if content:
+            page._content = page_content
+        return page
+
+    def pages_by_path(
+            self,
+            paths: list[str],
+            locale: str = 'fr',
+            profile: str = 'full',
+            content: bool = False,
+    ) -> list[Page]:
+        """Get several pages in one request, see `page`"""
+        paths = [self._to_path(_) for _ in paths]
+        variables = {f'path{i}': _ for i, _ in enumerate(paths)}
+        variables['locale'] = locale
+        query = {
+            'variables': variables,
+            'query': Q.PAGES_BY_PATH(len(paths), profile, content),
+        }
+        data = self.query_wikijs(query)
+        _ = xpath(data, 'data/pages')
+        return [self._to_page(_[f'p{i}'], content) for i in range(len(paths))]
 
     ##############################################
 
@@ -1040,14 +1317,31 @@ class WikiJsApi:
 
     ##############################################
 
-    def update_page(self, page: Page) -> ResponseResult:
-        # Fixme: checkConflicts
-        # "variables":{"id":96,"checkoutDate":"2024-11-07T02:04:57.106Z"}
-        # "query ($id: Int!, $checkoutDate: Date!) { pages {
-        #   checkConflicts(id: $id, checkoutDate: $checkoutDate) }}"}]'
+    def check_conflicts(self, page_id: int, checkout_date: str) -> bool:
+        """Return True if the page was updated after `checkout_date`"""
+        query = {
+            'variables': {
+                'id': int(page_id),
+                'checkoutDate': checkout_date,
+            },
+            'query': Q.CHECK_CONFLICTS,
+        }
+        data = self.query_wikijs(query)
+        return xpath(data, 'data/pages/checkConflicts')
+
+    ##############################################
+
+    def update_page(self, page: Page, checkout_date: str = None) -> ResponseResult:
+        """Update a page
+
+        If `checkout_date` is given, i.e. the updatedAt of the edited version, raise a
+        `ConflictError` if the page was updated in the meantime.
+        """
         # Fixme: ok ?
         if page.id is None:
             raise NameError(f"Cannot update a page without id")
+        if checkout_date is not None and self.check_conflicts(page.id, checkout_date):
+            raise ConflictError(f"Page {page.path_str} was updated since {checkout_date}")
         query = {
             'variables': {
                 'id': page.id,
@@ -1071,7 +1365,10 @@ class WikiJsApi:
         data = self.query_wikijs(query)
         # pprint(data)
         _ = xpath(data, 'data/pages/update/responseResult')
-        return ResponseResult(**_)
+        response = ResponseResult(**_)
+        if response.succeeded:
+            page.updatedAt = xpath(data, 'data/pages/update/page/updatedAt')
+        return response
 
     ##############################################
 
@@ -1095,7 +1392,13 @@ class WikiJsApi:
     # Pages
     #
 
-    def list_pages(self, order_by: str = 'PATH', reverse: bool = False, limit: int = 0) -> Iterator[Page]:
+    def list_pages(
+            self,
+            order_by: str = 'PATH',
+            reverse: bool = False,
+            limit: int = 0,
+            profile: str = 'metadata',
+    ) -> Iterator[PageListItem]:
         order_by_direction = 'DESC' if reverse else 'ASC'
         # Fixme: cannot pass PageOrderBy as string ???
         query = {
@@ -1105,26 +1408,41 @@ class WikiJsApi:
                 # 'orderByDirection': order_by_direction,
             },
             # eval(f'f"""{Q.LIST_PAGE}"""')
-            'query': Q.LIST_PAGE(order_by, order_by_direction),
+            'query': Q.LIST_PAGE(order_by, order_by_direction, profile),
         }
         # pprint(query)
-        data = self.query_wikijs(query)
-        for _ in xpath(data, 'data/pages/list'):
-            yield Page(api=self, **_)
+        for _ in self.stream_wikijs(query, 'data/pages/list'):
+            yield PageListItem(self, **_)
 
     ##############################################
 
-    def list_page_for_tags(self, tags: list[str], order_by: str = 'PATH', limit: int = 0) -> Iterator[Page]:
+    def list_page_for_tags(
+            self,
+            tags: list[str],
+            order_by: str = 'PATH',
+            limit: int = 0,
+            profile: str = 'metadata',
+    ) -> Iterator[PageListItem]:
         query = {
             'variables': {
                 'tags': list(tags),
                 'limit': limit,
             },
-            'query': Q.LIST_PAGE_FOR_TAGS(order_by),
+            'query': Q.LIST_PAGE_FOR_TAGS(order_by, profile),
         }
-        data = self.query_wikijs(query)
-        for _ in xpath(data, 'data/pages/list'):
-            yield Page(api=self, **_)
+        for _ in self.stream_wikijs(query, 'data/pages/list'):
+            yield PageListItem(self, **_)
+
+    ##############################################
+
+    def page_ids(self) -> list[int]:
+        query = {
+            'variables': {
+                'limit': 0,
+            },
+            'query': Q.LIST_PAGE_IDS,
+        }
+        return [_['id'] for _ in self.stream_wikijs(query, 'data/pages/list')]
 
     ##############################################
 
@@ -1168,11 +1486,13 @@ class WikiJsApi:
 
     ##############################################
 
-    def build_page_tree(self, progress_bar_cls) -> Node:
+    def build_page_tree(self, progress_bar_cls, root: Node = None) -> Node:
         # Runnning time is proportionnal to the number of pages
-        root = Node()
+        # A `root` is filled as the pages are received, it can be read by another thread
+        if root is None:
+            root = Node()
 
-        def process_page(page: Page) -> None:
+        def process_page(page: PageListItem) -> None:
             # print('-'*10)
             # print(f"@{page.locale} {page.path}")
             path = page.split_path
@@ -1209,7 +1529,7 @@ class WikiJsApi:
             'variables': {
                 'query': query,
             },
-            'query': Q.SEARCH,
+            'query': Q.PAGE_SEARCH,
         }
         data = self.query_wikijs(query)
         results = [PageSearchResult(**_) for _ in xpath(data, 'data/pages/search/results')]
@@ -1236,7 +1556,7 @@ class WikiJsApi:
                 progress_callback(int(p))
                 next_p += P_STEP
             print(f'{page.path}')
-            for _ in page.history:
+            for _ in page.to_page().history:
                 if preload_version:
                     _.page_version
                 history.append(_)
@@ -1250,12 +1570,11 @@ class WikiJsApi:
     # Tag
     #
 
-    def tags(self) -> Iterator[Tag]:
+    def tags(self, timeout: float = None) -> Iterator[Tag]:
         query = {
             'query': Q.TAGS,
         }
-        data = self.query_wikijs(query)
-        for _ in xpath(data, 'data/pages/tags'):
+        for _ in self.stream_wikijs(query, 'data/pages/tags', timeout):
             yield Tag(**_)
 
     ##############################################
@@ -1288,12 +1607,13 @@ class WikiJsApi:
 
     ##############################################
 
-    def build_asset_tree(self) -> Node:
+    def build_asset_tree(self, root: Node = None) -> Node:
         # We cannot implement a progress bar since we don't know the number of nodes.
         # A workaround would be to save the number of nodes in a config file.
         # And to use it for the next run.
 
-        root = Node()
+        if root is None:
+            root = Node()
 
         def process_folder(parent: Node, folder_id: int) -> None:
             for _ in self.list_asset_subfolder(folder_id):
@@ -1332,9 +1652,7 @@ class WikiJsApi:
             },
             'query': Q.LINKS,
         }
-        data = self.query_wikijs(query)
-        # pprint(data)
-        for _ in xpath(data, 'data/pages/links'):
+        for _ in self.stream_wikijs(query, 'data/pages/links'):
             link = PageLinkItem(**_)
             if link.links:
                 yield link
@@ -0,0 +1,250 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Bulk operations on pages.
+
+The pages are fetched by batches using `WikiJsApi.pages_by_path`, and the batches are run
+concurrently by a worker pool.  Files are written atomically.
+
+"""
+
+####################################################################################################
+
+__all__ = ['dump_pages', 'fetch_pages', 'page_files', 'publish_pages', 'PublishSummary', 'RateLimiter', 'write_atomic']
+
+####################################################################################################
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .WikiJsApi import WikiJsApi, ApiError, BasePage, ConflictError, Page, PageListItem
+from .printer import printc
+
+####################################################################################################
+
+BATCH_SIZE = 16   # pages per request
+WORKERS = 4
+
+TMP_PREFIX = '.wikijs-'
+
+MANIFEST = '.wikijs-manifest.json'
+PUBLISH_RATE = 5   # mutations per s
+
+####################################################################################################
+
+def write_atomic(path: Path, data: bytes, mtime: float = None) -> None:
+    """Write to a temporary file then rename it, thus a reader never sees a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(TMP_PREFIX + path.name)
+    tmp_path.write_bytes(data)
+    if mtime is not None:
+        os.utime(tmp_path, (mtime, mtime))
+    os.replace(tmp_path, path)
+
+def page_files(src: Path) -> Iterator[Path]:
+    """Yield the exported pages found in `src`"""
+    for path in sorted(Path(src).rglob('*')):
+        if path.is_file() and not path.name.startswith(TMP_PREFIX) and path.suffix in ('.md', '.txt'):
+            yield path
+
+####################################################################################################
+
+def _fetch_batch(api: WikiJsApi, locale: str, paths: list[str]) -> list[Page]:
+    try:
+        return api.pages_by_path(paths, locale, profile='metadata', content=True)
+    except ApiError:
+        # a page was deleted or moved meanwhile, fetch them one by one
+        pages = []
+        for path in paths:
+            try:
+                pages.append(api.page(path, locale, profile='metadata', content=True, cache=False))
+            except ApiError as e:
+                printc(f"<red>Cannot fetch</red> <green>{path}</green>: {e}")
+        return pages
+
+def fetch_pages(
+        api: WikiJsApi,
+        pages: Iterable[PageListItem],
+        batch_size: int = BATCH_SIZE,
+        workers: int = WORKERS,
+) -> Iterator[Page]:
+    """Fetch the pages with their content, in the order the batches complete"""
+    by_locale = {}
+    for _ in pages:
+        by_locale.setdefault(_.locale, []).append(_.path_str)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk') as executor:
+        futures = [
+            executor.submit(_fetch_batch, api, locale, paths[i:i + batch_size])
+            for locale, paths in by_locale.items()
+            for i in range(0, len(paths), batch_size)
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+####################################################################################################
+
+def dump_pages(
+        api: WikiJsApi,
+        pages: Iterable[PageListItem],
+        dst: Path | str,
+        overwrite: bool = False,
+        batch_size: int = BATCH_SIZE,
+        workers: int = WORKERS,
+) -> list[Path]:
+    """Dump the pages in `dst` using the layout of `sync.sync` and return the written files"""
+    dst = Path(dst)
+    to_fetch = []
+    for page in pages:
+        file_path = BasePage.file_path_impl(dst, page.locale, page.path_str, page.contentType)
+        if not overwrite and file_path.exists():
+            printc(f"<red>File exists</red> {file_path}")
+        else:
+            to_fetch.append(page)
+    written = []
+    for page in fetch_pages(api, to_fetch, batch_size, workers):
+        file_path = page.file_path(dst)
+        write_atomic(file_path, page.bytes_data, page.updated_at.timestamp())
+        written.append(file_path)
+    return written
+
+####################################################################################################
+
+class RateLimiter:
+
+    """Space the calls to :meth:`wait` by 1/`rate` s, across the threads"""
+
+    ##############################################
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = 0.
+
+    ##############################################
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+####################################################################################################
+
+@dataclass
+class PublishSummary:
+    created: list[Path] = field(default_factory=list)
+    updated: list[Path] = field(default_factory=list)
+    unchanged: list[Path] = field(default_factory=list)
+    conflicts: list[Path] = field(default_factory=list)
+    errors: list[tuple[Path, str]] = field(default_factory=list)
+    elapsed: float = 0
+
+####################################################################################################
+
+def _publish_page(api: WikiJsApi, page: Page, checkout_date: str, limiter: RateLimiter) -> str:
+    limiter.wait()
+    if page.id is None:
+        if not page.title:
+            raise ApiError("missing title")
+        response = api.create_page(page)
+        action = 'created'
+    else:
+        response = api.update_page(page, checkout_date=checkout_date)
+        action = 'updated'
+    if not response.succeeded:
+        raise ApiError(response.message)
+    return action
+
+
+def publish_pages(
+        api: WikiJsApi,
+        src: Path | str,
+        dryrun: bool = False,
+        workers: int = WORKERS,
+        rate: float = PUBLISH_RATE,
+) -> PublishSummary:
+    """Create or update the pages exported in `src`
+
+    A manifest stores the hash, the id and the updatedAt of the published files, thus an untouched
+    file is skipped, a created page is then updated and the conflicts are checked against the last
+    publication.  Without manifest entry, a file is untouched if its mtime is its updatedAt, as
+    written by `dump_pages`.
+    """
+    start = time.monotonic()
+    src = Path(src).expanduser().resolve()
+    manifest_path = src.joinpath(MANIFEST)
+    manifest = {}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding='utf8'))
+
+    summary = PublishSummary()
+    jobs = []
+    for path in page_files(src):
+        key = str(path.relative_to(src))
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = manifest.get(key)
+        if entry is not None and entry['hash'] == digest:
+            summary.unchanged.append(path)
+            continue
+        try:
+            page = Page.import_(data.decode('utf8'), api)
+        except (ValueError, TypeError, IndexError) as e:
+            summary.errors.append((path, f"invalid file: {e}"))
+            continue
+        page.id = page.id or None
+        checkout_date = page.updatedAt or None
+        if entry is not None:
+            # the header is older than the last publication
+            if page.id is None:
+                page.id = entry['id']
+            checkout_date = entry['updatedAt']
+        elif page.updatedAt and path.stat().st_mtime == page.updated_at.timestamp():
+            manifest[key] = dict(hash=digest, id=page.id, updatedAt=page.updatedAt)
+            summary.unchanged.append(path)
+            continue
+        jobs.append((path, key, digest, page, checkout_date))
+
+    if dryrun:
+        for path, key, digest, page, checkout_date in jobs:
+            (summary.created if page.id is None else summary.updated).append(path)
+        summary.elapsed = time.monotonic() - start
+        return summary
+
+    limiter = RateLimiter(rate)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='publish') as executor:
+        futures = {
+            executor.submit(_publish_page, api, page, checkout_date, limiter): (path, key, digest, page)
+            for path, key, digest, page, checkout_date in jobs
+        }
+        for future in as_completed(futures):
+            path, key, digest, page = futures[future]
+            try:
+                action = future.result()
+            except ConflictError:
+                summary.conflicts.append(path)
+                continue
+            except Exception as e:
+                # for example a network error, the other pages are published
+                summary.errors.append((path, str(e)))
+                continue
+            getattr(summary, action).append(path)
+            manifest[key] = dict(hash=digest, id=page.id, updatedAt=page.updatedAt)
+
+    write_atomic(manifest_path, json.dumps(manifest, indent=2).encode('utf8'))
+    summary.elapsed = time.monotonic() - start
+    return summary
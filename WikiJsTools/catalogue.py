@@ -0,0 +1,272 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""In-memory page catalogue.
+
+The catalogue is loaded once from `list_pages` and stored column-wise, thus filters and sorts run
+locally on plain lists and arrays.  Tags are stored as an integer bitset per page.
+
+Filters take and return a list of row indices, so they can be chained::
+
+    rows = catalogue.with_prefix('foo/')
+    rows = catalogue.with_tags(('draft',), rows)
+    for page in catalogue.pages(catalogue.sort(rows, 'updated', reverse=True)):
+        ...
+
+"""
+
+####################################################################################################
+
+__all__ = ['PageCatalogue']
+
+####################################################################################################
+
+from array import array
+from datetime import datetime
+from time import time
+from typing import Iterable, Iterator
+import sys
+
+from .WikiJsApi import WikiJsApi, PageListItem
+from .unicode import usort_key
+
+####################################################################################################
+
+def _timestamp(date: str) -> float:
+    if date:
+        return datetime.fromisoformat(date).timestamp()
+    return 0.
+
+####################################################################################################
+
+class PageCatalogue:
+
+    REFRESH_BATCH = 100
+
+    ##############################################
+
+    def __init__(self, api: WikiJsApi) -> None:
+        self._api = api
+        self.clear()
+
+    ##############################################
+
+    def clear(self) -> None:
+        self._ids = array('q')
+        self._paths = []
+        self._lower_paths = []
+        self._locales = []
+        self._titles = []
+        self._descriptions = []
+        self._content_types = []
+        self._flags = []   # (isPublished, isPrivate, privateNS)
+        self._created_at = []
+        self._updated_at = []
+        self._created = array('d')
+        self._updated = array('d')
+        self._tag_sets = []
+        self._tag_bits = {}
+        self._folded_tag_masks = {}   # case-folded tag -> bitset of the tags
+        self._row_by_id = {}
+        self._last_updated = 0.
+        self._loaded_at = None
+
+    ##############################################
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def loaded_at(self) -> float | None:
+        return self._loaded_at
+
+    @property
+    def age(self) -> float:
+        if self._loaded_at is None:
+            return float('inf')
+        return time() - self._loaded_at
+
+    @property
+    def all(self) -> list[int]:
+        return list(range(len(self._ids)))
+
+    ##############################################
+
+    def _tag_set(self, tags: list[str]) -> int:
+        bitset = 0
+        for tag in tags or ():
+            bit = self._tag_bits.get(tag)
+            if bit is None:
+                bit = self._tag_bits[tag] = len(self._tag_bits)
+                key = tag.casefold()
+                self._folded_tag_masks[key] = self._folded_tag_masks.get(key, 0) | 1 << bit
+            bitset |= 1 << bit
+        return bitset
+
+    def _tags_for(self, bitset: int) -> list[str]:
+        return [tag for tag, bit in self._tag_bits.items() if bitset >> bit & 1]
+
+    ##############################################
+
+    def _set_row(self, row: int, page: PageListItem) -> None:
+        values = (
+            (self._ids, page.id),
+            (self._paths, page.path_str),
+            (self._lower_paths, page.path_str.lower()),
+            (self._locales, sys.intern(page.locale)),
+            (self._titles, page.title),
+            (self._descriptions, page.description),
+            (self._content_types, page.contentType),
+            (self._flags, (page.isPublished, page.isPrivate, page.privateNS)),
+            (self._created_at, page.createdAt),
+            (self._updated_at, page.updatedAt),
+            (self._created, _timestamp(page.createdAt)),
+            (self._updated, _timestamp(page.updatedAt)),
+            (self._tag_sets, self._tag_set(page.tags)),
+        )
+        if row == len(self._ids):
+            for column, value in values:
+                column.append(value)
+            self._row_by_id[page.id] = row
+        else:
+            for column, value in values:
+                column[row] = value
+        self._last_updated = max(self._last_updated, self._updated[row])
+
+    ##############################################
+
+    def load(self) -> None:
+        self.clear()
+        for page in self._api.list_pages():
+            self._set_row(len(self._ids), page)
+        self._loaded_at = time()
+
+    ##############################################
+
+    def refresh(self) -> list[int]:
+        """Fetch the pages updated since the last load and return the changed rows
+
+        The catalogue is reloaded if pages were deleted, they are found by comparing the ids.
+        """
+        if self._loaded_at is None:
+            self.load()
+            return self.all
+        changed = []
+        limit = self.REFRESH_BATCH
+        while True:
+            pages = list(self._api.list_pages(order_by='UPDATED', reverse=True, limit=limit))
+            new_pages = [_ for _ in pages if _timestamp(_.updatedAt) > self._last_updated]
+            if len(new_pages) < len(pages) or len(pages) < limit:
+                break
+            limit *= 2
+        for page in new_pages:
+            row = self._row_by_id.get(page.id, len(self._ids))
+            self._set_row(row, page)
+            changed.append(row)
+        # a deletion and a creation can leave the number of pages unchanged
+        if self._row_by_id.keys() - set(self._api.page_ids()):
+            self.load()
+            return self.all
+        self._loaded_at = time()
+        return changed
+
+    ##############################################
+
+    def page(self, row: int) -> PageListItem:
+        is_published, is_private, private_ns = self._flags[row]
+        return PageListItem(
+            self._api,
+            id=self._ids[row],
+            path=self._paths[row],
+            locale=self._locales[row],
+            title=self._titles[row],
+            description=self._descriptions[row],
+            contentType=self._content_types[row],
+            isPublished=is_published,
+            isPrivate=is_private,
+            privateNS=private_ns,
+            createdAt=self._created_at[row],
+            updatedAt=self._updated_at[row],
+            tags=self._tags_for(self._tag_sets[row]),
+        )
+
+    def pages(self, rows: Iterable[int] = None) -> Iterator[PageListItem]:
+        if rows is None:
+            rows = range(len(self._ids))
+        for _ in rows:
+            yield self.page(_)
+
+    def row_for_id(self, id: int) -> int | None:
+        return self._row_by_id.get(id)
+
+    @property
+    def ids(self) -> array:
+        return self._ids
+
+    @property
+    def paths(self) -> list[str]:
+        return self._paths
+
+    ##############################################
+    #
+    # Filters
+    #
+
+    def _rows(self, rows: list[int] | None) -> Iterable[int]:
+        return range(len(self._ids)) if rows is None else rows
+
+    def with_path(self, pattern: str, rows: list[int] = None) -> list[int]:
+        """Case-insensitive path substring"""
+        pattern = pattern.lower()
+        paths = self._lower_paths
+        return [_ for _ in self._rows(rows) if pattern in paths[_]]
+
+    def with_prefix(self, prefix: str, rows: list[int] = None) -> list[int]:
+        if prefix.startswith('/'):
+            prefix = prefix[1:]
+        paths = self._paths
+        return [_ for _ in self._rows(rows) if paths[_].startswith(prefix)]
+
+    def with_locale(self, locale: str, rows: list[int] = None) -> list[int]:
+        locales = self._locales
+        return [_ for _ in self._rows(rows) if locales[_] == locale]
+
+    def with_tags(self, tags: Iterable[str], rows: list[int] = None, any_: bool = True) -> list[int]:
+        """Pages having one of the tags, or all of them if `any_` is cleared
+
+        The tags are case-insensitive, as the server does.
+        """
+        masks = [self._folded_tag_masks.get(_.casefold(), 0) for _ in tags]
+        tag_sets = self._tag_sets
+        if any_:
+            mask = 0
+            for _ in masks:
+                mask |= _
+            return [_ for _ in self._rows(rows) if tag_sets[_] & mask]
+        else:
+            return [_ for _ in self._rows(rows) if all(tag_sets[_] & mask for mask in masks)]
+
+    ##############################################
+
+    def sort(self, rows: list[int] = None, key: str = 'path', reverse: bool = False) -> list[int]:
+        match key:
+            case 'path':
+                paths = self._paths
+                key = lambda _: usort_key(paths[_])
+            case 'title':
+                titles = self._titles
+                key = lambda _: usort_key(titles[_] or '')
+            case 'created':
+                key = self._created.__getitem__
+            case 'updated':
+                key = self._updated.__getitem__
+            case 'id':
+                key = self._ids.__getitem__
+            case _:
+                raise ValueError(f'Invalid sort key {key}')
+        return sorted(self._rows(rows), key=key, reverse=reverse)
@@ -10,6 +10,8 @@ __all__ = [
     'CONFIG_PATH',
     'CONFIG_YAML_PATH',
     'CLI_HISTORY_PATH',
+    'CONTENT_CACHE_PATH',
+    'DAEMON_SOCKET_PATH',
     'load_config', 
 ]
 
@@ -18,18 +20,27 @@ __all__ = [
 from dataclasses import dataclass
 from pathlib import Path
 
-from yaml import load
-from yaml import Loader
-
 ####################################################################################################
 
 CONFIG_PATH = Path('~/.config/wikijs-cli').expanduser()
 CONFIG_YAML_PATH = CONFIG_PATH.joinpath('config.yaml')
 CLI_HISTORY_PATH = CONFIG_PATH.joinpath('cli_history')
+CONTENT_CACHE_PATH = CONFIG_PATH.joinpath('cache', 'content')
+DAEMON_SOCKET_PATH = CONFIG_PATH.joinpath('daemon.sock')
 
 # DEBUG = True
 DEBUG = False
 
+# Defaults of wikijs-fuse, defined here so the script doesn't import the fuse module to parse its
+# arguments
+FUSE_ENTRY_TIMEOUT = 60   # s
+FUSE_ATTR_TIMEOUT = 60   # s
+FUSE_NEGATIVE_TIMEOUT = 10   # s
+FUSE_PREFETCH_DEPTH = 64   # number of pages prefetched per readdir, 0 to disable
+FUSE_MIRROR_REFRESH_TIME = 60   # s
+FUSE_ASSET_BLOCK_SIZE = 256 * 1024   # bytes per range request
+FUSE_ASSET_CACHE_SIZE = 128   # blocks
+
 ####################################################################################################
 
 @dataclass
@@ -40,6 +51,9 @@ class Config:
 ####################################################################################################
 
 def load_config(path: Path | str = CONFIG_YAML_PATH) -> Config:
+    # yaml is loaded on first use
+    from yaml import load
+    from yaml import Loader
     with open(path) as fh:
         _ = load(fh, Loader=Loader)
     return Config(**_)
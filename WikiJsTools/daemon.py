@@ -0,0 +1,202 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Long-running daemon holding a `Cli`, i.e. the API client, its caches, the trees and the
+connection pool, and answering the commands of thin clients over a Unix socket.
+
+The protocol is one JSON line per message.  The client sends ``{"command": "dump /foo"}``, with
+an optional ``"format"`` of the listings, see `Cli.FORMATS`.  The daemon answers with
+``{"printc": markup}`` and ``{"print": text}`` messages, then ``{"status": int}``.
+``{"shutdown": true}`` stops the daemon.
+
+The commands are serialized and each one starts at the root of the trees, as a new ``wikijs-cli
+-c`` would do.  Use the ``reset`` command to reload the trees.
+
+"""
+
+####################################################################################################
+
+__all__ = ['WikiJsDaemon', 'run_command', 'send_command', 'stop_daemon']
+
+####################################################################################################
+
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+import io
+import json
+import os
+import socket
+import sys
+import threading
+
+from . import config
+from .printer import capture, printc
+
+####################################################################################################
+
+class _Writer(io.TextIOBase):
+
+    """Send the text written on the output of the Cli to the client"""
+
+    ##############################################
+
+    def __init__(self, send) -> None:
+        self._send = send
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self._send(print=text)
+        return len(text)
+
+####################################################################################################
+
+class _Handler(StreamRequestHandler):
+
+    ##############################################
+
+    def _send(self, **message) -> None:
+        self.wfile.write(json.dumps(message).encode('utf8') + b'\n')
+        self.wfile.flush()
+
+    ##############################################
+
+    def handle(self) -> None:
+        daemon = self.server.daemon
+        try:
+            request = json.loads(self.rfile.readline())
+        except json.JSONDecodeError as e:
+            self._send(printc=f'<red>Invalid request</red> {e}', status=2)
+            return
+        try:
+            if request.get('shutdown'):
+                self._send(status=0)
+                daemon.shutdown()
+            elif 'command' in request:
+                status = daemon.run(request['command'], self._send, request.get('format', 'text'))
+                self._send(status=status)
+            else:
+                self._send(status=0)
+        except BrokenPipeError:
+            # the client has gone
+            pass
+
+####################################################################################################
+
+def run_command(cli: 'Cli', command: str) -> int:
+    """Run a command line and return an exit status"""
+    cli._errors = 0
+    cli.run(command)
+    return 1 if cli._errors else 0
+
+####################################################################################################
+
+class WikiJsDaemon:
+
+    ##############################################
+
+    def __init__(self, cli: 'Cli', path: Path | str = config.DAEMON_SOCKET_PATH) -> None:
+        self._cli = cli
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._server = None
+
+    ##############################################
+
+    def run(self, command: str, send, output_format: str = 'text') -> int:
+        with self._lock:
+            cli = self._cli
+            if output_format not in cli.FORMATS:
+                send(printc=f'<red>Invalid format</red> {output_format}')
+                return 2
+            cli._current_path = cli._page_tree
+            cli._current_asset_folder = cli._asset_tree
+            cli._format = output_format
+            # the output is passed to the Cli, sys.stdout is shared by all the threads
+            cli._stdout = _Writer(send)
+            cli._sink = sink = lambda message: send(printc=message)
+            try:
+                with capture(sink):
+                    return run_command(cli, command)
+            finally:
+                cli._format = 'text'
+                cli._stdout = cli._sink = None
+
+    ##############################################
+
+    def serve_forever(self) -> None:
+        if self._path.exists():
+            if _connect(self._path) is not None:
+                raise NameError(f'A daemon is already listening on {self._path}')
+            # stale socket
+            self._path.unlink()
+        printc('<red>Build tree...</red>')
+        self._cli._init()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        # the socket gives access to the API key
+        umask = os.umask(0o177)
+        try:
+            self._server = ThreadingUnixStreamServer(str(self._path), _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon_threads = True
+        self._server.daemon = self
+        printc(f'<green>Listening on</green> <blue>{self._path}</blue>')
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            self._path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        # called from a handler thread, serve_forever runs in the main thread
+        threading.Thread(target=self._server.shutdown).start()
+
+####################################################################################################
+
+def _connect(path: Path | str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+def _request(path: Path | str, request: dict) -> int | None:
+    sock = _connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile('rwb') as fh:
+        fh.write(json.dumps(request).encode('utf8') + b'\n')
+        fh.flush()
+        for line in fh:
+            message = json.loads(line)
+            if 'printc' in message:
+                printc(message['printc'])
+            if 'print' in message:
+                sys.stdout.write(message['print'])
+            if 'status' in message:
+                sys.stdout.flush()
+                return message['status']
+    # the daemon has gone
+    return 1
+
+def send_command(command: str, path: Path | str = config.DAEMON_SOCKET_PATH, output_format: str = 'text') -> int | None:
+    """Run a command in the daemon and print its output
+
+    Return the exit status, or None if no daemon is listening.
+    """
+    return _request(path, dict(command=command, format=output_format))
+
+def stop_daemon(path: Path | str = config.DAEMON_SOCKET_PATH) -> bool:
+    return _request(path, dict(shutdown=True)) is not None
@@ -11,19 +11,23 @@ __all__ = ['date2str']
 ####################################################################################################
 
 from datetime import datetime
-from dateutil import tz
+from functools import cache
 
 ####################################################################################################
 
-UTC_ZONE = tz.tzutc()
-LOCAL_ZONE = tz.tzlocal()
+@cache
+def _zones() -> tuple:
+    # dateutil is loaded on first use
+    from dateutil import tz
+    return tz.tzutc(), tz.tzlocal()
 
 ####################################################################################################
 
 def date2str(date: datetime, local: bool = True) -> str:
+    utc_zone, local_zone = _zones()
     if local:
-        _ = LOCAL_ZONE
+        _ = local_zone
     else:
-        _ = UTC_ZONE
+        _ = utc_zone
     _ = date.astimezone(_)
     return _.strftime('%Y/%m/%d %H:%M:%S')
@@ -0,0 +1,469 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Line diff and cache of the wiki contents.
+
+The diff hashes the lines to integers, trims the common prefix and suffix, and runs the Myers
+algorithm.  Common runs are compared by slices, thus the cost depends of the size of the changes,
+not of the size of the page.  Myers is quadratic in the number of changes, thus if there are many
+of them the sequences are split on anchors, the lines that are unique in both of them (patience
+diff), then the windows of lines that are unique, e.g. for a table having few distinct rows.  The
+gaps without anchors are split by the linear space variant of Myers, on the middle snake.
+
+The wiki contents are cached on disk by page id and updatedAt, a page is then fetched again only
+if it was updated.
+
+"""
+
+####################################################################################################
+
+__all__ = ['ContentCache', 'diff_directory', 'LineMatcher', 'unified_diff']
+
+####################################################################################################
+
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+import difflib
+
+from . import config
+from .WikiJsApi import WikiJsApi, Page, PageListItem
+from .bulk import fetch_pages, page_files, write_atomic
+from .catalogue import PageCatalogue
+
+####################################################################################################
+
+class ContentCache:
+
+    """Disk cache of the page contents keyed by id and updatedAt"""
+
+    ##############################################
+
+    def __init__(self, path: Path | str = config.CONTENT_CACHE_PATH) -> None:
+        self._path = Path(path)
+
+    ##############################################
+
+    def _file_path(self, id: int, updated_at: str) -> Path:
+        updated_at = updated_at.replace(':', '-')
+        return self._path.joinpath(f'{id}@{updated_at}')
+
+    ##############################################
+
+    def get(self, id: int, updated_at: str) -> str | None:
+        try:
+            return self._file_path(id, updated_at).read_text(encoding='utf8')
+        except FileNotFoundError:
+            return None
+
+    def put(self, id: int, updated_at: str, content: str) -> None:
+        # remove the previous versions
+        for _ in self._path.glob(f'{id}@*'):
+            _.unlink(missing_ok=True)
+        write_atomic(self._file_path(id, updated_at), content.encode('utf8'))
+
+    ##############################################
+
+    def content(self, page: Page | PageListItem) -> str:
+        """Return the content of the page, it is fetched if the cache is outdated"""
+        content = self.get(page.id, page.updatedAt)
+        if content is None:
+            content = page.content
+            self.put(page.id, page.updatedAt, content)
+        return content
+
+####################################################################################################
+
+def _unique_anchors(a: list[int], b: list[int], window: int = 1) -> list[tuple[int, int]]:
+    """Return the longest increasing sequence of the windows of lines unique in `a` and `b`
+
+    A pair (i, j) means a[i:i + window] == b[j:j + window].
+    """
+    if window > 1:
+        a = list(zip(*(a[_:] for _ in range(window))))
+        b = list(zip(*(b[_:] for _ in range(window))))
+    count_a = Counter(a)
+    count_b = Counter(b)
+    unique = {_ for _, count in count_a.items() if count == 1 and count_b.get(_) == 1}
+    j_of = {_: j for j, _ in enumerate(b) if _ in unique}
+    pairs = [(i, j_of[_]) for i, _ in enumerate(a) if _ in unique]
+    # patience sorting on j
+    tails = []   # j of the last pair of the piles
+    piles = []   # index of the last pair of the piles
+    previous = [None] * len(pairs)
+    for index, (i, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k:
+            previous[index] = piles[k - 1]
+        if k == len(tails):
+            tails.append(j)
+            piles.append(index)
+        else:
+            tails[k] = j
+            piles[k] = index
+    anchors = []
+    index = piles[-1] if piles else None
+    while index is not None:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+####################################################################################################
+
+def _run_length(a: list[int], b: list[int], x: int, y: int) -> int:
+    """Return the length of the common run of a[x:] and b[y:]"""
+    # the slices are compared in C, the step grows on match and shrinks on mismatch
+    n = min(len(a) - x, len(b) - y)
+    length = 0
+    step = 1
+    while length < n:
+        step = min(step, n - length)
+        if a[x + length:x + length + step] == b[y + length:y + length + step]:
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return length
+
+####################################################################################################
+
+def _myers(a: list[int], b: list[int], a0: int, b0: int, max_d: int = None) -> list[tuple[int, int, int]] | None:
+    """Return the matching blocks of `a` and `b` shifted by `a0` and `b0`
+
+    Return None if there are more than `max_d` differences.
+    """
+    n = len(a)
+    m = len(b)
+    if max_d is None:
+        max_d = n + m
+    else:
+        max_d = min(max_d, n + m)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        # store the diagonals -d..d
+        trace.append(v[offset - d:offset + d + 1])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            if x < n and y < m and a[x] == b[y]:
+                x += _run_length(a, b, x, y)
+            v[offset + k] = x
+            if x >= n and x - k >= m:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+    # backtrack
+    blocks = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v_d = trace[d]
+        k = x - y
+        if k == -d or (k != d and v_d[k - 1 + d] < v_d[k + 1 + d]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v_d[previous_k + d] if -d <= previous_k <= d else 0
+        previous_y = previous_x - previous_k
+        size = min(x - previous_x, y - previous_y)
+        if size > 0:
+            blocks.append((a0 + x - size, b0 + y - size, size))
+        x, y = previous_x, previous_y
+    blocks.reverse()
+    return blocks
+
+####################################################################################################
+
+def _middle_snake(a: list[int], b: list[int], max_d: int) -> tuple[int, int] | None:
+    """Return a point of an optimal path of the edit graph
+
+    The forward and the reverse paths run until they overlap, thus the space is linear.  The
+    sequences must not have a common prefix or suffix.
+
+    Return None if `a` and `b` have no common line, or if the paths don't overlap after `max_d`
+    differences each.
+    """
+    # same as the bisect of diff-match-patch
+    n = len(a)
+    m = len(b)
+    ra = a[::-1]
+    rb = b[::-1]
+    max_d = min(max_d, (n + m + 1) // 2)
+    offset = max_d
+    size = 2 * max_d + 2
+    vf = [-1] * size
+    vr = [-1] * size
+    vf[offset + 1] = 0
+    vr[offset + 1] = 0
+    delta = n - m
+    # the paths overlap during the forward step if delta is odd
+    front = delta % 2 != 0
+    kf_start = kf_end = kr_start = kr_end = 0
+    for d in range(max_d):
+        for k in range(-d + kf_start, d + 1 - kf_end, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            if x < n and y < m and a[x] == b[y]:
+                length = _run_length(a, b, x, y)
+                x += length
+                y += length
+            vf[offset + k] = x
+            if x > n:
+                kf_end += 2
+            elif y > m:
+                kf_start += 2
+            elif front:
+                kr = offset + delta - k
+                if 0 <= kr < size and vr[kr] != -1 and x >= n - vr[kr]:
+                    return x, y
+        for k in range(-d + kr_start, d + 1 - kr_end, 2):
+            if k == -d or (k != d and vr[offset + k - 1] < vr[offset + k + 1]):
+                x = vr[offset + k + 1]
+            else:
+                x = vr[offset + k - 1] + 1
+            y = x - k
+            if x < n and y < m and ra[x] == rb[y]:
+                length = _run_length(ra, rb, x, y)
+                x += length
+                y += length
+            vr[offset + k] = x
+            if x > n:
+                kr_end += 2
+            elif y > m:
+                kr_start += 2
+            elif not front:
+                kf = offset + delta - k
+                if 0 <= kf < size and vf[kf] != -1:
+                    xf = vf[kf]
+                    if xf >= n - x:
+                        return xf, offset + xf - kf
+    return None
+
+####################################################################################################
+
+class LineMatcher:
+
+    """Drop-in replacement of `difflib.SequenceMatcher` for lines, see the module documentation"""
+
+    MAX_D = 200   # number of differences above which the sequences are split
+    MAX_SPLIT_D = 1000   # number of differences of the split paths above which a gap is replaced
+    ANCHOR_WINDOWS = (1, 8)   # number of lines of the anchors, tried in this order
+
+    ##############################################
+
+    def __init__(self, a: list[str], b: list[str]) -> None:
+        self.a = a
+        self.b = b
+        self._opcodes = None
+
+    ##############################################
+
+    def _diff(
+            self,
+            a: list[int],
+            b: list[int],
+            a0: int,
+            b0: int,
+            windows: tuple[int, ...],
+            blocks: list[tuple[int, int, int]],
+    ) -> None:
+        """Append the matching blocks of `a` and `b` shifted by `a0` and `b0`
+
+        `windows` are the anchors still to try, the gaps between the anchors use the next ones.
+        """
+        n, m = len(a), len(b)
+        prefix = _run_length(a, b, 0, 0)
+        if prefix == n == m:
+            blocks.append((a0, b0, prefix))
+            return
+        suffix = _run_length(a[prefix:][::-1], b[prefix:][::-1], 0, 0)
+        blocks.append((a0, b0, prefix))
+        a = a[prefix:n - suffix]
+        b = b[prefix:m - suffix]
+        a0 += prefix
+        b0 += prefix
+        if a and b:
+            _ = _myers(a, b, a0, b0, self.MAX_D)
+            if _ is not None:
+                blocks.extend(_)
+            else:
+                for index, window in enumerate(windows):
+                    anchors = _unique_anchors(a, b, window)
+                    if anchors:
+                        self._diff_anchors(a, b, a0, b0, anchors, window, windows[index + 1:], blocks)
+                        break
+                else:
+                    # a gap having too many differences is replaced, e.g. a rewritten page
+                    _ = _middle_snake(a, b, self.MAX_SPLIT_D)
+                    if _ is not None:
+                        x, y = _
+                        self._diff(a[:x], b[:y], a0, b0, windows, blocks)
+                        self._diff(a[x:], b[y:], a0 + x, b0 + y, windows, blocks)
+        blocks.append((a0 + len(a), b0 + len(b), suffix))
+
+    def _diff_anchors(
+            self,
+            a: list[int],
+            b: list[int],
+            a0: int,
+            b0: int,
+            anchors: list[tuple[int, int]],
+            window: int,
+            windows: tuple[int, ...],
+            blocks: list[tuple[int, int, int]],
+    ) -> None:
+        i0 = j0 = 0
+        for i, j in anchors:
+            if i >= i0 and j >= j0:
+                self._diff(a[i0:i], b[j0:j], a0 + i0, b0 + j0, windows, blocks)
+                blocks.append((a0 + i, b0 + j, window))
+            elif i - j == i0 - j0 and i + window > i0:
+                # overlaps the previous anchor on the same diagonal
+                blocks.append((a0 + i0, b0 + j0, i + window - i0))
+            else:
+                continue
+            i0, j0 = i + window, j + window
+        self._diff(a[i0:], b[j0:], a0 + i0, b0 + j0, windows, blocks)
+
+    def _blocks(self) -> list[tuple[int, int, int]]:
+        # hash the lines to integers
+        ids = {_: i for i, _ in enumerate(set(self.a) | set(self.b))}
+        a = list(map(ids.__getitem__, self.a))
+        b = list(map(ids.__getitem__, self.b))
+        blocks = []
+        self._diff(a, b, 0, 0, self.ANCHOR_WINDOWS, blocks)
+        return blocks
+
+    ##############################################
+
+    def get_matching_blocks(self) -> list[tuple[int, int, int]]:
+        # merge the adjacent blocks
+        blocks = []
+        for i, j, size in self._blocks():
+            if not size:
+                continue
+            if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+                blocks[-1][2] += size
+            else:
+                blocks.append([i, j, size])
+        blocks.append([len(self.a), len(self.b), 0])
+        return [tuple(_) for _ in blocks]
+
+    ##############################################
+
+    def get_opcodes(self) -> list[tuple[str, int, int, int, int]]:
+        if self._opcodes is None:
+            opcodes = []
+            i = j = 0
+            for ai, bj, size in self.get_matching_blocks():
+                if i < ai and j < bj:
+                    opcodes.append(('replace', i, ai, j, bj))
+                elif i < ai:
+                    opcodes.append(('delete', i, ai, j, bj))
+                elif j < bj:
+                    opcodes.append(('insert', i, ai, j, bj))
+                i, j = ai + size, bj + size
+                if size:
+                    opcodes.append(('equal', ai, i, bj, j))
+            self._opcodes = opcodes
+        return self._opcodes
+
+    get_grouped_opcodes = difflib.SequenceMatcher.get_grouped_opcodes
+
+####################################################################################################
+
+def _format_range(start: int, stop: int) -> str:
+    # same as difflib
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+def unified_diff(
+        a: list[str],
+        b: list[str],
+        fromfile: str = '',
+        tofile: str = '',
+        n: int = 3,
+) -> Iterator[str]:
+    """Same output as `difflib.unified_diff` with ``lineterm=''``"""
+    started = False
+    for group in LineMatcher(a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}'
+            yield f'+++ {tofile}'
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+####################################################################################################
+
+def diff_directory(
+        api: WikiJsApi,
+        catalogue: PageCatalogue,
+        src: Path | str,
+        cache: ContentCache = None,
+) -> Iterator[tuple[Path, Page, str | None]]:
+    """Yield (file path, file page, wiki content) for the exported pages that differ from the wiki
+
+    The wiki content is None if the page doesn't exist.  The contents that are not cached are
+    fetched by batches.
+    """
+    if cache is None:
+        cache = ContentCache()
+    wiki_pages = {(_.locale, _.path_str): _ for _ in catalogue.pages()}
+    files = []
+    contents = {}
+    to_fetch = []
+    for path in page_files(src):
+        file_page = Page.read(path, api)
+        wiki_page = wiki_pages.get((file_page.locale, file_page.path_str))
+        if wiki_page is None:
+            yield path, file_page, None
+            continue
+        files.append((path, file_page, wiki_page))
+        content = cache.get(wiki_page.id, wiki_page.updatedAt)
+        if content is None:
+            to_fetch.append(wiki_page)
+        else:
+            contents[wiki_page.id] = content
+    for page in fetch_pages(api, to_fetch):
+        cache.put(page.id, page.updatedAt, page.content)
+        contents[page.id] = page.content
+    for path, file_page, wiki_page in files:
+        content = contents.get(wiki_page.id)
+        if content is not None and content != file_page.content:
+            yield path, file_page, content
@@ -14,46 +14,532 @@
 
 ####################################################################################################
 
-__all__ = ['mount']
+__all__ = ['mount', 'mount_mirror']
 
 ####################################################################################################
 
 # import logging
 
-from collections import defaultdict
-from errno import ENOENT, ENODATA
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from errno import EIO, ENOENT, ENODATA, EROFS
 from pathlib import Path, PurePosixPath
 from stat import S_IFDIR, S_IFLNK, S_IFREG
 from time import time
+import os
+import threading
 
 from fuse import FUSE, FuseOSError, Operations, LoggingMixIn
 
-from .WikiJsApi import WikiJsApi, ApiError, Page
+from . import config
+from .WikiJsApi import WikiJsApi, ApiError, Asset, AssetFolder, ConflictError, Page, PageTreeItem
+from .mirror import Mirror
 
 ####################################################################################################
 
-def mount(api: WikiJsApi, path: str) -> None:
-    fuse = FUSE(WikiJsFuse(api), path, foreground=True, allow_other=True)
+ENTRY_TIMEOUT = config.FUSE_ENTRY_TIMEOUT
+ATTR_TIMEOUT = config.FUSE_ATTR_TIMEOUT
+NEGATIVE_TIMEOUT = config.FUSE_NEGATIVE_TIMEOUT
+
+PREFETCH_DEPTH = config.FUSE_PREFETCH_DEPTH
+PREFETCH_BATCH_SIZE = 16   # pages per request
+PREFETCH_WORKERS = 4
+PREFETCH_CACHE_SIZE = 256   # pages
+
+RETAINED_FILES = 32   # released files kept in memory
+ENTRY_CACHE_SIZE = 10000   # attributes and missing paths kept in memory
+
+MIRROR_REFRESH_TIME = config.FUSE_MIRROR_REFRESH_TIME
+
+ASSET_ROOT = '_assets'   # mount point of the assets
+ASSET_BLOCK_SIZE = config.FUSE_ASSET_BLOCK_SIZE
+ASSET_CACHE_SIZE = config.FUSE_ASSET_CACHE_SIZE
+
+####################################################################################################
+
+def mount(
+        api: WikiJsApi,
+        path: str,
+        entry_timeout: float = ENTRY_TIMEOUT,
+        attr_timeout: float = ATTR_TIMEOUT,
+        negative_timeout: float = NEGATIVE_TIMEOUT,
+        prefetch_depth: int = PREFETCH_DEPTH,
+        asset_cache_size: int = ASSET_CACHE_SIZE,
+        multithreaded: bool = True,
+) -> None:
+    # The kernel and the file system caches use the same timeouts
+    wfuse = WikiJsFuse(api, entry_timeout, attr_timeout, negative_timeout, prefetch_depth, asset_cache_size)
+    fuse = FUSE(
+        wfuse,
+        path,
+        foreground=True,
+        allow_other=True,
+        # operations are then run concurrently, the file tables and the caches are locked
+        nothreads=not multithreaded,
+        entry_timeout=entry_timeout,
+        attr_timeout=attr_timeout,
+        negative_timeout=negative_timeout,
+    )
+
+def mount_mirror(
+        api: WikiJsApi,
+        path: str,
+        mirror_path: str,
+        locale: str = 'fr',
+        refresh_time: float = MIRROR_REFRESH_TIME,
+        multithreaded: bool = True,
+) -> None:
+    """Mount read-only the local mirror of the wiki, see `mirror.Mirror`"""
+    mirror = Mirror(api, mirror_path)
+    print(f"Update mirror {mirror.path}")
+    mirror.update()
+    mirror.start(refresh_time)
+    fuse = FUSE(
+        MirrorFuse(mirror, locale),
+        path,
+        foreground=True,
+        allow_other=True,
+        ro=True,
+        nothreads=not multithreaded,
+        # the page cache is dropped when the mtime or the size changes
+        auto_cache=True,
+    )
+    mirror.stop()
+
+####################################################################################################
+
+class EntryCache:
+
+    """Directory entry and attribute cache
+
+    Directory listings are cached for `entry_timeout`, file attributes for `attr_timeout` and
+    missing paths for `negative_timeout`.  The attributes and the missing paths are bounded by
+    `cache_size`, the expired ones are pruned on insert.
+    """
+
+    ##############################################
+
+    def __init__(
+            self,
+            api: WikiJsApi,
+            entry_timeout: float = ENTRY_TIMEOUT,
+            attr_timeout: float = ATTR_TIMEOUT,
+            negative_timeout: float = NEGATIVE_TIMEOUT,
+            cache_size: int = ENTRY_CACHE_SIZE,
+    ) -> None:
+        self._api = api
+        self._entry_timeout = entry_timeout
+        self._attr_timeout = attr_timeout
+        self._negative_timeout = negative_timeout
+        self._cache_size = int(cache_size)
+        self._lock = threading.Lock()
+        self.clear()
+
+    ##############################################
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dirs = {}   # path -> (time, {name: PageTreeItem})
+            # in insertion order, thus the oldest first
+            self._attrs = OrderedDict()   # path -> (time, stat)
+            self._negatives = OrderedDict()   # path -> (time, None)
+
+    ##############################################
+
+    @staticmethod
+    def _is_fresh(cached_time: float, timeout: float) -> bool:
+        return time() - cached_time <= timeout
+
+    def _insert(self, cache: OrderedDict, path: str, value, timeout: float) -> None:
+        # called with the lock
+        now = time()
+        cache[path] = (now, value)
+        cache.move_to_end(path)
+        while cache:
+            oldest = next(iter(cache.values()))
+            if len(cache) > self._cache_size or now - oldest[0] > timeout:
+                cache.popitem(last=False)
+            else:
+                break
+
+    ##############################################
+
+    def listdir(self, path: PurePosixPath) -> dict[str, PageTreeItem]:
+        key = str(path)
+        with self._lock:
+            cached = self._dirs.get(key)
+        if cached is not None and self._is_fresh(cached[0], self._entry_timeout):
+            return cached[1]
+        if path.parent == path:
+            folder_id = 0
+        else:
+            item = self.lookup(path)
+            if not item.isFolder:
+                raise FuseOSError(ENOENT)
+            folder_id = item.id
+        # the api cache would be redundant
+        items = {_.path.name: _ for _ in self._api.itree(folder_id, cache=False)}
+        with self._lock:
+            self._dirs[key] = (time(), items)
+        return items
+
+    ##############################################
+
+    def lookup(self, path: PurePosixPath) -> PageTreeItem:
+        key = str(path)
+        with self._lock:
+            cached = self._negatives.get(key)
+        if cached is not None and self._is_fresh(cached[0], self._negative_timeout):
+            raise FuseOSError(ENOENT)
+        try:
+            return self.listdir(path.parent)[path.name]
+        except (KeyError, FuseOSError):
+            with self._lock:
+                self._insert(self._negatives, key, None, self._negative_timeout)
+            raise FuseOSError(ENOENT)
+
+    ##############################################
+
+    def get_attr(self, path: str) -> dict | None:
+        with self._lock:
+            cached = self._attrs.get(path)
+        if cached is not None and self._is_fresh(cached[0], self._attr_timeout):
+            return cached[1]
+        return None
+
+    def set_attr(self, path: str, stat: dict) -> None:
+        with self._lock:
+            self._insert(self._attrs, path, stat, self._attr_timeout)
+
+    ##############################################
+
+    def invalidate(self, path: str) -> None:
+        path = str(path)
+        with self._lock:
+            self._attrs.pop(path, None)
+            self._negatives.pop(path, None)
+            self._dirs.pop(path, None)
+            self._dirs.pop(str(PurePosixPath(path).parent), None)
+
+####################################################################################################
+
+class Prefetcher:
+
+    """Read-ahead of the pages listed by readdir
+
+    The pages are fetched in the background by a worker pool, several per request, and stored in a
+    bounded LRU cache.  Thus a crawl of the mount doesn't wait a round trip per file.  A page is
+    served for `timeout`, and discarded when it is written.
+    """
+
+    ##############################################
+
+    def __init__(
+            self,
+            api: WikiJsApi,
+            depth: int = PREFETCH_DEPTH,
+            timeout: float = ATTR_TIMEOUT,
+            batch_size: int = PREFETCH_BATCH_SIZE,
+            workers: int = PREFETCH_WORKERS,
+            cache_size: int = PREFETCH_CACHE_SIZE,
+    ) -> None:
+        self._api = api
+        self._depth = int(depth)
+        self._timeout = timeout
+        self._batch_size = int(batch_size)
+        self._cache_size = int(cache_size)
+        self._cache = OrderedDict()   # path -> (time, Page)
+        self._pending = set()
+        self._lock = threading.Lock()
+        if self._depth > 0:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        else:
+            self._executor = None
+
+    ##############################################
+
+    def prefetch(self, paths: list[str]) -> None:
+        if self._executor is None:
+            return
+        with self._lock:
+            paths = [_ for _ in paths[:self._depth] if _ not in self._cache and _ not in self._pending]
+            self._pending.update(paths)
+        for i in range(0, len(paths), self._batch_size):
+            self._executor.submit(self._fetch, paths[i:i + self._batch_size])
+
+    ##############################################
+
+    def _fetch(self, paths: list[str]) -> None:
+        try:
+            pages = self._api.pages_by_path(paths, profile='metadata', content=True)
+        except Exception as e:
+            # for example a page was deleted, it will be fetched on open
+            print(f"Prefetch error: {e}")
+            pages = ()
+        now = time()
+        with self._lock:
+            for path, page in zip(paths, pages):
+                # a page discarded meanwhile was written
+                if path in self._pending:
+                    self._cache[path] = (now, page)
+                    self._cache.move_to_end(path)
+            self._pending.difference_update(paths)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    ##############################################
+
+    def get(self, path: str) -> Page | None:
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is None:
+                return None
+            if time() - cached[0] > self._timeout:
+                del self._cache[path]
+                return None
+            self._cache.move_to_end(path)
+            return cached[1]
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            self._cache.pop(path, None)
+            self._pending.discard(path)
+
+####################################################################################################
+
+class AssetTree:
+
+    """Asset folders and files, the listings are cached for `timeout`
+
+    Paths are relative to the asset root, e.g. 'folder/image.png'.
+    """
+
+    ##############################################
+
+    def __init__(self, api: WikiJsApi, timeout: float = ENTRY_TIMEOUT) -> None:
+        self._api = api
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._dirs = {}   # path -> (time, {name: AssetFolder | Asset})
+
+    ##############################################
+
+    def listdir(self, path: PurePosixPath) -> dict[str, AssetFolder | Asset]:
+        key = str(path)
+        with self._lock:
+            cached = self._dirs.get(key)
+        if cached is not None and time() - cached[0] <= self._timeout:
+            return cached[1]
+        if path.parent == path:
+            folder_id = 0
+        else:
+            item = self.lookup(path)
+            if not isinstance(item, AssetFolder):
+                raise FuseOSError(ENOENT)
+            folder_id = item.id
+        items = {_.name: _ for _ in self._api.list_asset_subfolder(folder_id)}
+        for _ in self._api.list_asset(folder_id):
+            # used as url
+            _.path = '/'.join(path.joinpath(_.filename).parts)
+            items[_.filename] = _
+        with self._lock:
+            self._dirs[key] = (time(), items)
+        return items
+
+    ##############################################
+
+    def lookup(self, path: PurePosixPath) -> AssetFolder | Asset:
+        try:
+            return self.listdir(path.parent)[path.name]
+        except KeyError:
+            raise FuseOSError(ENOENT)
+
+####################################################################################################
+
+class BlockCache:
+
+    """LRU cache of file blocks"""
+
+    ##############################################
+
+    def __init__(self, block_size: int = ASSET_BLOCK_SIZE, size: int = ASSET_CACHE_SIZE) -> None:
+        self._block_size = int(block_size)
+        self._size = int(size)
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()   # (key, index) -> bytes
+
+    @property
+    def block_size(self) -> int:
+        return self._block_size
+
+    ##############################################
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            data = self._blocks.get(key)
+            if data is not None:
+                self._blocks.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        with self._lock:
+            self._blocks[key] = data
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self._size:
+                self._blocks.popitem(last=False)
+
+####################################################################################################
+
+class AssetFile:
+
+    # Read-only file whose blocks are downloaded on demand using HTTP Range requests.
+    #  Thus reading the header of a large video doesn't download it.
+    # If the server ignores the ranges, the whole asset is kept while the file is open.
+
+    ##############################################
+
+    def __init__(self, wfuse: 'WikiJsFuse', path: str, asset: Asset) -> None:
+        self._wfuse = wfuse
+        self._path = PurePosixPath(path)
+        self._asset = asset
+        self._stat = self.asset_stat(asset)
+        self._open_count = 0
+        self._lock = threading.Lock()
+        self._content = None
+
+    ##############################################
+
+    @classmethod
+    def asset_stat(self, asset: Asset) -> dict:
+        return dict(
+            st_mode=(S_IFREG | 0o444),
+            st_ctime=asset.created_at.timestamp(),
+            st_mtime=asset.updated_at.timestamp(),
+            st_atime=time(),
+            st_nlink=1,
+            st_size=asset.fileSize,
+        )
+
+    ##############################################
+
+    @property
+    def path(self) -> PurePosixPath:
+        return self._path
+
+    @property
+    def path_str(self) -> str:
+        return str(self._path)
+
+    @property
+    def stat(self) -> dict:
+        return self._stat
+
+    # same interface as VirtualFile
+    created = False
+    dirty = False
+    is_page = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_count > 0
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._open_count += 1
+
+    def release(self) -> int:
+        with self._lock:
+            self._open_count -= 1
+            return self._open_count
+
+    def is_stale(self) -> bool:
+        return False
+
+    ##############################################
+
+    def read(self, size: int, offset: int) -> bytes:
+        end = min(offset + size, self._asset.fileSize)
+        if offset >= end:
+            return b''
+        if self._content is not None:
+            return self._content[offset:end]
+        cache = self._wfuse._blocks
+        block_size = cache.block_size
+        first = offset // block_size
+        last = (end - 1) // block_size
+        # a new version of the asset has another key
+        key = (self._asset.path, self._asset.updatedAt)
+        blocks = {}
+        missing = []
+        for i in range(first, last + 1):
+            data = cache.get((key, i))
+            if data is None:
+                missing.append(i)
+            else:
+                blocks[i] = data
+        # fetch each run of consecutive missing blocks using one request
+        while missing:
+            run = 1
+            while run < len(missing) and missing[run] == missing[0] + run:
+                run += 1
+            start = missing[0] * block_size
+            data_start, data = self._wfuse._api.get_range(self._asset.path, start, run * block_size)
+            if data_start != start or len(data) > run * block_size:
+                # the server ignored the range
+                self._content = data
+                return data[offset:end]
+            for j, i in enumerate(missing[:run]):
+                block = data[j * block_size:(j + 1) * block_size]
+                cache.put((key, i), block)
+                blocks[i] = block
+            missing = missing[run:]
+        data = b''.join(blocks[i] for i in range(first, last + 1))
+        start = offset - first * block_size
+        return data[start:start + end - offset]
+
+    ##############################################
+
+    def truncate(self, length: int) -> None:
+        raise FuseOSError(EROFS)
+
+    def write(self, data: bytes, offset: int) -> int:
+        raise FuseOSError(EROFS)
+
+    def flush(self) -> None:
+        pass
 
 ####################################################################################################
 
 class VirtualFile:
 
+    # Writes are buffered in a bytearray and pushed to the wiki on flush, fsync or release.
+    #  Thus an editor save triggers a single update.
+    # A file is shared by the handles opened on the same path, see acquire and release.
+
     ##############################################
 
-    def __init__(self, wfuse: 'WikiJsFuse', path: str, fd: int, create: bool) -> None:
+    def __init__(self, wfuse: 'WikiJsFuse', path: str, create: bool, stale: bool = False) -> None:
         self._wfuse = wfuse
         path = str(path)
         self._path = PurePosixPath(path)
-        self._fd = int(fd)
         self._mode = 644
         self._created = create
+        self._dirty = False
+        self._open_count = 0
+        # serialise the accesses to the buffer
+        self._lock = threading.RLock()
         if not create:
-            self._page = self._wfuse._api.page(path)
+            if stale:
+                self._wfuse._prefetcher.discard(path)
+                self._page = None
+            else:
+                self._page = self._wfuse._prefetcher.get(path)
+            if self._page is None:
+                self._page = self._wfuse._api.page(path, profile='metadata', content=True, cache=False)
             self._stat = self.page_stat(self._page)
-            self._data = self._page.bytes_data
+            self._data = bytearray(self._page.bytes_data)
         else:
-            self._data = b''
+            self._data = bytearray()
             now = time()
             self._stat = dict(
                 st_mode=(S_IFREG | 0o644),
@@ -92,10 +578,6 @@ class VirtualFile:
     def is_page(self) -> bool:
         return hasattr(self, '_page')
 
-    @property
-    def fd(self) -> int:
-        return self._fd
-
     @property
     def path(self) -> PurePosixPath:
         return self._path
@@ -110,23 +592,63 @@ class VirtualFile:
 
     @property
     def data(self) -> bytes:
-        # if self.is_page:
-        #     return self._page.bytes_data
-        # else:
-        return self._data
+        with self._lock:
+            return bytes(self._data)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    ##############################################
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_count > 0
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._open_count += 1
+
+    def release(self) -> int:
+        """Decrement the open count and return it"""
+        with self._lock:
+            self._open_count -= 1
+            return self._open_count
+
+    ##############################################
+
+    def is_stale(self) -> bool:
+        """Check if the page was updated on the wiki"""
+        if not self.is_page:
+            return False
+        page = self._api.page(self.path_str, profile='minimal', cache=False)
+        return page.updatedAt != self._page.updatedAt
 
     ##############################################
 
     def read(self, size: int, offset: int) -> bytes:
-        return self.data[offset:offset + size]
+        with self._lock:
+            return bytes(memoryview(self._data)[offset:offset + size])
+
+    ##############################################
+
+    def _touch(self) -> None:
+        if not self._dirty:
+            self._wfuse._prefetcher.discard(self.path_str)
+        self._dirty = True
+        self._stat['st_size'] = len(self._data)
+        self._stat['st_mtime'] = time()
 
     ##############################################
 
     def truncate(self, length: int) -> None:
         # make sure extending the file fills in zero bytes
-        file_data = self._data
-        self._data = file_data[:length].ljust(length, '\x00'.encode('ascii'))
-        self._stat['st_size'] = length
+        with self._lock:
+            if length < len(self._data):
+                del self._data[length:]
+            else:
+                self._data.extend(bytes(length - len(self._data)))
+            self._touch()
 
     ##############################################
 
@@ -134,29 +656,44 @@ class VirtualFile:
         # Write can be incomplete !!!
         # make sure the data gets inserted at the right offset
         # and only overwrites the bytes that data is replacing
-        file_data = self._data
-        head = file_data[:offset].ljust(offset, '\x00'.encode('ascii'))
-        tail = file_data[offset + len(data):]
-        # print(head)
-        # print(data)
-        # print(tail)
-        file_data = head + data + tail
-        self._data = file_data
-        if self.is_page:
-            print(f"Write on wiki {self.path_str}")
-            _ = file_data.decode('utf8')
-            RULE = '~'*100
-            print(RULE)
-            print(_)
-            print(RULE)
-            page = Page.import_(_, self._api)
-            page.update()
-            self._page = page
-            self._stat = self.page_stat(page)
-        else:
-            self._stat['st_size'] = len(file_data)
+        end = offset + len(data)
+        with self._lock:
+            if end > len(self._data):
+                self._data.extend(bytes(end - len(self._data)))
+            self._data[offset:end] = data
+            self._touch()
         return len(data)
 
+    ##############################################
+
+    def flush(self) -> None:
+        """Push the buffer to the wiki"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not (self._dirty and self.is_page):
+            return
+        print(f"Write on wiki {self.path_str}")
+        page = Page.import_(self._data.decode('utf8'), self._api)
+        # the page was loaded at this date
+        checkout_date = self._page.updatedAt
+        try:
+            response = page.update(checkout_date=checkout_date)
+        except ConflictError as e:
+            print(f"Conflict: {e}")
+            raise FuseOSError(EIO)
+        if not response.succeeded:
+            print(f"Error: {response.message}")
+            raise FuseOSError(EIO)
+        self._page = page
+        self._dirty = False
+        self._wfuse._entries.invalidate(self.path_str)
+        self._wfuse._prefetcher.discard(self.path_str)
+        self._api.discard_page(self.path_str)
+        # the buffer is kept as it was written
+        self._stat['st_mtime'] = page.updated_at.timestamp()
+
 ####################################################################################################
 
 class WikiJsFuse(LoggingMixIn, Operations):
@@ -165,11 +702,27 @@ class WikiJsFuse(LoggingMixIn, Operations):
 
     ##############################################
 
-    def __init__(self, api: WikiJsApi) -> None:
+    def __init__(
+            self,
+            api: WikiJsApi,
+            entry_timeout: float = ENTRY_TIMEOUT,
+            attr_timeout: float = ATTR_TIMEOUT,
+            negative_timeout: float = NEGATIVE_TIMEOUT,
+            prefetch_depth: int = PREFETCH_DEPTH,
+            asset_cache_size: int = ASSET_CACHE_SIZE,
+    ) -> None:
         self._api = api
+        self._entries = EntryCache(api, entry_timeout, attr_timeout, negative_timeout)
+        self._prefetcher = Prefetcher(api, prefetch_depth, attr_timeout)
+        self._assets = AssetTree(api, entry_timeout)
+        self._blocks = BlockCache(ASSET_BLOCK_SIZE, asset_cache_size)
         self._mount_time = time()
+        # file tables
+        self._lock = threading.Lock()
         self._file_by_path = {}
         self._file_by_fd = {}
+        self._retained = OrderedDict()
+        self._opening = {}   # path -> Event set when the file is open
         self.data = defaultdict(bytes)
         self._last_fd = 0
         # now = time()
@@ -183,31 +736,135 @@ class WikiJsFuse(LoggingMixIn, Operations):
 
     ##############################################
 
-    def new_fd(self, path: str, create: bool) -> VirtualFile:
-        self._last_fd += 1
-        file = VirtualFile(self, path, self._last_fd, create)
-        self._file_by_path[file.path_str] = file
-        self._file_by_fd[file.fd] = file
+    # File tables
+    #   _file_by_fd    the open handles
+    #   _file_by_path  the open files, and the created files until they are unlinked
+    #   _retained      the last released pages, LRU bounded by RETAINED_FILES
+    #   _opening       the paths being opened, thus concurrent opens share the same file
+    #  Thus the memory usage is proportional to the number of open files.
+
+    def new_fd(self, file: VirtualFile) -> int:
+        file.acquire()
+        with self._lock:
+            self._last_fd += 1
+            fd = self._last_fd
+            self._file_by_path[file.path_str] = file
+            self._file_by_fd[fd] = file
+            self._retained.pop(file.path_str, None)
+        return fd
+
+    def _open_file(self, path: str) -> int:
+        """Open a page and return a new fd"""
+        while True:
+            with self._lock:
+                opening = self._opening.get(path)
+                if opening is None:
+                    opening = self._opening[path] = threading.Event()
+                    file = self._file_by_path.get(path, None)
+                    if file is None:
+                        file = self._retained.pop(path, None)
+                    break
+            opening.wait()
+        try:
+            # don't lock during the requests
+            if file is not None and not file.is_open and file.dirty:
+                # the flush failed on release, retry it
+                try:
+                    file.flush()
+                except FuseOSError:
+                    print(f"Drop the unsaved edits of {path}")
+                    with self._lock:
+                        self._file_by_path.pop(path, None)
+                    file = VirtualFile(self, path, create=False, stale=True)
+            elif file is not None and not file.is_open and file.is_stale():
+                self._entries.invalidate(path)
+                file = VirtualFile(self, path, create=False, stale=True)
+            elif file is None:
+                file = VirtualFile(self, path, create=False)
+            return self.new_fd(file)
+        finally:
+            with self._lock:
+                del self._opening[path]
+            opening.set()
+
+    def _release_fd(self, fd: int) -> VirtualFile:
+        with self._lock:
+            file = self._file_by_fd.pop(fd)
+        open_count = file.release()
+        if open_count == 0 and file.dirty:
+            print(f"Unsaved edits of {file.path_str}, the flush is retried on next open")
+        elif open_count == 0 and not file.created:
+            with self._lock:
+                self._file_by_path.pop(file.path_str, None)
+                if file.is_page:
+                    self._retained[file.path_str] = file
+                    while len(self._retained) > RETAINED_FILES:
+                        self._retained.popitem(last=False)
         return file
 
+    def _file_for_fd(self, fd: int) -> VirtualFile:
+        with self._lock:
+            return self._file_by_fd[fd]
+
+    def _file_for_path(self, path: str) -> VirtualFile | None:
+        with self._lock:
+            return self._file_by_path.get(path, None)
+
+    def _files(self) -> list[VirtualFile]:
+        with self._lock:
+            return list(self._file_by_path.values())
+
+    ##############################################
+
+    def _folder_stat(self) -> dict:
+        mount_time = self._mount_time
+        return dict(
+            st_mode=(S_IFDIR | 0o755),
+            st_ctime=mount_time,
+            st_mtime=mount_time,
+            st_atime=mount_time,
+            st_nlink=2,
+        )
+
     ##############################################
 
-    # def _list_folder(self, path: str) -> None:
-    #     items = list(self._itree(0))
-    #     for item in items:
-    #         print(item.id, item.path, item.isFolder)
+    @property
+    def _asset_root(self) -> str:
+        """ASSET_ROOT, prefixed by '_' while a page or a folder has this name"""
+        names = self._entries.listdir(PurePosixPath('/'))
+        name = ASSET_ROOT
+        while name in names:
+            name = '_' + name
+        return name
+
+    def _asset_path(self, path: str) -> PurePosixPath | None:
+        """Return the path relative to the asset root, or None"""
+        parts = PurePosixPath(path).parts
+        if len(parts) > 1 and parts[1] == self._asset_root:
+            return PurePosixPath(*parts[2:])
+        return None
+
+    def _asset_stat(self, path: PurePosixPath) -> dict:
+        if path.parent == path:
+            return self._folder_stat()
+        item = self._assets.lookup(path)
+        if isinstance(item, AssetFolder):
+            return self._folder_stat()
+        return AssetFile.asset_stat(item)
 
-    def _query_folder(self, path: PurePosixPath):
-        cache = []
-        for i, part in enumerate(path.parts):
-            if i == 0:
-                folder_id = 0
-            else:
-                folder = cache[i-1][part]
-                folder_id = folder.id
-            items = {_.path.name: _ for _ in self._api.itree(folder_id)}
-            cache.append(items)
-        return cache
+    ##############################################
+
+    def _stat(self, path: PurePosixPath) -> dict:
+        item = self._entries.lookup(path)
+        if item.isFolder:
+            return self._folder_stat()
+        else:
+            # st_size requires the exported metadata and the content
+            page = self._prefetcher.get(str(path))
+            if page is None:
+                # the entry cache holds the attributes for attr_timeout
+                page = self._api.page(path, profile='metadata', content=True, cache=False)
+            return VirtualFile.page_stat(page)
 
     ##############################################
 
@@ -227,8 +884,8 @@ class WikiJsFuse(LoggingMixIn, Operations):
 
     def create(self, path: str, mode: int) -> int:
         print('create', path, mode)
-        file = self.new_fd(path, create=True)
-        return file.fd
+        file = VirtualFile(self, path, create=True)
+        return self.new_fd(file)
 
     ##############################################
 
@@ -239,39 +896,22 @@ class WikiJsFuse(LoggingMixIn, Operations):
         #     raise FuseOSError(ENOENT)
         # return self._files[path]
         if fd is not None:
-            return self._file_by_fd[fd].stat
+            return self._file_for_fd(fd).stat
 
-        mount_time = self._mount_time
+        file = self._file_for_path(path)
+        asset_path = self._asset_path(path)
         if path == '/':
-            return dict(
-                st_mode=(S_IFDIR | 0o755),
-                st_ctime=mount_time,
-                st_mtime=mount_time,
-                st_atime=mount_time,
-                st_nlink=2,
-            )
-        elif path in self._file_by_path:
-            return self._file_by_path[path].stat
+            return self._folder_stat()
+        elif file is not None:
+            return file.stat
+        elif asset_path is not None:
+            return self._asset_stat(asset_path)
         else:
-            path = PurePosixPath(path)
-            cache = self._query_folder(path.parent)
-            # print(f"Lookup {path}")
-            # print(f"Cache {cache[-1]}")
-            try:
-                item = cache[-1][path.name]
-            except KeyError:
-                raise FuseOSError(ENOENT)
-            if item.isFolder:
-                return dict(
-                    st_mode=(S_IFDIR | 0o755),
-                    st_ctime=mount_time,
-                    st_mtime=mount_time,
-                    st_atime=mount_time,
-                    st_nlink=2,
-                )
-            else:
-                page = self._api.page(path)
-                return VirtualFile.page_stat(page)
+            stat = self._entries.get_attr(path)
+            if stat is None:
+                stat = self._stat(PurePosixPath(path))
+                self._entries.set_attr(path, stat)
+            return stat
 
     ##############################################
 
@@ -314,30 +954,49 @@ class WikiJsFuse(LoggingMixIn, Operations):
 
     def open(self, path: str, flags: int) -> int:
         print('open', path, flags)
-        file = self._file_by_path.get(path, None)
-        if file is None:
-            file = self.new_fd(path, create=False)
-        return file.fd
+        asset_path = self._asset_path(path)
+        if asset_path is not None:
+            if flags & (os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_TRUNC):
+                raise FuseOSError(EROFS)
+            file = self._file_for_path(path)
+            if file is None:
+                asset = self._assets.lookup(asset_path)
+                if not isinstance(asset, Asset):
+                    raise FuseOSError(ENOENT)
+                file = AssetFile(self, path, asset)
+        else:
+            return self._open_file(path)
+        return self.new_fd(file)
 
     ##############################################
 
     def read(self, path: str, size: int, offset: int, fd: int) -> bytes:
         print('read', path, size, offset, fd)
-        file = self._file_by_fd[fd]
+        file = self._file_for_fd(fd)
         return file.read(size, offset)
 
     ##############################################
 
     def readdir(self, path: str, fd: int) -> list[str]:
         print(f"readdir '{path}' fd={fd}")
+        asset_path = self._asset_path(path)
+        if asset_path is not None:
+            return ['.', '..'] + list(self._assets.listdir(asset_path).keys())
         path = PurePosixPath(path)
-        cache = self._query_folder(path)
+        items = self._entries.listdir(path)
         in_memory_file = []
-        for file in self._file_by_fd.values():
+        for file in self._files():
             fpath = file.path
             if file.created and fpath.parent == path:
                 in_memory_file.append(fpath.name)
-        return ['.', '..'] + in_memory_file + list(cache[-1].keys())
+        self._prefetcher.prefetch([
+            str(path.joinpath(name))
+            for name, item in items.items()
+            if not item.isFolder and self._entries.get_attr(str(path.joinpath(name))) is None
+        ])
+        if path.parent == path:
+            in_memory_file.append(self._asset_root)
+        return ['.', '..'] + in_memory_file + list(items.keys())
 
     ##############################################
 
@@ -399,16 +1058,21 @@ class WikiJsFuse(LoggingMixIn, Operations):
     def truncate(self, path: str, length: int, fd: int = None) -> None:
         print(f"truncate '{path}' #{length} fd={fd}")
         if fd is not None:
-            file = self._file_by_fd[fd]
+            file = self._file_for_fd(fd)
         else:
-            file = self._file_by_path[path]
+            file = self._file_for_path(path)
+            if file is None:
+                raise FuseOSError(ENOENT)
         return file.truncate(length)
 
     ##############################################
 
     def unlink(self, path: str) -> None:
-        # self._file_by_path.pop(path)
-        pass
+        # only in-memory files can be removed, e.g. editor backup files
+        with self._lock:
+            file = self._file_by_path.get(path, None)
+            if file is not None and file.created:
+                del self._file_by_path[path]
 
     ##############################################
 
@@ -422,6 +1086,102 @@ class WikiJsFuse(LoggingMixIn, Operations):
     ##############################################
 
     def write(self, path: str, data: bytes, offset: int, fd: int) -> int:
-        print(f"Write '{path}' @{offset} fd={fd} {data}")
-        file = self._file_by_fd[fd]
+        print(f"Write '{path}' @{offset} #{len(data)} fd={fd}")
+        file = self._file_for_fd(fd)
         return file.write(data, offset)
+
+    ##############################################
+
+    def flush(self, path: str, fd: int) -> int:
+        print(f"flush '{path}' fd={fd}")
+        self._file_for_fd(fd).flush()
+        return 0
+
+    def fsync(self, path: str, datasync: int, fd: int) -> int:
+        print(f"fsync '{path}' fd={fd}")
+        self._file_for_fd(fd).flush()
+        return 0
+
+    def release(self, path: str, fd: int) -> int:
+        print(f"release '{path}' fd={fd}")
+        try:
+            self._file_for_fd(fd).flush()
+        finally:
+            # a dirty file is kept for a retry on next open
+            self._release_fd(fd)
+        return 0
+
+####################################################################################################
+
+class MirrorFuse(LoggingMixIn, Operations):
+
+    """Read-only passthrough to the files of a local mirror
+
+    Reads are served by the kernel from the mirror files, thus they don't need a request.  The
+    modifying operations are not implemented, and raise EROFS.
+    """
+
+    ##############################################
+
+    def __init__(self, mirror: Mirror, locale: str = 'fr') -> None:
+        self._mirror = mirror
+        self._root = mirror.root(locale)
+
+    ##############################################
+
+    def _real_path(self, path: str) -> str:
+        return str(self._root.joinpath(path.lstrip('/')))
+
+    ##############################################
+
+    def getattr(self, path: str, fd: int = None) -> dict:
+        try:
+            if fd is not None:
+                st = os.fstat(fd)
+            else:
+                st = os.lstat(self._real_path(path))
+        except FileNotFoundError:
+            raise FuseOSError(ENOENT)
+        _ = {key: getattr(st, key) for key in (
+            'st_mode', 'st_nlink', 'st_size',
+            'st_atime', 'st_mtime', 'st_ctime',
+        )}
+        # drop the write permissions
+        _['st_mode'] &= ~0o222
+        return _
+
+    ##############################################
+
+    def readdir(self, path: str, fd: int) -> list[str]:
+        try:
+            names = os.listdir(self._real_path(path))
+        except FileNotFoundError:
+            raise FuseOSError(ENOENT)
+        return ['.', '..'] + [_ for _ in names if not _.startswith(Mirror.TMP_PREFIX)]
+
+    ##############################################
+
+    def open(self, path: str, flags: int) -> int:
+        if flags & (os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC):
+            raise FuseOSError(EROFS)
+        try:
+            # a mirror update replaces the file, the descriptor keeps the old content
+            return os.open(self._real_path(path), os.O_RDONLY)
+        except FileNotFoundError:
+            raise FuseOSError(ENOENT)
+
+    def read(self, path: str, size: int, offset: int, fd: int) -> bytes:
+        return os.pread(fd, size, offset)
+
+    def release(self, path: str, fd: int) -> int:
+        os.close(fd)
+        return 0
+
+    ##############################################
+
+    def statfs(self, path: str) -> dict:
+        st = os.statvfs(self._root)
+        return {key: getattr(st, key) for key in (
+            'f_bsize', 'f_frsize', 'f_blocks', 'f_bfree', 'f_bavail',
+            'f_files', 'f_ffree', 'f_favail', 'f_flag', 'f_namemax',
+        )}
@@ -0,0 +1,293 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Minimal GraphQL executor for the stand-in server.
+
+It implements the subset of GraphQL used by `WikiJsApi`: one operation per document, variables,
+aliases, arguments and nested selections.  Fragments and directives are not supported, and there
+is no type checking: a field is resolved by looking up its name in a dict or an attribute of an
+object, a callable is called with the arguments of the field.
+
+"""
+
+####################################################################################################
+
+__all__ = ['execute', 'Field', 'GraphQLError', 'parse']
+
+####################################################################################################
+
+from dataclasses import dataclass, field
+from typing import Any
+import inspect
+import json
+import re
+
+####################################################################################################
+
+class GraphQLError(NameError):
+
+    def __init__(self, message: str, location: tuple[int, int] = (1, 1), path: list[str] = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.location = location   # line, column
+        self.path = path or []
+
+    ##############################################
+
+    def to_dict(self) -> dict:
+        """Return the error as Wiki.js reports it"""
+        return {
+            'message': self.message,
+            'locations': [{'line': self.location[0], 'column': self.location[1]}],
+            'path': self.path,
+            'extensions': {
+                'code': 'INTERNAL_SERVER_ERROR',
+                'exception': {'stacktrace': [f'Error: {self.message}']},
+            },
+        }
+
+####################################################################################################
+
+@dataclass
+class Variable:
+    name: str
+
+@dataclass
+class Field:
+    name: str
+    alias: str = None
+    arguments: dict = field(default_factory=dict)
+    selections: list['Field'] = None
+    location: tuple[int, int] = (1, 1)
+
+    ##############################################
+
+    @property
+    def key(self) -> str:
+        return self.alias or self.name
+
+####################################################################################################
+
+_TOKEN_RE = re.compile(r'''
+  (?P<ignored>[\s,]+|\#[^\n]*)
+| (?P<string>"(?:[^"\\]|\\.)*")
+| (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+| (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+| (?P<punctuator>\.\.\.|[!$():=@\[\]{}|&])
+''', re.VERBOSE)
+
+class _Parser:
+
+    ##############################################
+
+    def __init__(self, source: str) -> None:
+        self._tokens = []
+        position = 0
+        line = 1
+        line_start = 0
+        while position < len(source):
+            location = (line, position - line_start + 1)
+            match = _TOKEN_RE.match(source, position)
+            if match is None:
+                raise GraphQLError(f'Syntax Error: Unexpected character "{source[position]}"', location)
+            kind = match.lastgroup
+            if kind == 'ignored':
+                newlines = match.group().count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = source.rindex('\n', position, match.end()) + 1
+            else:
+                self._tokens.append((kind, match.group(), location))
+            position = match.end()
+        self._end = (line, position - line_start + 1)
+        self._index = 0
+
+    ##############################################
+
+    def _peek(self) -> tuple[str, str, tuple[int, int]]:
+        if self._index < len(self._tokens):
+            return self._tokens[self._index]
+        return ('end', '', self._end)
+
+    def _next(self) -> tuple[str, str, tuple[int, int]]:
+        _ = self._peek()
+        self._index += 1
+        return _
+
+    def _expect(self, value: str) -> None:
+        kind, token, location = self._next()
+        if token != value:
+            raise GraphQLError(f'Syntax Error: Expected "{value}", found "{token}"', location)
+
+    def _skip_balanced(self, opening: str, closing: str) -> None:
+        self._expect(opening)
+        depth = 1
+        while depth:
+            kind, token, location = self._next()
+            if kind == 'end':
+                raise GraphQLError(f'Syntax Error: Expected "{closing}"', location)
+            if token == opening:
+                depth += 1
+            elif token == closing:
+                depth -= 1
+
+    ##############################################
+
+    def document(self) -> tuple[str, list[Field]]:
+        operation = 'query'
+        kind, token, location = self._peek()
+        if kind == 'name':
+            if token not in ('query', 'mutation'):
+                raise GraphQLError(f'Syntax Error: Unexpected Name "{token}"', location)
+            operation = token
+            self._next()
+            if self._peek()[0] == 'name':
+                # operation name
+                self._next()
+            if self._peek()[1] == '(':
+                # the variable types are not checked
+                self._skip_balanced('(', ')')
+        selections = self.selection_set()
+        kind, token, location = self._peek()
+        if kind != 'end':
+            raise GraphQLError(f'Syntax Error: Unexpected "{token}"', location)
+        return operation, selections
+
+    ##############################################
+
+    def selection_set(self) -> list[Field]:
+        self._expect('{')
+        fields = []
+        while self._peek()[1] != '}':
+            fields.append(self.field())
+        self._expect('}')
+        if not fields:
+            raise GraphQLError('Syntax Error: empty selection')
+        return fields
+
+    def field(self) -> Field:
+        kind, name, location = self._next()
+        if kind != 'name':
+            raise GraphQLError(f'Syntax Error: Expected Name, found "{name}"', location)
+        alias = None
+        if self._peek()[1] == ':':
+            self._next()
+            alias = name
+            kind, name, location = self._next()
+            if kind != 'name':
+                raise GraphQLError(f'Syntax Error: Expected Name, found "{name}"', location)
+        arguments = {}
+        if self._peek()[1] == '(':
+            self._next()
+            while self._peek()[1] != ')':
+                kind, argument, _location = self._next()
+                if kind != 'name':
+                    raise GraphQLError(f'Syntax Error: Expected Name, found "{argument}"', _location)
+                self._expect(':')
+                arguments[argument] = self.value()
+            self._next()
+        selections = None
+        if self._peek()[1] == '{':
+            selections = self.selection_set()
+        return Field(name, alias, arguments, selections, location)
+
+    ##############################################
+
+    def value(self) -> Any:
+        kind, token, location = self._next()
+        match kind:
+            case 'string':
+                # same escapes as JSON
+                return json.loads(token)
+            case 'number':
+                return float(token) if any(_ in token for _ in '.eE') else int(token)
+            case 'name':
+                return {'true': True, 'false': False, 'null': None}.get(token, token)
+        match token:
+            case '$':
+                kind, name, location = self._next()
+                return Variable(name)
+            case '[':
+                values = []
+                while self._peek()[1] != ']':
+                    values.append(self.value())
+                self._next()
+                return values
+            case '{':
+                values = {}
+                while self._peek()[1] != '}':
+                    kind, name, location = self._next()
+                    self._expect(':')
+                    values[name] = self.value()
+                self._next()
+                return values
+        raise GraphQLError(f'Syntax Error: Unexpected "{token}"', location)
+
+####################################################################################################
+
+def parse(source: str) -> tuple[str, list[Field]]:
+    """Return the operation type and the selections of a document"""
+    return _Parser(source).document()
+
+####################################################################################################
+
+def _substitute(value: Any, variables: dict) -> Any:
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, list):
+        return [_substitute(_, variables) for _ in value]
+    if isinstance(value, dict):
+        return {key: _substitute(_, variables) for key, _ in value.items()}
+    return value
+
+def _complete(value: Any, field: Field, variables: dict, path: list[str]) -> Any:
+    if value is None or field.selections is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_complete(_, field, variables, path) for _ in value]
+    return _select(value, field.selections, variables, path)
+
+def _select(parent: Any, selections: list[Field], variables: dict, path: list[str]) -> dict:
+    data = {}
+    for field in selections:
+        field_path = path + [field.key]
+        if isinstance(parent, dict):
+            if field.name not in parent:
+                raise GraphQLError(f'Cannot query field "{field.name}"', field.location, field_path)
+            value = parent[field.name]
+        else:
+            try:
+                value = getattr(parent, field.name)
+            except AttributeError:
+                raise GraphQLError(f'Cannot query field "{field.name}"', field.location, field_path)
+        if callable(value):
+            arguments = {key: _substitute(_, variables) for key, _ in field.arguments.items()}
+            # a bad argument is a query error, a TypeError raised by the resolver is a bug
+            try:
+                inspect.signature(value).bind(**arguments)
+            except TypeError as e:
+                raise GraphQLError(str(e), field.location, field_path)
+            try:
+                value = value(**arguments)
+            except GraphQLError as e:
+                e.location = field.location
+                e.path = field_path
+                raise
+        data[field.key] = _complete(value, field, variables, field_path)
+    return data
+
+def execute(source: str, variables: dict, query_root: Any, mutation_root: Any = None) -> dict:
+    """Execute a document and return the response"""
+    try:
+        operation, selections = parse(source)
+        root = mutation_root if operation == 'mutation' else query_root
+        if root is None:
+            raise GraphQLError(f'Schema is not configured for {operation}')
+        return {'data': _select(root, selections, variables or {}, [])}
+    except GraphQLError as e:
+        return {'errors': [e.to_dict()], 'data': None}
@@ -0,0 +1,167 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""SQLite store of the page versions synced by `sync.git_sync`.
+
+A version is keyed by page id and version id, the current version of a page has the version id 0.
+The versions are indexed by date, thus the last synced version and a date range don't require to
+load the whole history.
+
+"""
+
+####################################################################################################
+
+__all__ = ['HistoryStore']
+
+####################################################################################################
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+import json
+import sqlite3
+
+from .WikiJsApi import PageHistory
+
+####################################################################################################
+
+def _date_key(date: datetime | str) -> str:
+    # UTC with a fixed format, thus the dates are ordered as strings
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    return date.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+####################################################################################################
+
+class HistoryStore:
+
+    SCHEMA = '''
+CREATE TABLE IF NOT EXISTS versions (
+    page_id INTEGER NOT NULL,
+    version_id INTEGER NOT NULL,
+    version_date TEXT NOT NULL,
+    locale TEXT,
+    path TEXT,
+    action_type TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (page_id, version_id)
+);
+CREATE INDEX IF NOT EXISTS versions_date ON versions (version_date);
+'''
+
+    ##############################################
+
+    @staticmethod
+    def entry(ph: PageHistory) -> dict:
+        """Return the JSON entry of a version"""
+        # Fixme: better ?
+        d = {
+            key: value
+            for key, value in ph.__dict__.items()
+            if key not in ('api', 'page', '_page_version', 'prev', 'next') and value is not None
+        }
+        d['locale'] = ph.locale
+        d['path'] = ph.path_str
+        d['pageId'] = ph.page_id
+        return d
+
+    ##############################################
+
+    def __init__(self, path: Path | str) -> None:
+        self._path = Path(path)
+        self._connection = sqlite3.connect(self._path)
+        self._connection.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    ##############################################
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM versions').fetchone()[0]
+
+    ##############################################
+
+    def append(self, entries: Iterable[dict]) -> int:
+        """Store the entries and return the number of rows written
+
+        A past version never changes, thus it is only inserted if missing.  The current version, with
+        the version id 0, is replaced.
+        """
+        current_rows = []
+        past_rows = []
+        for _ in entries:
+            version_id = _.get('versionId') or 0
+            rows = past_rows if version_id else current_rows
+            rows.append((
+                _['pageId'],
+                version_id,
+                _date_key(_['versionDate']),
+                _.get('locale'),
+                _.get('path'),
+                _.get('actionType'),
+                json.dumps(_, ensure_ascii=False),
+            ))
+        with self._connection:
+            count = self._connection.executemany(
+                'INSERT OR IGNORE INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)', past_rows
+            ).rowcount
+            count += self._connection.executemany(
+                'INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)', current_rows
+            ).rowcount
+        return count
+
+    def migrate_json(self, path: Path | str) -> int:
+        """Import the versions of a wikijs-history.json file"""
+        with open(path, 'r') as fh:
+            return self.append(json.load(fh))
+
+    ##############################################
+
+    def last_version_date(self) -> datetime | None:
+        _ = self._connection.execute('SELECT MAX(version_date) FROM versions').fetchone()[0]
+        if _ is None:
+            return None
+        return datetime.fromisoformat(_).replace(tzinfo=timezone.utc)
+
+    def last_version(self, page_id: int) -> dict | None:
+        _ = self._connection.execute(
+            'SELECT data FROM versions WHERE page_id = ? ORDER BY version_date DESC LIMIT 1',
+            (page_id,),
+        ).fetchone()
+        if _ is None:
+            return None
+        return json.loads(_[0])
+
+    ##############################################
+
+    def range(self, start: datetime = None, stop: datetime = None, page_id: int = None) -> Iterator[dict]:
+        """Yield the versions such that start <= date < stop, ordered by date"""
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append('version_date >= ?')
+            parameters.append(_date_key(start))
+        if stop is not None:
+            conditions.append('version_date < ?')
+            parameters.append(_date_key(stop))
+        if page_id is not None:
+            conditions.append('page_id = ?')
+            parameters.append(page_id)
+        query = 'SELECT data FROM versions'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY version_date'
+        for _ in self._connection.execute(query, parameters):
+            yield json.loads(_[0])
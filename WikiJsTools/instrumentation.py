@@ -0,0 +1,279 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Request statistics.
+
+Each request is timed in three phases:
+
+- wait: from the request to the response headers, it includes the name lookup, the connection and
+  the server time, a new connection is counted in `connections`,
+- transfer: the read of the body,
+- parse: the JSON decoding.
+
+The requests are aggregated by operation, i.e. the GraphQL path of the query like
+``pages.singleByPath``, and are recorded as events that can be exported as a Chrome trace, see
+``chrome://tracing`` or https://ui.perfetto.dev.
+
+"""
+
+####################################################################################################
+
+__all__ = ['CacheStats', 'OperationStats', 'operation_name', 'RequestStats', 'RequestTimer']
+
+####################################################################################################
+
+from collections import deque
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+import json
+import os
+import re
+import threading
+
+####################################################################################################
+
+_TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|"(?:[^"\\]|\\.)*"|\S')
+
+@lru_cache(maxsize=256)
+def operation_name(query: str, depth: int = 2) -> str:
+    """Return the `depth` first fields of a GraphQL query, e.g. ``pages.list`` or ``mutation pages.move``
+
+    The aliases and the arguments are skipped.
+    """
+    kind = 'query'
+    fields = []
+    field = None
+    level = 0
+    parenthesis = 0
+    for token in _TOKEN_RE.findall(query):
+        if parenthesis:
+            parenthesis += {'(': 1, ')': -1}.get(token, 0)
+        elif token == '(':
+            parenthesis = 1
+        elif token == '{':
+            if field is not None:
+                fields.append(field)
+                if len(fields) == depth:
+                    break
+                field = None
+            level += 1
+        elif token == ':':
+            # alias
+            field = None
+        elif token == '}':
+            break
+        elif level == 0:
+            if token in ('mutation', 'subscription'):
+                kind = token
+        elif field is not None:
+            # leaf field
+            break
+        else:
+            field = token
+    if not fields and field is not None:
+        fields.append(field)
+    name = '.'.join(fields) or 'unknown'
+    if kind != 'query':
+        name = f'{kind} {name}'
+    return name
+
+####################################################################################################
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    errors: int = 0
+    connections: int = 0
+    wait: float = 0       # s
+    transfer: float = 0   # s
+    parse: float = 0      # s
+    max_time: float = 0   # s
+    sent: int = 0         # bytes
+    received: int = 0     # bytes
+
+    ##############################################
+
+    @property
+    def time(self) -> float:
+        return self.wait + self.transfer + self.parse
+
+    @property
+    def mean_time(self) -> float:
+        return self.time / self.count if self.count else 0
+
+####################################################################################################
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    ##############################################
+
+    @property
+    def hit_rate(self) -> float:
+        _ = self.hits + self.misses
+        return self.hits / _ if _ else 0
+
+####################################################################################################
+
+class RequestTimer:
+
+    """Context manager timing the phases of a request, see :meth:`RequestStats.timer`"""
+
+    ##############################################
+
+    def __init__(self, stats: 'RequestStats', name: str) -> None:
+        self._stats = stats
+        self.name = name
+        self.start = 0
+        self._last = 0
+        self.wait = 0
+        self.transfer = 0
+        self.parse = 0
+        self.sent = 0
+        self.received = 0
+        self.connected = False
+
+    ##############################################
+
+    def __enter__(self) -> 'RequestTimer':
+        self.start = self._last = perf_counter()
+        return self
+
+    def lap(self, phase: str) -> None:
+        """Add the time elapsed since the previous lap to `phase`"""
+        now = perf_counter()
+        setattr(self, phase, getattr(self, phase) + now - self._last)
+        self._last = now
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # a stream can be closed before its end
+        error = exc_type is not None and not issubclass(exc_type, GeneratorExit)
+        self._stats.record(self, error=error)
+
+####################################################################################################
+
+class RequestStats:
+
+    """Thread safe statistics of the requests and of the caches"""
+
+    MAX_EVENTS = 100_000
+
+    ##############################################
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations = {}
+            self._caches = {}
+            self._events = deque(maxlen=self.MAX_EVENTS)
+            self._thread_names = {}
+            self._origin = perf_counter()
+
+    ##############################################
+
+    def timer(self, name: str) -> RequestTimer:
+        return RequestTimer(self, name)
+
+    def record(self, timer: RequestTimer, error: bool = False) -> None:
+        thread = threading.current_thread()
+        with self._lock:
+            _ = self._operations.get(timer.name)
+            if _ is None:
+                _ = self._operations[timer.name] = OperationStats()
+            _.count += 1
+            _.errors += error
+            _.connections += timer.connected
+            _.wait += timer.wait
+            _.transfer += timer.transfer
+            _.parse += timer.parse
+            _.max_time = max(_.max_time, timer.wait + timer.transfer + timer.parse)
+            _.sent += timer.sent
+            _.received += timer.received
+            self._thread_names[thread.ident] = thread.name
+            self._events.append((
+                timer.name, thread.ident, timer.start - self._origin,
+                timer.wait, timer.transfer, timer.parse,
+                timer.sent, timer.received, timer.connected, error,
+            ))
+
+    def cache(self, name: str, hit: bool) -> None:
+        with self._lock:
+            _ = self._caches.get(name)
+            if _ is None:
+                _ = self._caches[name] = CacheStats()
+            if hit:
+                _.hits += 1
+            else:
+                _.misses += 1
+
+    ##############################################
+
+    @property
+    def operations(self) -> dict[str, OperationStats]:
+        """Return a copy of the statistics, sorted by decreasing time"""
+        with self._lock:
+            _ = [(name, OperationStats(**asdict(stats))) for name, stats in self._operations.items()]
+        return dict(sorted(_, key=lambda item: -item[1].time))
+
+    @property
+    def caches(self) -> dict[str, CacheStats]:
+        with self._lock:
+            return {name: CacheStats(**asdict(stats)) for name, stats in sorted(self._caches.items())}
+
+    ##############################################
+
+    def to_dict(self) -> dict:
+        return {
+            'operations': {
+                name: asdict(stats) | {'time': stats.time, 'mean_time': stats.mean_time}
+                for name, stats in self.operations.items()
+            },
+            'caches': {
+                name: asdict(stats) | {'hit_rate': stats.hit_rate}
+                for name, stats in self.caches.items()
+            },
+        }
+
+    def dump_json(self, path: Path | str) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding='utf8')
+
+    ##############################################
+
+    def chrome_trace(self) -> dict:
+        """Return the requests in the Chrome trace event format"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        trace = [
+            dict(name='thread_name', ph='M', pid=pid, tid=tid, args=dict(name=name))
+            for tid, name in thread_names.items()
+        ]
+        for name, tid, start, wait, transfer, parse, sent, received, connected, error in events:
+            # µs
+            ts = start * 1e6
+            args = dict(sent=sent, received=received, connected=connected, error=error)
+            trace.append(dict(
+                name=name, cat='request', ph='X', pid=pid, tid=tid,
+                ts=ts, dur=(wait + transfer + parse) * 1e6, args=args,
+            ))
+            for phase, duration in (('wait', wait), ('transfer', transfer), ('parse', parse)):
+                if duration:
+                    trace.append(dict(name=phase, cat='phase', ph='X', pid=pid, tid=tid, ts=ts, dur=duration * 1e6))
+                    ts += duration * 1e6
+        return dict(traceEvents=trace, displayTimeUnit='ms')
+
+    def dump_chrome_trace(self, path: Path | str) -> None:
+        Path(path).write_text(json.dumps(self.chrome_trace()), encoding='utf8')
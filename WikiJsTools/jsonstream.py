@@ -0,0 +1,217 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Incremental JSON decoding of the array located at a path of a JSON document.
+
+A GraphQL response looks like ``{"data": {"pages": {"list": [{...}, {...}, ...]}}}``.  Instead to
+load the whole body then to build the objects, :class:`JsonArrayStream` decodes the array elements
+one by one as the chunks arrive, thus the memory usage doesn't depend of the array length.
+
+"""
+
+####################################################################################################
+
+__all__ = ['JsonArrayStream', 'JsonStreamError']
+
+####################################################################################################
+
+from typing import Any, Iterable, Iterator
+
+import codecs
+import json
+import re
+
+####################################################################################################
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURAL = re.compile(r'["\[\]{}]')
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+NUMBER_CHARS = re.compile(r'[0-9.eE+\-]*')
+
+####################################################################################################
+
+class JsonStreamError(ValueError):
+    pass
+
+####################################################################################################
+
+class JsonArrayStream:
+
+    """Yield the elements of the array at `path`, e.g. 'data/pages/list'.
+
+    The other keys of the root object are decoded and stored in :attr:`extra`, for example
+    'errors'.  If a value on the path is null, nothing is yielded.
+    """
+
+    ##############################################
+
+    def __init__(self, chunks: Iterable[bytes], path: str) -> None:
+        self._chunks = iter(chunks)
+        self._path = str(path).split('/')
+        self._decoder = codecs.getincrementaldecoder('utf8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+        self.extra = {}
+
+    ##############################################
+
+    def _read(self) -> str | None:
+        """Return the next decoded text, None at the end of the document"""
+        if self._eof:
+            return None
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                return text
+        self._eof = True
+        return self._decoder.decode(b'', final=True) or None
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, return False at the end of the document"""
+        text = self._read()
+        if text is None:
+            return False
+        # drop what was consumed
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+        return True
+
+    ##############################################
+
+    def _peek(self) -> str:
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                raise JsonStreamError('Unexpected end of JSON document')
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if c not in chars:
+            _ = self._buffer[self._position:self._position + 20]
+            raise JsonStreamError(f'Expected {chars!r} but found {_!r}...')
+        self._position += 1
+        return c
+
+    ##############################################
+
+    def _value(self) -> Any:
+        if self._peek() in '"[{':
+            return self._compound()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as exception:
+                if self._fill():
+                    continue
+                raise JsonStreamError(str(exception))
+            # a number could be cut at the end of the buffer, e.g. '1.' or '1e'
+            if NUMBER_CHARS.match(self._buffer, end).end() == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def _compound(self) -> Any:
+        """Decode a string, an array or an object
+
+        The end of the value is found by tracking the nesting depth and the strings as the chunks
+        arrive, then the value is decoded once.  Thus a large value costs a single scan of its text.
+        """
+        text = self._buffer
+        start = position = self._position
+        parts = []
+        depth = 0
+        in_string = False
+        while True:
+            end = None
+            while end is None:
+                if in_string:
+                    position = STRING_BODY.match(text, position).end()
+                    if position == len(text):
+                        break
+                    if text[position] == '\\':
+                        # the escaped character is in the next chunk
+                        position += 2
+                        break
+                    position += 1
+                    in_string = False
+                    if not depth:
+                        end = position
+                else:
+                    match = STRUCTURAL.search(text, position)
+                    if match is None:
+                        break
+                    position = match.end()
+                    c = match.group()
+                    if c == '"':
+                        in_string = True
+                    elif c in '[{':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if not depth:
+                            end = position
+            if end is not None:
+                break
+            parts.append(text[start:])
+            next_text = self._read()
+            if next_text is None:
+                raise JsonStreamError('Unexpected end of JSON document')
+            # skip the escaped character if it was at the end of the chunk
+            position = max(position - len(text), 0)
+            text = next_text
+            start = 0
+        parts.append(text[start:end])
+        self._buffer = text
+        self._position = end
+        try:
+            value, _ = self._json_decoder.raw_decode(''.join(parts))
+        except json.JSONDecodeError as exception:
+            raise JsonStreamError(str(exception))
+        return value
+
+    ##############################################
+
+    def _object(self, depth: int) -> Iterator[Any]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._position += 1
+            return
+        last_depth = len(self._path) - 1
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == self._path[depth] and self._peek() != 'n':
+                if depth == last_depth:
+                    yield from self._array()
+                else:
+                    yield from self._object(depth + 1)
+            else:
+                value = self._value()
+                if depth == 0:
+                    self.extra[key] = value
+            if self._expect(',}') == '}':
+                return
+
+    def _array(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    ##############################################
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self._object(0)
@@ -0,0 +1,132 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Local mirror of the pages.
+
+The mirror has the layout of `sync.sync`, i.e. ``<path>/<locale>/<page path>.md``.  It is updated
+from the `PageCatalogue` deltas: only the pages updated since the last refresh are fetched, moved
+pages are removed from their old location and deleted pages are removed.
+
+Files are written to a temporary file then renamed, thus a reader never sees a partial file and an
+open file keeps its content.
+
+"""
+
+####################################################################################################
+
+__all__ = ['Mirror']
+
+####################################################################################################
+
+from pathlib import Path
+import threading
+
+from .WikiJsApi import WikiJsApi, BasePage, PageListItem
+from .bulk import TMP_PREFIX, fetch_pages, write_atomic
+from .catalogue import PageCatalogue
+
+####################################################################################################
+
+class Mirror:
+
+    TMP_PREFIX = TMP_PREFIX
+
+    ##############################################
+
+    def __init__(self, api: WikiJsApi, path: Path | str) -> None:
+        self._api = api
+        self._path = Path(path).expanduser().resolve()
+        self._catalogue = PageCatalogue(api)
+        self._file_by_id = {}   # page id -> Path
+        # serialise the updates
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    ##############################################
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def root(self, locale: str) -> Path:
+        return self._path.joinpath(locale)
+
+    ##############################################
+
+    def _file_path(self, page: PageListItem) -> Path:
+        return BasePage.file_path_impl(self._path, page.locale, page.path_str, page.contentType)
+
+    @staticmethod
+    def _is_up_to_date(file_path: Path, mtime: float) -> bool:
+        try:
+            return file_path.stat().st_mtime == mtime
+        except FileNotFoundError:
+            return False
+
+    ##############################################
+
+    def _remove(self, file_path: Path) -> None:
+        file_path.unlink(missing_ok=True)
+        # remove the empty directories up to the locale root
+        path = file_path.parent
+        while path.parent != self._path:
+            try:
+                path.rmdir()
+            except OSError:
+                break
+            path = path.parent
+
+    ##############################################
+
+    def update(self) -> list[Path]:
+        """Apply the changes made on the wiki and return the written files"""
+        with self._lock:
+            catalogue = self._catalogue
+            rows = catalogue.refresh()
+            # deleted pages
+            ids = set(catalogue.ids)
+            for id in set(self._file_by_id) - ids:
+                self._remove(self._file_by_id.pop(id))
+            to_write = []
+            for page in catalogue.pages(rows):
+                file_path = self._file_path(page)
+                old_path = self._file_by_id.get(page.id)
+                if old_path is not None and old_path != file_path:
+                    # moved page
+                    self._remove(old_path)
+                self._file_by_id[page.id] = file_path
+                if not self._is_up_to_date(file_path, page.updated_at.timestamp()):
+                    to_write.append(page)
+            written = []
+            for page in fetch_pages(self._api, to_write):
+                file_path = self._file_by_id.get(page.id, None)
+                if file_path is not None:
+                    write_atomic(file_path, page.bytes_data, page.updated_at.timestamp())
+                    written.append(file_path)
+            return written
+
+    ##############################################
+
+    def start(self, interval: float) -> None:
+        """Update the mirror in the background every `interval` s"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.update()
+                except Exception as e:
+                    print(f"Mirror update error: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
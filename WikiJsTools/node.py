@@ -99,8 +99,9 @@ class Node:
 
     def add_child(self, child: 'Node') -> None:
         if child.name not in self._childs:
-            self._childs[child.name] = child
+            # parent first, a tree can be read while it is built
             child.parent = self
+            self._childs[child.name] = child
 
     ##############################################
 
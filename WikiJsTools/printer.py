@@ -6,16 +6,36 @@
 #
 ####################################################################################################
 
-__all__ = ['html_escape', 'printc', 'default_print', 'pt_print', 'STYLE', 'remove_style', 'CommandError']
+__all__ = [
+    'html_escape',
+    'printc',
+    'batch',
+    'capture',
+    'default_print',
+    'pt_print',
+    'STYLE',
+    'remove_style',
+    'to_ansi',
+    'CommandError',
+]
 
 ####################################################################################################
 
+from contextlib import contextmanager
 from enum import Enum
+from functools import cache
+from typing import Callable
+from xml.parsers.expat import ExpatError
 import html
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
 
-from prompt_toolkit import HTML
-from prompt_toolkit import print_formatted_text
-from prompt_toolkit.styles import Style
+# prompt_toolkit is loaded on first use, it is slow to import
 
 ####################################################################################################
 
@@ -55,7 +75,7 @@ class Palette(Enum):
 
 ####################################################################################################
 
-STYLE = Style.from_dict({
+STYLE_DICT = {
     # User input (default text)
     # '': '#000000',
     '': '#ffffff',
@@ -71,12 +91,22 @@ STYLE = Style.from_dict({
     'orange': '#f57300',
     'violet': '#9b58b5',
     'greenblue': '#19bb9c',
-})
+}
+
+@cache
+def _style() -> 'Style':
+    from prompt_toolkit.styles import Style
+    return Style.from_dict(STYLE_DICT)
+
+def __getattr__(name: str):
+    # STYLE is built on first use
+    if name == 'STYLE':
+        return _style()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 ####################################################################################################
 
-# def default_print(*args, **kwargs):
-def default_print(message: str) -> None:
+def _palette_patterns() -> list[tuple[str, str]]:
     patterns = [
         (f'<{_.lower()}>', Palette._member_map_[_].value)
         for _ in Palette._member_names_
@@ -85,37 +115,55 @@ def default_print(message: str) -> None:
     close_patterns = []
     for i, o in patterns:
         close_patterns.append((i.replace('<', '</'), Palette.RESET.value))
-    patterns += close_patterns
-    # print(patterns)
-    for i, o in patterns:
+    return patterns + close_patterns
+
+_PALETTE_PATTERNS = _palette_patterns()
+
+# def default_print(*args, **kwargs):
+def default_print(message: str) -> None:
+    for i, o in _PALETTE_PATTERNS:
         message = message.replace(i, o)
     print(message)
 
 ####################################################################################################
 
+def _ansi_patterns() -> list[tuple[str, str]]:
+    # true colors of the style
+    patterns = []
+    for name, color in STYLE_DICT.items():
+        if name in ('', 'prompt'):
+            continue
+        r, g, b = (int(color[i:i+2], 16) for i in (1, 3, 5))
+        patterns.append((f'<{name}>', f'\033[38;2;{r};{g};{b}m'))
+        patterns.append((f'</{name}>', Palette.RESET.value))
+    return patterns
+
+_ANSI_PATTERNS = _ansi_patterns()
+
+_TAG_RE = re.compile(r'<[^>]*(?:>|$)')
+
+def to_ansi(message: str) -> str:
+    """Convert a styled message to ANSI escape sequences"""
+    for i, o in _ANSI_PATTERNS:
+        message = message.replace(i, o)
+    return html.unescape(_TAG_RE.sub('', message))
+
+####################################################################################################
+
 def pt_print(message: str) -> None:
+    from prompt_toolkit import HTML, print_formatted_text
     # if message:
     message = HTML(message)
     print_formatted_text(
         message,
-        style=STYLE,
+        style=_style(),
     )
 
 ####################################################################################################
 
-def remove_style(message: str) -> None:
-    new_message = ''
-    in_style = False
-    for c in message:
-        if in_style:
-            if c == '>':
-                in_style = False
-        else:
-            if c == '<':
-                in_style = True
-            else:
-                new_message += c
-    return new_message
+def remove_style(message: str) -> str:
+    """Return the text of a styled message"""
+    return html.unescape(_TAG_RE.sub('', message))
 
 ####################################################################################################
 
@@ -124,7 +172,134 @@ html_escape = html.escape
 ####################################################################################################
 
 # atprint = default_print
-printc = pt_print
+_printc = pt_print
+
+# the sink is per thread, thus a daemon command doesn't capture the messages of the other threads
+# Fixme: nor of the worker threads it starts
+_local = threading.local()
+_batch = None
+
+def printc(message: str = '') -> None:
+    sink = getattr(_local, 'sink', None)
+    if sink is not None:
+        sink(str(message))
+    elif _batch is not None:
+        _batch.add(str(message))
+    elif not sys.stdout.isatty():
+        # no style for a pipe or a file
+        sys.stdout.write(remove_style(str(message)) + '\n')
+    else:
+        _printc(message)
+
+@contextmanager
+def capture(sink: Callable[[str], None]):
+    """Send the messages of :func:`printc` from the current thread to `sink` instead of the console"""
+    previous = getattr(_local, 'sink', None)
+    _local.sink = sink
+    try:
+        yield
+    finally:
+        _local.sink = previous
+
+####################################################################################################
+
+class _Batch:
+
+    """Accumulate the messages and print them in bulk to the console, a pipe or a pager
+
+    A timer thread flushes the pending messages after `TIME`, thus the output of a command which
+    blocks on a request is not held back.
+    """
+
+    SIZE = 1000   # messages per flush
+    TIME = .1   # s between flushes, for the slow commands
+
+    ##############################################
+
+    def __init__(self, pager: bool) -> None:
+        self._messages = []
+        self._flush_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._tty = sys.stdout.isatty()
+        self._pager = None
+        if pager and self._tty:
+            command = shlex.split(os.environ.get('PAGER') or 'less -R')
+            try:
+                self._pager = subprocess.Popen(command, stdin=subprocess.PIPE, text=True)
+            except OSError:
+                pass
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._run_timer, name='printer', daemon=True)
+        self._timer.start()
+
+    ##############################################
+
+    def _run_timer(self) -> None:
+        while not self._closed.wait(self.TIME):
+            with self._lock:
+                if self._messages and time.monotonic() - self._flush_time >= self.TIME:
+                    self._flush()
+
+    def add(self, message: str) -> None:
+        with self._lock:
+            self._messages.append(message)
+            if len(self._messages) >= self.SIZE or time.monotonic() - self._flush_time > self.TIME:
+                self._flush()
+
+    def _flush(self) -> None:
+        self._flush_time = time.monotonic()
+        messages, self._messages = self._messages, []
+        if not messages:
+            return
+        if self._pager is not None:
+            if self._pager.stdin.closed:
+                # the pager was quit
+                return
+            try:
+                self._pager.stdin.write(''.join(to_ansi(_) + '\n' for _ in messages))
+                self._pager.stdin.flush()
+            except BrokenPipeError:
+                self._pager.stdin.close()
+        elif not self._tty:
+            sys.stdout.write(''.join(remove_style(_) + '\n' for _ in messages))
+            sys.stdout.flush()
+        else:
+            try:
+                # one parsing and one rendering
+                _printc('\n'.join(messages))
+            except ExpatError:
+                # report the faulty message
+                for _ in messages:
+                    _printc(_)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._timer.join()
+        with self._lock:
+            self._flush()
+        if self._pager is not None:
+            try:
+                self._pager.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._pager.wait()
+
+@contextmanager
+def batch(pager: bool = False):
+    """Print the messages of :func:`printc` in bulk, through a pager if `pager` is set and stdout is
+    a terminal
+    """
+    global _batch
+    if _batch is not None or getattr(_local, 'sink', None) is not None:
+        # already batched or captured
+        yield
+        return
+    _batch = _Batch(pager)
+    try:
+        yield
+    finally:
+        _batch, _ = None, _batch
+        _.close()
 
 ####################################################################################################
 
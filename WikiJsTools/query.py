@@ -91,33 +91,41 @@ system {
 }}}
 '''
 
-PAGE = '''
-query ($path: String!, $locale: String!) {
-  pages {
-    singleByPath(path: $path, locale: $locale) {
-      # Page
+# Field-selection profiles
+#   minimal:  identity and dates, e.g. to stat a file
+#   metadata: what BasePage.export writes in the file header
+#   full:     everything, including the rendered HTML
+#  each profile includes the fields of the previous ones
+
+PAGE_PROFILES = ('minimal', 'metadata', 'full')
+
+PAGE_FIELDS = dict(
+    minimal='''
       id
       path
-      hash
+      locale
+      createdAt
+      updatedAt
+''',
+    metadata='''
       title
       description
       isPrivate
       isPublished
       privateNS
-      publishStartDate
-      publishEndDate
+      contentType
       tags {
         # PageTag
         tag
       }
-      # content
+''',
+    full='''
+      hash
+      publishStartDate
+      publishEndDate
       render
       # toc # Error: String cannot represent value
-      contentType
-      createdAt
-      updatedAt
       editor
-      locale
       scriptCss
       scriptJs
       authorId
@@ -126,12 +134,71 @@ query ($path: String!, $locale: String!) {
       creatorId
       creatorName
       creatorEmail
-}}}
+''',
+)
+
+# PageListItem doesn't have more fields than metadata
+LIST_PAGE_FIELDS = dict(
+    minimal=PAGE_FIELDS['minimal'],
+    metadata='''
+      title
+      description
+      contentType
+      isPublished
+      isPrivate
+      privateNS
+      tags
+''',
+    full='',
+)
+
+def profile_fields(fields: dict, profile: str) -> str:
+    if profile not in PAGE_PROFILES:
+        raise ValueError(f'Invalid field-selection profile {profile}')
+    _ = ''
+    for name in PAGE_PROFILES:
+        _ += fields[name]
+        if name == profile:
+            break
+    return _
+
+def page_fields(profile: str = 'full', content: bool = False) -> str:
+    fields = profile_fields(PAGE_FIELDS, profile)
+    if content:
+        # saves the complete_page request
+        fields += '      content' + LINESEP
+    return fields
+
+def PAGE(profile: str = 'full', content: bool = False) -> str:
+    fields = page_fields(profile, content)
+    return f'''
+query ($path: String!, $locale: String!) {{
+  pages {{
+    singleByPath(path: $path, locale: $locale) {{
+      # Page
+{fields}}}}}}}
+'''
+
+# Fetch several pages in one request using aliases p0, p1, ...
+def PAGES_BY_PATH(number_of_pages: int, profile: str = 'full', content: bool = False) -> str:
+    fields = page_fields(profile, content)
+    variables = ', '.join([f'$path{i}: String!' for i in range(number_of_pages)])
+    aliases = ''
+    for i in range(number_of_pages):
+        aliases += f'''
+    p{i}: singleByPath(path: $path{i}, locale: $locale) {{
+      # Page
+{fields}    }}'''
+    return f'''
+query ($locale: String!, {variables}) {{
+  pages {{{aliases}
+}}}}
 '''
 
 # query ($limit: Int!, $orderBy: PageOrderBy!, $orderByDirection: PageOrderByDirection!) {
 #     list(limit: $limit, orderBy: $orderBy, orderByDirection: $orderByDirection) {
-def LIST_PAGE(order_by, order_by_direction):
+def LIST_PAGE(order_by, order_by_direction, profile: str = 'metadata'):
+    fields = profile_fields(LIST_PAGE_FIELDS, profile)
     return f'''
 query ($limit: Int!) {{
   pages {{
@@ -141,22 +208,11 @@ query ($limit: Int!) {{
       orderByDirection: {order_by_direction}
     ) {{
       # PageListItem
-      id
-      path
-      locale
-      title
-      description
-      contentType
-      isPublished
-      isPrivate
-      privateNS
-      createdAt
-      updatedAt
-      tags
-}}}}}}
+{fields}}}}}}}
 '''
 
-def LIST_PAGE_FOR_TAGS(order_by):
+def LIST_PAGE_FOR_TAGS(order_by, profile: str = 'metadata'):
+    fields = profile_fields(LIST_PAGE_FIELDS, profile)
     return f'''
 query ($tags: [String!], $limit: Int!) {{
   pages {{
@@ -166,19 +222,16 @@ query ($tags: [String!], $limit: Int!) {{
       tags: $tags
     ) {{
       # PageListItem
+{fields}}}}}}}
+'''
+
+LIST_PAGE_IDS = '''
+query ($limit: Int!) {
+  pages {
+    list(limit: $limit) {
+      # PageListItem
       id
-      path
-      locale
-      title
-      description
-      contentType
-      isPublished
-      isPrivate
-      privateNS
-      createdAt
-      updatedAt
-      tags
-}}}}}}
+}}}
 '''
 
 TREE_PATH = '''
@@ -398,6 +451,13 @@ mutation ($id: Int!,
 }}}
 '''
 
+CHECK_CONFLICTS = '''
+query ($id: Int!, $checkoutDate: Date!) {
+  pages {
+    checkConflicts(id: $id, checkoutDate: $checkoutDate)
+}}
+'''
+
 PAGE_SEARCH = '''
 query ($query: String!) {
   pages {
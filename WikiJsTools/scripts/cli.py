@@ -13,9 +13,10 @@ __all__ = ['main']
 ####################################################################################################
 
 import argparse
+import os
+import sys
 
-from WikiJsTools.Cli import Cli
-from WikiJsTools.WikiJsApi import WikiJsApi
+# The modules are imported after the parsing of the arguments, see benchmarks/startup.py
 from WikiJsTools import config as Config
 
 ####################################################################################################
@@ -27,12 +28,61 @@ def main():
         epilog='',
     )
     parser.add_argument('--debug', action='store_true')
+    parser.add_argument('--config', default=Config.CONFIG_YAML_PATH, help='config file, e.g. written by wikijs-standin')
+    parser.add_argument('--stats', metavar='FILE', help='write the request statistics as JSON on exit')
+    parser.add_argument('--trace', metavar='FILE', help='write the requests as a Chrome trace on exit')
+    parser.add_argument('-c', '--command', help='run the commands and exit, through the daemon if it is listening')
+    parser.add_argument('--daemon', action='store_true', help='serve the commands of -c on a Unix socket')
+    parser.add_argument('--stop-daemon', action='store_true')
+    parser.add_argument('--no-daemon', action='store_true', help="don't send -c to the daemon")
+    parser.add_argument('--socket', default=Config.DAEMON_SOCKET_PATH, help='socket of the daemon')
+    # Cli.FORMATS
+    parser.add_argument('--format', choices=('text', 'ndjson', 'csv'), default='text', help='output of the listings, ndjson and csv stream records')
     args = parser.parse_args()
 
     if args.debug:
         Config.DEBUG = True
 
-    config = Config.load_config()
+    try:
+        run(args)
+    except BrokenPipeError:
+        # the reader of the output has gone, e.g. head, see the signal module documentation
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+####################################################################################################
+
+def run(args: argparse.Namespace) -> None:
+    # thin client
+    if args.stop_daemon or (args.command and not args.no_daemon):
+        from WikiJsTools.daemon import send_command, stop_daemon
+        if args.stop_daemon:
+            sys.exit(0 if stop_daemon(args.socket) else 1)
+        status = send_command(args.command, args.socket, args.format)
+        if status is not None:
+            sys.exit(status)
+
+    from WikiJsTools.Cli import Cli
+    from WikiJsTools.WikiJsApi import WikiJsApi
+    from WikiJsTools.daemon import WikiJsDaemon, run_command
+
+    config = Config.load_config(args.config)
     api = WikiJsApi(api_url=config.API_URL, api_key=config.API_KEY)
-    cli = Cli(api)
-    cli.cli(query='')
+    cli = Cli(api, output_format=args.format)
+    status = 0
+    try:
+        if args.daemon:
+            WikiJsDaemon(cli, args.socket).serve_forever()
+        elif args.command:
+            # the commands that need the trees wait on them
+            cli._start_loading()
+            status = run_command(cli, args.command)
+        else:
+            cli.cli(query='')
+    finally:
+        if args.stats:
+            api.stats.dump_json(args.stats)
+        if args.trace:
+            api.stats.dump_chrome_trace(args.trace)
+    sys.exit(status)
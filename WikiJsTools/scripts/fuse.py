@@ -15,8 +15,7 @@ __all__ = ['main']
 import argparse
 import logging
 
-from WikiJsTools.fuse import mount
-from WikiJsTools.WikiJsApi import WikiJsApi
+# The modules are imported after the parsing of the arguments, see benchmarks/startup.py
 from WikiJsTools import config as Config
 
 ####################################################################################################
@@ -28,15 +27,47 @@ def main():
         epilog='',
     )
     parser.add_argument('--debug', action='store_true')
+    parser.add_argument('--config', default=Config.CONFIG_YAML_PATH, help='config file, e.g. written by wikijs-standin')
+    parser.add_argument('--entry-timeout', type=float, default=Config.FUSE_ENTRY_TIMEOUT, help='directory entry cache timeout in s')
+    parser.add_argument('--attr-timeout', type=float, default=Config.FUSE_ATTR_TIMEOUT, help='file attribute cache timeout in s')
+    parser.add_argument('--negative-timeout', type=float, default=Config.FUSE_NEGATIVE_TIMEOUT, help='missing entry cache timeout in s')
+    parser.add_argument('--prefetch-depth', type=int, default=Config.FUSE_PREFETCH_DEPTH, help='number of pages prefetched per directory listing, 0 to disable')
+    parser.add_argument('--asset-cache', type=int, default=Config.FUSE_ASSET_CACHE_SIZE, help=f'number of asset blocks of {Config.FUSE_ASSET_BLOCK_SIZE // 1024} kB kept in memory')
+    parser.add_argument('--single-thread', action='store_true', help='serialise the file system operations')
+    parser.add_argument('--mirror', metavar='DIR', help='read-only mount served from a local mirror of the wiki in DIR')
+    parser.add_argument('--mirror-refresh', type=float, default=Config.FUSE_MIRROR_REFRESH_TIME, help='mirror refresh period in s')
+    parser.add_argument('--locale', default='fr', help='locale served by the mirror')
     parser.add_argument('mount')
     args = parser.parse_args()
 
     if args.debug:
         Config.DEBUG = True
 
-    config = Config.load_config()
+    from WikiJsTools import fuse
+    from WikiJsTools.WikiJsApi import WikiJsApi
+
+    config = Config.load_config(args.config)
     api = WikiJsApi(api_url=config.API_URL, api_key=config.API_KEY)
     # level = logging.DEBUG
     level = logging.INFO
     logging.basicConfig(level=level)
-    mount(api, args.mount)
+    if args.mirror:
+        fuse.mount_mirror(
+            api,
+            args.mount,
+            args.mirror,
+            locale=args.locale,
+            refresh_time=args.mirror_refresh,
+            multithreaded=not args.single_thread,
+        )
+        return
+    fuse.mount(
+        api,
+        args.mount,
+        entry_timeout=args.entry_timeout,
+        attr_timeout=args.attr_timeout,
+        negative_timeout=args.negative_timeout,
+        prefetch_depth=args.prefetch_depth,
+        asset_cache_size=args.asset_cache,
+        multithreaded=not args.single_thread,
+    )
@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+__all__ = ['main']
+
+####################################################################################################
+
+from pathlib import Path
+import argparse
+
+from WikiJsTools.standin import StandInServer
+from WikiJsTools.synthetic import SyntheticWiki
+
+####################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='wikijs-standin',
+        description='Local stand-in of a Wiki.js server serving a synthetic wiki',
+        epilog='',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--pages', type=int, default=1000, help='number of pages')
+    parser.add_argument('--versions', type=int, default=3, help='number of versions per page')
+    parser.add_argument('--assets', type=int, default=100, help='number of assets')
+    parser.add_argument('--depth', type=int, default=3, help='maximum folder depth')
+    parser.add_argument('--tags', type=int, default=50, help='number of tags')
+    parser.add_argument('--lines', type=int, default=40, help='number of lines per page')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0, help='latency per request in s')
+    parser.add_argument('--jitter', type=float, default=0, help='random latency added per request in s')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of the requests that fail')
+    parser.add_argument('--write-config', metavar='FILE', help='write a wikijs-cli config for the server')
+    parser.add_argument('--verbose', action='store_true', help='log the requests')
+    args = parser.parse_args()
+
+    wiki = SyntheticWiki(
+        pages=args.pages,
+        versions=args.versions,
+        assets=args.assets,
+        depth=args.depth,
+        tags=args.tags,
+        lines=args.lines,
+        seed=args.seed,
+    )
+    server = StandInServer(
+        wiki,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+    if args.write_config:
+        Path(args.write_config).write_text(f'API_URL: {server.url}\nAPI_KEY: standin\n')
+    print(f'Serving {wiki.number_of_pages} pages on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
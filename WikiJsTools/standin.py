@@ -0,0 +1,263 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Local stand-in of a Wiki.js server, to benchmark the tools without a production wiki.
+
+The server answers the GraphQL queries on ``/graphql`` from a `SyntheticWiki`, the uploads on
+``/u`` and the asset requests with HTTP Range support.  A latency and an error rate can be
+injected, an error is a GraphQL error for a query and a 503 for an asset.
+
+Usage::
+
+    with StandInServer(SyntheticWiki(pages=5000), latency=.02) as server:
+        api = WikiJsApi(server.url, 'key')
+
+"""
+
+####################################################################################################
+
+__all__ = ['StandInServer']
+
+####################################################################################################
+
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+import json
+import random
+import re
+import threading
+import time
+
+from .graphql import GraphQLError, execute
+from .synthetic import SyntheticWiki
+
+####################################################################################################
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+####################################################################################################
+
+class _Handler(BaseHTTPRequestHandler):
+
+    # keep-alive, as Wiki.js
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately, Nagle would then wait for the delayed ACK
+    disable_nagle_algorithm = True
+
+    ##############################################
+
+    @property
+    def _standin(self) -> 'StandInServer':
+        return self.server.standin
+
+    def log_message(self, format: str, *args) -> None:
+        if self._standin.verbose:
+            super().log_message(format, *args)
+
+    ##############################################
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, data: dict) -> None:
+        self._send(HTTPStatus.OK, json.dumps(data).encode('utf8'), 'application/json; charset=utf-8')
+
+    def _read_body(self) -> bytes | None:
+        """Return the body, None if the client has gone before sending it"""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if len(body) < length:
+            return None
+        return body
+
+    def handle_one_request(self) -> None:
+        try:
+            super().handle_one_request()
+        except ConnectionError:
+            # the client has gone, e.g. an interrupted command
+            self.close_connection = True
+
+    ##############################################
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        if body is None:
+            self.close_connection = True
+            return
+        failed = self._standin.inject()
+        match urlsplit(self.path).path:
+            case '/graphql':
+                try:
+                    query = json.loads(body)
+                except json.JSONDecodeError as e:
+                    self._send(HTTPStatus.BAD_REQUEST, f'Invalid JSON: {e}'.encode('utf8'), 'text/plain')
+                    return
+                if failed:
+                    error = GraphQLError('Injected error', path=['standin'])
+                    self._send_json({'errors': [error.to_dict()], 'data': None})
+                    return
+                self._send_json(self._standin.execute(query.get('query', ''), query.get('variables')))
+            case '/u':
+                if failed:
+                    self._send(HTTPStatus.SERVICE_UNAVAILABLE, b'Injected error', 'text/plain')
+                    return
+                self._upload(body)
+            case _:
+                self._send(HTTPStatus.NOT_FOUND, b'Not Found', 'text/plain')
+
+    ##############################################
+
+    def _upload(self, body: bytes) -> None:
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('latin-1')
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        folder_id = 0
+        files = []
+        for part in message.iter_parts():
+            if part.get_param('name', header='content-disposition') != 'mediaUpload':
+                continue
+            filename = part.get_filename()
+            data = part.get_payload(decode=True)
+            if filename is None:
+                folder_id = json.loads(data).get('folderId', 0)
+            else:
+                files.append((filename, data, part.get_content_type()))
+        try:
+            for filename, data, mime in files:
+                self._standin.wiki.upload(folder_id, filename, data, mime)
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, str(e).encode('utf8'), 'text/plain')
+            return
+        self._send(HTTPStatus.OK, b'ok', 'text/plain')
+
+    ##############################################
+
+    def do_GET(self) -> None:
+        failed = self._standin.inject()
+        path = unquote(urlsplit(self.path).path).lstrip('/')
+        _ = self._standin.wiki.asset_data(path)
+        if _ is None:
+            self._send(HTTPStatus.NOT_FOUND, b'Not Found', 'text/plain')
+            return
+        if failed:
+            self._send(HTTPStatus.SERVICE_UNAVAILABLE, b'Injected error', 'text/plain')
+            return
+        asset, data = _
+        headers = {'Accept-Ranges': 'bytes'}
+        range_ = self.headers.get('Range')
+        if range_ is None:
+            self._send(HTTPStatus.OK, data, asset.mime, headers)
+            return
+        match = _RANGE_RE.match(range_.strip())
+        if match is None:
+            self._send(HTTPStatus.OK, data, asset.mime, headers)
+            return
+        start, stop = match.groups()
+        size = len(data)
+        if not start:
+            # suffix range
+            start, stop = max(0, size - int(stop or 0)), size - 1
+        else:
+            start, stop = int(start), min(int(stop) if stop else size - 1, size - 1)
+        if start >= size or start > stop:
+            headers['Content-Range'] = f'bytes */{size}'
+            self._send(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, b'', asset.mime, headers)
+            return
+        headers['Content-Range'] = f'bytes {start}-{stop}/{size}'
+        self._send(HTTPStatus.PARTIAL_CONTENT, data[start:stop + 1], asset.mime, headers)
+
+    do_HEAD = do_GET
+
+####################################################################################################
+
+class StandInServer:
+
+    ##############################################
+
+    def __init__(
+            self,
+            wiki: SyntheticWiki,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            latency: float = 0,
+            jitter: float = 0,
+            error_rate: float = 0,
+            seed: int = None,
+            verbose: bool = False,
+    ) -> None:
+        """`latency` and `jitter` are in s, a request is delayed by latency + uniform(0, jitter)
+
+        A port 0 selects a free port, see :attr:`url`.
+        """
+        self.wiki = wiki
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+        self.verbose = verbose
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = None
+        self._query_root = wiki.query_root()
+        self._mutation_root = wiki.mutation_root()
+
+    ##############################################
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    ##############################################
+
+    def inject(self) -> bool:
+        """Sleep the injected latency and return True if the request must fail"""
+        with self._rng_lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter) if self.jitter else self.latency
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    def execute(self, query: str, variables: dict) -> dict:
+        return execute(query, variables, self._query_root, self._mutation_root)
+
+    ##############################################
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> 'StandInServer':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
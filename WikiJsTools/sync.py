@@ -6,25 +6,26 @@
 #
 ####################################################################################################
 
-__all__ = ['sync', 'git_sync']
+__all__ = ['sync', 'git_sync', 'WorkTreeWriter']
 
 ####################################################################################################
 
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-import json
 import os
 import subprocess
 
+from .history_store import HistoryStore
 from .printer import printc, CommandError
-from .WikiJsApi import WikiJsApi
+from .WikiJsApi import WikiJsApi, BasePage
 
 ####################################################################################################
 
 GIT = '/usr/bin/git'
 
-HISTORY_JSON = 'wikijs-history.json'
+HISTORY_JSON = 'wikijs-history.json'   # replaced by HISTORY_DB
+HISTORY_DB = 'wikijs-history.sqlite'
 
 ####################################################################################################
 
@@ -57,7 +58,8 @@ def get_last_commit_date(repo_path):
 
 ####################################################################################################
 
-def sync_asset(api: WikiJsApi, path: Path, exist_ok: bool = False) -> None:
+def sync_asset(api: WikiJsApi, path: Path, exist_ok: bool = False) -> list[Path]:
+    """Sync the assets and return the removed files"""
 
     # DANGER : remove all the files that are not listed as assets !!!
 
@@ -102,6 +104,7 @@ def sync_asset(api: WikiJsApi, path: Path, exist_ok: bool = False) -> None:
     # Clean old assets
     for _ in paths:
         _.unlink()
+    return paths
 
 ####################################################################################################
 
@@ -118,8 +121,7 @@ def sync(api: WikiJsApi, path: Path) -> None:
     sync_path.mkdir(exist_ok=False)
 
     for page in api.list_pages():
-        # page.complete()
-        file_path = page.sync(sync_path)
+        file_path = page.to_page().sync(sync_path)
         if file_path is not None:
             _ = file_path.relative_to(sync_path)
             printc(f"Wrote <green>{_}</green>")
@@ -130,6 +132,67 @@ def sync(api: WikiJsApi, path: Path) -> None:
 
 ####################################################################################################
 
+class WorkTreeWriter:
+
+    """Write the page versions in the working tree of the Git repository
+
+    The created directories are cached, and the directories left by a move or a removal are tracked,
+    thus :meth:`clean` removes the empty directories in a time proportional to the number of changes.
+    """
+
+    ##############################################
+
+    def __init__(self, repo_path: Path) -> None:
+        self._repo_path = repo_path
+        self._dirs = set()
+        self._vacated = set()
+
+    ##############################################
+
+    def mkdir(self, path: Path) -> None:
+        if path in self._dirs:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        while path != self._repo_path and path not in self._dirs:
+            self._dirs.add(path)
+            path = path.parent
+
+    ##############################################
+
+    def write(self, page: BasePage) -> tuple[Path, bool]:
+        """Write the page and return its path and if it is a new file"""
+        file_path = page.file_path(self._repo_path)
+        self.mkdir(file_path.parent)
+        is_new = not file_path.exists()
+        file_path.write_text(page.export(), encoding='utf8')
+        return file_path, is_new
+
+    ##############################################
+
+    def move(self, old_path: Path, new_path: Path) -> None:
+        self.mkdir(new_path.parent)
+        git(self._repo_path, 'mv', old_path, new_path)
+        self._vacated.add(old_path.parent)
+
+    def removed(self, path: Path) -> None:
+        self._vacated.add(path.parent)
+
+    ##############################################
+
+    def clean(self) -> None:
+        """Remove the vacated directories that are empty"""
+        # deepest first
+        for path in sorted(self._vacated, key=lambda _: len(_.parts), reverse=True):
+            while path != self._repo_path and path.exists() and not any(path.iterdir()):
+                _ = path.relative_to(self._repo_path)
+                printc(f"<green>{_}</green> <orange>is empty</orange>")
+                path.rmdir()
+                self._dirs.discard(path)
+                path = path.parent
+        self._vacated.clear()
+
+####################################################################################################
+
 def git_sync(api: WikiJsApi, path: Path) -> None:
     """Sync Git repo"""
 
@@ -149,136 +212,114 @@ def git_sync(api: WikiJsApi, path: Path) -> None:
         # Protection
         if not repo_path.joinpath('.git').exists():
             raise CommandError(f"<red> Directory <green>{repo_path}</green> is not a git repository</red>")
-        if not repo_path.joinpath(HISTORY_JSON).exists():
-            raise CommandError(f"<red> Directory <green>{repo_path}</green> doesn't have a JSON history</red>")
+        if not (repo_path.joinpath(HISTORY_DB).exists() or repo_path.joinpath(HISTORY_JSON).exists()):
+            raise CommandError(f"<red> Directory <green>{repo_path}</green> doesn't have a history</red>")
         printc("<blue>Git already initialised</blue>")
     else:
         repo_path.mkdir()
         created = True
 
     history_json_path = repo_path.joinpath(HISTORY_JSON)
+    history_db_path = repo_path.joinpath(HISTORY_DB)
     asset_path = repo_path.joinpath('_assets')
 
     def git_(command: str, *args) -> None:
         git(repo_path, command, *args)
 
-    def commit(date: datetime, message: str) -> None:
+    def commit(date: datetime, message: str, *paths) -> None:
+        # commit only `paths`, thus a tracked file doesn't require a git add
         git_(
             'commit',
             '-m', message,
             f'--date={date.isoformat()}',
+            *(('--', *paths) if paths else ()),
         )
 
-    json_versions = []
+    writer = WorkTreeWriter(repo_path)
+
+    def commit_version(ph, message: str) -> None:
+        file_path, is_new = writer.write(ph.wrapper)
+        if is_new:
+            git_('add', file_path)
+            commit(ph.date, message)
+        else:
+            commit(ph.date, message, file_path)
+
     last_version_date = None   # Fixme: this is not the last edit
     last_commit_date = None
     if created:
         git_('init')
-    else:
-        with open(history_json_path, 'r') as fh:
-            json_versions = json.load(fh)
-            last_version = json_versions[-1]
+    migrate = not history_db_path.exists() and history_json_path.exists()
+    with HistoryStore(history_db_path) as store:
+        if migrate:
+            printc(f"<blue>Migrate</blue> <green>{HISTORY_JSON}</green>")
+            store.migrate_json(history_json_path)
+        if not created:
             # How versionID are generated ???
-            # last_version_id = last_version['versionId']
-            last_version_date = datetime.fromisoformat(last_version['versionDate'])
-        printc(f"Last version date <blue>{last_version_date}</blue>")
-        last_commit_date = get_last_commit_date(repo_path)
-        printc(f"Last commit date <blue>{last_commit_date}</blue>")
-
-    # Fixme: progress callback
-    #  how to get number of versions ?
-    def progress_callback(p: int) -> None:
-        printc(f"<blue>{p} % done</blue>")
-
-    # Fixme: skip ?
-    printc("<blue>Get page histories...</blue>")
-    history = api.history(progress_callback)
-    printc("<blue>...Done</blue>")
-
-    # Commit page history
-    for ph in history:
-        if last_commit_date is not None:
-            # Git commit date is limited to s and not ms !
-            # if ph.date <= last_commit_date:
-            if ph.date <= last_version_date:
-                continue
-
-        page = ph.page
-
-        is_moved = ph.is_moved
-        if is_moved:
-            old_upath, new_upath = is_moved
-            printc(f'<blue>moved</blue> @{page.locale} <green>{old_upath}</green> -> <green>{new_upath}</green>')
-            old_path = page.file_path(repo_path, old_upath)
-            if not old_path.exists():
-                raise CommandError(f"<red>Error <green>{old_upath}</green> is missing</red>")
-            else:
-                new_path = page.file_path(repo_path, new_upath)
-                new_path.parent.mkdir(parents=True, exist_ok=True)
-                # Fixme: remove old directory
-                git_('mv', old_path, new_path)
-                # update file content metadata
-                # Fixme: file_path == new_path
-                file_path = ph.sync(repo_path, check_exists=False)
-                git_('add', file_path)
-                # Fixme: is move and update possible ???
-                message = f'{ph.date_utc_str} <blue>move</blue> @{page.locale} {ph.old_path} -> {ph.new_path}'
-                commit(ph.date, message)
-        else:
-            if ph.is_initial:
-                action = 'create'
-            elif ph.is_edited:
-                action = 'edit'
-            elif ph.is_metadata_edited:
-                action = 'metadata edit'
-            else:
-                action = 'ghost'
-            printc(f'{ph.date_utc_str} <blue>{action}</blue> @{page.locale} <green>{page.path}</green>')
-            file_path = ph.sync(repo_path, check_exists=False)
-            git_('add', file_path)
-            message = f'{action} @{page.locale} {page.path}'
-            commit(ph.date, message)
-
-    # Fixme: remove empty directory
-
-    # Save Assets
-    #  Wiki.js doesn't implement an history for assets
-    #  so we rewrite...
-    sync_asset(api, asset_path, exist_ok=True)
-
-    printc("<blue>Clean old path</blue>")
-    for root, direnames, filenames in repo_path.walk():
-        if root == repo_path:
-            direnames.remove('.git')
-        path = root
-        while True:
-            if list(path.iterdir()):
-                break
-            else:
-                _ = path.relative_to(repo_path)
-                printc(f"<green>{_}</green> <orange>is empty</orange>")
-                path.rmdir()
-                path = path.parent
-
-    # Now write history.json
-    with open(history_json_path, 'w') as fh:
-        # Fixme: reset ?
-        json_versions = []
+            last_version_date = store.last_version_date()
+            printc(f"Last version date <blue>{last_version_date}</blue>")
+            last_commit_date = get_last_commit_date(repo_path)
+            printc(f"Last commit date <blue>{last_commit_date}</blue>")
+
+        # Fixme: progress callback
+        #  how to get number of versions ?
+        def progress_callback(p: int) -> None:
+            printc(f"<blue>{p} % done</blue>")
+
+        # Fixme: skip ?
+        printc("<blue>Get page histories...</blue>")
+        history = api.history(progress_callback)
+        printc("<blue>...Done</blue>")
+
+        # Commit page history
         for ph in history:
-            # Fixme: better ?
-            d = {
-                key: value
-                for key, value in ph.__dict__.items()
-                if key not in ('api', 'page', '_page_version', 'prev', 'next') and value is not None
-            }
-            d['locale'] = ph.locale
-            d['path'] = ph.path_str
-            d['pageId'] = ph.page_id
-            json_versions.append(d)
-        # last = history[-1]
-        # data = {
-        #     'versions': versions,
-        #     'last_version_id': last.versionId,
-        #     'laste_date': last.versionDate,
-        # }
-        json.dump(json_versions, fh, ensure_ascii=False, indent=4)
+            if last_commit_date is not None and last_version_date is not None:
+                # Git commit date is limited to s and not ms !
+                # if ph.date <= last_commit_date:
+                if ph.date <= last_version_date:
+                    continue
+
+            page = ph.page
+
+            is_moved = ph.is_moved
+            if is_moved:
+                old_upath, new_upath = is_moved
+                printc(f'<blue>moved</blue> @{page.locale} <green>{old_upath}</green> -> <green>{new_upath}</green>')
+                old_path = page.file_path(repo_path, old_upath)
+                if not old_path.exists():
+                    raise CommandError(f"<red>Error <green>{old_upath}</green> is missing</red>")
+                else:
+                    new_path = page.file_path(repo_path, new_upath)
+                    writer.move(old_path, new_path)
+                    # update file content metadata
+                    # Fixme: file_path == new_path
+                    file_path, _ = writer.write(ph.wrapper)
+                    git_('add', file_path)
+                    # Fixme: is move and update possible ???
+                    message = f'{ph.date_utc_str} <blue>move</blue> @{page.locale} {ph.old_path} -> {ph.new_path}'
+                    commit(ph.date, message)
+            else:
+                if ph.is_initial:
+                    action = 'create'
+                elif ph.is_edited:
+                    action = 'edit'
+                elif ph.is_metadata_edited:
+                    action = 'metadata edit'
+                else:
+                    action = 'ghost'
+                printc(f'{ph.date_utc_str} <blue>{action}</blue> @{page.locale} <green>{page.path}</green>')
+                message = f'{action} @{page.locale} {page.path}'
+                commit_version(ph, message)
+
+        # Save Assets
+        #  Wiki.js doesn't implement an history for assets
+        #  so we rewrite...
+        for _ in sync_asset(api, asset_path, exist_ok=True):
+            writer.removed(_)
+
+        printc("<blue>Clean old path</blue>")
+        writer.clean()
+
+        # Append the new versions, the current versions are replaced
+        number_of_versions = store.append(HistoryStore.entry(ph) for ph in history)
+        printc(f"<blue>Stored</blue> {number_of_versions} versions")
@@ -0,0 +1,731 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Synthetic wiki served by the stand-in server.
+
+The wiki is generated from a seed: pages in a folder hierarchy with their history, tags, links
+between the pages, and asset folders with assets.  The contents are generated on demand, thus a
+large wiki has a small memory footprint.  The versions of a page differ by a few lines, like real
+edits.
+
+The resolvers implement the subset of the Wiki.js schema used by `WikiJsApi`, see
+:meth:`SyntheticWiki.query_root` and :meth:`SyntheticWiki.mutation_root`.  The mutations update
+the wiki like Wiki.js: an update or a move saves the previous state as a version.
+
+"""
+
+####################################################################################################
+
+__all__ = ['SyntheticWiki']
+
+####################################################################################################
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import PurePosixPath
+import random
+import threading
+
+from .graphql import GraphQLError
+
+####################################################################################################
+
+START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+AUTHOR_ID = 1
+AUTHOR_NAME = 'Administrator'
+AUTHOR_EMAIL = 'admin@example.com'
+
+WORDS = (
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa', 'lambda', 'sigma',
+    'omega', 'atlas', 'boreal', 'cobalt', 'dune', 'ember', 'fjord', 'glacier', 'harbor', 'island',
+    'jungle', 'kelp', 'lagoon', 'meadow', 'nebula', 'orbit', 'prairie', 'quartz', 'ridge', 'summit',
+)
+
+ASSET_TYPES = (
+    # ext, kind, mime
+    ('png', 'IMAGE', 'image/png'),
+    ('jpg', 'IMAGE', 'image/jpeg'),
+    ('pdf', 'BINARY', 'application/pdf'),
+)
+
+####################################################################################################
+
+def _date_str(date: datetime) -> str:
+    # as Wiki.js
+    return date.astimezone(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def _now() -> str:
+    return _date_str(datetime.now(timezone.utc))
+
+def _response(succeeded: bool = True, message: str = 'Success', error_code: int = 0) -> dict:
+    return dict(succeeded=succeeded, errorCode=error_code, slug='ok' if succeeded else 'error', message=message)
+
+####################################################################################################
+
+@dataclass
+class _State:
+    """State of a page, the current one or a version"""
+    path: str
+    locale: str
+    title: str
+    description: str
+    tags: list[str]
+    content: str | None   # None if it is generated
+    generation: int       # version of the generated content
+    date: str
+    isPublished: bool = True
+    isPrivate: bool = False
+    contentType: str = 'markdown'
+    # for a version
+    versionId: int = None
+    action: str = None       # PageVersion.action
+    actionType: str = None   # PageHistory.actionType
+    valueBefore: str = None
+    valueAfter: str = None
+
+####################################################################################################
+
+@dataclass
+class _Page:
+    id: int
+    createdAt: str
+    state: _State
+    versions: list[_State] = field(default_factory=list)   # older first
+
+####################################################################################################
+
+@dataclass
+class _Asset:
+    id: int
+    folderId: int
+    filename: str
+    ext: str
+    kind: str
+    mime: str
+    fileSize: int
+    createdAt: str
+    updatedAt: str
+    data: bytes = None   # None if it is generated
+
+####################################################################################################
+
+class SyntheticWiki:
+
+    ##############################################
+
+    def __init__(
+            self,
+            pages: int = 1000,
+            versions: int = 3,
+            assets: int = 100,
+            depth: int = 3,
+            tags: int = 50,
+            lines: int = 40,
+            locale: str = 'fr',
+            seed: int = 0,
+    ) -> None:
+        self._seed = seed
+        self._lines = lines
+        self._locale = locale
+        # the resolvers are called by the server threads
+        self._lock = threading.RLock()
+        self._pages = {}     # id -> _Page
+        self._by_path = {}   # (locale, path) -> id
+        self._version_id = 0
+        self._tree = None
+        self._folders = {}   # id -> (parent id, name)
+        self._assets = {}    # id -> _Asset
+        self._asset_paths = None
+        rng = random.Random(seed)
+        self._tag_names = [f'{WORDS[i % len(WORDS)]}-{i}' for i in range(tags)]
+        self._generate_pages(rng, pages, versions, depth)
+        self._generate_assets(rng, assets, depth)
+
+    ##############################################
+
+    def _generate_pages(self, rng: random.Random, number_of_pages: int, number_of_versions: int, depth: int) -> None:
+        # about the same number of children per folder at each level
+        fanout = max(2, round(number_of_pages ** (1 / (depth + 1))))
+        for i in range(number_of_pages):
+            folders = [f'{rng.choice(WORDS)}-{rng.randrange(fanout)}' for _ in range(rng.randint(0, depth))]
+            path = '/'.join(folders + [f'page-{i}'])
+            date = START_DATE + timedelta(days=rng.uniform(0, 365))
+            tags = rng.sample(self._tag_names, min(len(self._tag_names), rng.randint(0, 3)))
+            title = f'{rng.choice(WORDS).title()} {i}'
+            page = _Page(id=i + 1, createdAt=_date_str(date), state=None)
+            for version in range(number_of_versions + 1):
+                state = _State(
+                    path=path,
+                    locale=self._locale,
+                    title=title,
+                    description=f'Description of {title}',
+                    tags=tags,
+                    content=None,
+                    generation=version,
+                    date=_date_str(date),
+                )
+                if version < number_of_versions:
+                    self._version_id += 1
+                    state.versionId = self._version_id
+                    state.action = 'initial' if version == 0 else 'updated'
+                    state.actionType = 'initial' if version == 0 else 'edit'
+                    page.versions.append(state)
+                else:
+                    page.state = state
+                date += timedelta(hours=rng.uniform(1, 30 * 24))
+            self._pages[page.id] = page
+            self._by_path[(self._locale, path)] = page.id
+
+    ##############################################
+
+    def _generate_assets(self, rng: random.Random, number_of_assets: int, depth: int) -> None:
+        number_of_folders = max(1, number_of_assets // 10)
+        depths = {0: 0}
+        for i in range(1, number_of_folders + 1):
+            parent = rng.choice([_ for _, d in depths.items() if d < depth] or [0])
+            self._folders[i] = (parent, f'folder-{i}')
+            depths[i] = depths[parent] + 1
+        for i in range(1, number_of_assets + 1):
+            ext, kind, mime = rng.choice(ASSET_TYPES)
+            date = _date_str(START_DATE + timedelta(days=rng.uniform(0, 365)))
+            self._assets[i] = _Asset(
+                id=i,
+                folderId=rng.randrange(number_of_folders + 1),
+                filename=f'{rng.choice(WORDS)}-{i}.{ext}',
+                ext=f'.{ext}',
+                kind=kind,
+                mime=mime,
+                fileSize=rng.randint(1024, 512 * 1024),
+                createdAt=date,
+                updatedAt=date,
+            )
+
+    ############################################################################
+
+    @property
+    def number_of_pages(self) -> int:
+        return len(self._pages)
+
+    ##############################################
+
+    def content(self, page_id: int, state: _State) -> str:
+        if state.content is not None:
+            return state.content
+        # the base lines, then each version edits a few lines
+        rng = random.Random(f'{self._seed}-{page_id}')
+        lines = [f'# {state.title}', '']
+        for i in range(self._lines):
+            match rng.randrange(10):
+                case 0:
+                    target = self._pages.get(rng.randint(1, len(self._pages)))
+                    if target is not None:
+                        lines.append(f'See [{target.state.title}](/{target.state.path})')
+                        continue
+                case 1 if self._assets:
+                    asset = self._assets.get(rng.randint(1, len(self._assets)))
+                    if asset is not None:
+                        lines.append(f'![{asset.filename}](/{self.asset_path(asset)})')
+                        continue
+            lines.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))))
+        for version in range(1, state.generation + 1):
+            rng = random.Random(f'{self._seed}-{page_id}-{version}')
+            for _ in range(rng.randint(1, 3)):
+                i = rng.randrange(2, len(lines)) if len(lines) > 2 else len(lines)
+                lines.insert(i, f'Edit {version}: ' + ' '.join(rng.choice(WORDS) for _ in range(8)))
+        return '\n'.join(lines) + '\n'
+
+    ##############################################
+
+    def _page(self, id: int) -> _Page:
+        page = self._pages.get(int(id))
+        if page is None:
+            raise GraphQLError('This page does not exist.')
+        return page
+
+    def _page_item(self, page: _Page) -> dict:
+        """Return a PageListItem"""
+        state = page.state
+        return dict(
+            id=page.id,
+            path=state.path,
+            locale=state.locale,
+            title=state.title,
+            description=state.description,
+            contentType=state.contentType,
+            isPublished=state.isPublished,
+            isPrivate=state.isPrivate,
+            privateNS=None,
+            createdAt=page.createdAt,
+            updatedAt=state.date,
+            tags=list(state.tags),
+        )
+
+    def _page_object(self, page: _Page) -> dict:
+        """Return a Page, the content is generated on demand"""
+        state = page.state
+        _ = self._page_item(page)
+        _.update(
+            tags=[dict(tag=tag) for tag in state.tags],
+            content=lambda: self.content(page.id, state),
+            render=lambda: f'<div>{self.content(page.id, state)}</div>',
+            hash=f'{page.id:08x}{page.state.generation:08x}',
+            publishStartDate='',
+            publishEndDate='',
+            editor=state.contentType,
+            scriptCss='',
+            scriptJs='',
+            authorId=AUTHOR_ID,
+            authorName=AUTHOR_NAME,
+            authorEmail=AUTHOR_EMAIL,
+            creatorId=AUTHOR_ID,
+            creatorName=AUTHOR_NAME,
+            creatorEmail=AUTHOR_EMAIL,
+        )
+        return _
+
+    ############################################################################
+    #
+    # Query resolvers
+    #
+
+    def query_root(self) -> dict:
+        return {
+            'system': {
+                'info': self._info,
+            },
+            'pages': {
+                'list': self._list,
+                'single': self._single,
+                'singleByPath': self._single_by_path,
+                'history': self._history,
+                'version': self._version,
+                'tree': self._tree_items,
+                'links': self._links,
+                'search': self._search,
+                'tags': self._tags,
+                'searchTags': self._search_tags,
+                'checkConflicts': self._check_conflicts,
+            },
+            'assets': {
+                'folders': self._asset_folders,
+                'list': self._asset_list,
+            },
+        }
+
+    ##############################################
+
+    def _info(self) -> dict:
+        return dict(
+            currentVersion='2.5.300',
+            latestVersion='2.5.300',
+            groupsTotal=2,
+            pagesTotal=len(self._pages),
+            usersTotal=1,
+            tagsTotal=len(self._tag_names),
+        )
+
+    ##############################################
+
+    ORDER_KEYS = {
+        'CREATED': lambda _: _.createdAt,
+        'ID': lambda _: _.id,
+        'PATH': lambda _: _.state.path,
+        'TITLE': lambda _: _.state.title,
+        'UPDATED': lambda _: _.state.date,
+    }
+
+    def _list(
+            self,
+            limit: int = 0,
+            orderBy: str = 'TITLE',
+            orderByDirection: str = 'ASC',
+            tags: list[str] = None,
+            locale: str = None,
+            creatorId: int = None,
+            authorId: int = None,
+    ) -> list[dict]:
+        with self._lock:
+            pages = list(self._pages.values())
+        if tags:
+            # as Wiki.js, the pages having one of the tags, which are lowercased
+            tags = {_.strip().lower() for _ in tags}
+            pages = [_ for _ in pages if not tags.isdisjoint(_.state.tags)]
+        if locale:
+            pages = [_ for _ in pages if _.state.locale == locale]
+        if authorId is not None and authorId != AUTHOR_ID:
+            pages = []
+        pages.sort(key=self.ORDER_KEYS.get(orderBy, self.ORDER_KEYS['TITLE']), reverse=orderByDirection == 'DESC')
+        if limit:
+            pages = pages[:limit]
+        return [self._page_item(_) for _ in pages]
+
+    def _single(self, id: int) -> dict:
+        with self._lock:
+            return self._page_object(self._page(id))
+
+    def _single_by_path(self, path: str, locale: str) -> dict:
+        with self._lock:
+            id = self._by_path.get((locale, path))
+            if id is None:
+                raise GraphQLError('This page does not exist.')
+            return self._page_object(self._pages[id])
+
+    ##############################################
+
+    def _history(self, id: int, offsetPage: int = 0, offsetSize: int = 100) -> dict:
+        with self._lock:
+            page = self._page(id)
+            # newer first
+            trail = [
+                dict(
+                    versionId=_.versionId,
+                    versionDate=_.date,
+                    authorId=AUTHOR_ID,
+                    authorName=AUTHOR_NAME,
+                    actionType=_.actionType,
+                    valueBefore=_.valueBefore,
+                    valueAfter=_.valueAfter,
+                )
+                for _ in reversed(page.versions)
+            ]
+        start = (offsetPage or 0) * (offsetSize or 100)
+        return dict(trail=trail[start:start + (offsetSize or 100)], total=len(trail))
+
+    def _version(self, pageId: int, versionId: int) -> dict:
+        with self._lock:
+            page = self._page(pageId)
+            for state in page.versions:
+                if state.versionId == versionId:
+                    break
+            else:
+                raise GraphQLError('This version does not exist.')
+            return dict(
+                action=state.action,
+                authorId=str(AUTHOR_ID),
+                authorName=AUTHOR_NAME,
+                content=lambda: self.content(page.id, state),
+                contentType=state.contentType,
+                createdAt=page.createdAt,
+                versionDate=state.date,
+                description=state.description,
+                editor=state.contentType,
+                isPrivate=state.isPrivate,
+                isPublished=state.isPublished,
+                locale=state.locale,
+                pageId=page.id,
+                path=state.path,
+                publishEndDate='',
+                publishStartDate='',
+                tags=list(state.tags),
+                title=state.title,
+                versionId=state.versionId,
+            )
+
+    ##############################################
+
+    def _build_tree(self) -> list[dict]:
+        items = {}   # (locale, path) -> item
+        for page in sorted(self._pages.values(), key=lambda _: _.state.path):
+            state = page.state
+            parent = None
+            parts = state.path.split('/')
+            for depth in range(1, len(parts) + 1):
+                key = (state.locale, '/'.join(parts[:depth]))
+                item = items.get(key)
+                if item is None:
+                    item = items[key] = dict(
+                        id=len(items) + 1,
+                        path=key[1],
+                        depth=depth,
+                        title=parts[depth - 1],
+                        isPrivate=False,
+                        isFolder=False,
+                        privateNS=None,
+                        parent=parent,
+                        pageId=None,
+                        locale=state.locale,
+                    )
+                if depth < len(parts):
+                    item['isFolder'] = True
+                else:
+                    item['pageId'] = page.id
+                    item['title'] = state.title
+                parent = item['id']
+        return list(items.values())
+
+    def _tree_items(
+            self,
+            mode: str = 'ALL',
+            locale: str = None,
+            path: str = None,
+            parent: int = None,
+            includeAncestors: bool = False,
+    ) -> list[dict]:
+        with self._lock:
+            if self._tree is None:
+                self._tree = self._build_tree()
+            tree = self._tree
+        if path is not None:
+            # the siblings of the item at path
+            for _ in tree:
+                if _['path'] == path and _['locale'] == locale:
+                    parent = _['parent']
+                    break
+            else:
+                return []
+        items = [_ for _ in tree if _['parent'] == (parent or None) and (locale is None or _['locale'] == locale)]
+        match mode:
+            case 'FOLDERS':
+                items = [_ for _ in items if _['isFolder']]
+            case 'PAGES':
+                items = [_ for _ in items if _['pageId'] is not None]
+        return items
+
+    ##############################################
+
+    def _links(self, locale: str) -> list[dict]:
+        with self._lock:
+            pages = [_ for _ in self._pages.values() if _.state.locale == locale]
+        links = []
+        for page in pages:
+            targets = []
+            for line in self.content(page.id, page.state).splitlines():
+                if line.startswith('See ['):
+                    targets.append(f"{locale}/{line[line.index('](/') + 3:-1]}")
+            links.append(dict(id=page.id, path=page.state.path, title=page.state.title, links=targets))
+        return links
+
+    ##############################################
+
+    def _search(self, query: str, path: str = None, locale: str = None) -> dict:
+        query = query.lower()
+        with self._lock:
+            pages = list(self._pages.values())
+        results = [
+            dict(id=str(_.id), title=_.state.title, description=_.state.description, path=_.state.path, locale=_.state.locale)
+            for _ in pages
+            if (query in _.state.title.lower() or query in _.state.path.lower())
+            and (path is None or _.state.path.startswith(path))
+            and (locale is None or _.state.locale == locale)
+        ]
+        return dict(results=results, suggestions=[], totalHits=len(results))
+
+    def _tags(self) -> list[dict]:
+        date = _date_str(START_DATE)
+        return [
+            dict(id=i + 1, tag=_, title=_.title(), createdAt=date, updatedAt=date)
+            for i, _ in enumerate(self._tag_names)
+        ]
+
+    def _search_tags(self, query: str) -> list[str]:
+        query = query.lower()
+        return [_ for _ in self._tag_names if query in _]
+
+    def _check_conflicts(self, id: int, checkoutDate: str) -> bool:
+        with self._lock:
+            updated_at = self._page(id).state.date
+        return datetime.fromisoformat(updated_at) > datetime.fromisoformat(checkoutDate)
+
+    ############################################################################
+    #
+    # Asset resolvers
+    #
+
+    def _asset_folders(self, parentFolderId: int) -> list[dict]:
+        with self._lock:
+            return [
+                dict(id=id, name=name, slug=name)
+                for id, (parent, name) in self._folders.items()
+                if parent == parentFolderId
+            ]
+
+    def _asset_list(self, folderId: int, kind: str = 'ALL') -> list[dict]:
+        with self._lock:
+            assets = [_ for _ in self._assets.values() if _.folderId == folderId]
+        return [
+            dict(
+                id=_.id,
+                filename=_.filename,
+                ext=_.ext,
+                kind=_.kind,
+                mime=_.mime,
+                fileSize=_.fileSize,
+                metadata=None,
+                createdAt=_.createdAt,
+                updatedAt=_.updatedAt,
+            )
+            for _ in assets
+            if kind == 'ALL' or _.kind == kind
+        ]
+
+    ##############################################
+
+    def asset_path(self, asset: _Asset) -> str:
+        parts = [asset.filename]
+        folder_id = asset.folderId
+        while folder_id:
+            folder_id, name = self._folders[folder_id]
+            parts.append(name)
+        return '/'.join(reversed(parts))
+
+    def asset_data(self, path: str) -> tuple[_Asset, bytes] | None:
+        """Return the asset at `path` and its data"""
+        with self._lock:
+            if self._asset_paths is None:
+                self._asset_paths = {self.asset_path(_): _ for _ in self._assets.values()}
+            asset = self._asset_paths.get(path)
+        if asset is None:
+            return None
+        if asset.data is not None:
+            return asset, asset.data
+        return asset, random.Random(f'{self._seed}-asset-{asset.id}').randbytes(asset.fileSize)
+
+    def upload(self, folder_id: int, filename: str, data: bytes, mime: str) -> None:
+        """Add or replace an asset"""
+        with self._lock:
+            if folder_id and folder_id not in self._folders:
+                raise ValueError(f'Invalid folder {folder_id}')
+            ext = PurePosixPath(filename).suffix
+            date = _now()
+            for asset in self._assets.values():
+                if asset.folderId == folder_id and asset.filename == filename:
+                    asset.data = data
+                    asset.fileSize = len(data)
+                    asset.mime = mime
+                    asset.updatedAt = date
+                    return
+            id = max(self._assets, default=0) + 1
+            kind = 'IMAGE' if mime.startswith('image/') else 'BINARY'
+            self._assets[id] = _Asset(id, folder_id, filename, ext, kind, mime, len(data), date, date, data)
+            self._asset_paths = None
+
+    ############################################################################
+    #
+    # Mutation resolvers
+    #
+
+    def mutation_root(self) -> dict:
+        return {
+            'pages': {
+                'create': self._create,
+                'update': self._update,
+                'move': self._move,
+            },
+        }
+
+    ##############################################
+
+    def _new_version(self, page: _Page, action: str, action_type: str) -> _State:
+        """Save the current state as a version and return the new state"""
+        state = page.state
+        self._version_id += 1
+        version = _State(**state.__dict__)
+        version.versionId = self._version_id
+        version.action = action
+        version.actionType = action_type
+        page.versions.append(version)
+        new_state = _State(**state.__dict__)
+        new_state.date = _now()
+        page.state = new_state
+        return new_state
+
+    ##############################################
+
+    def _create(
+            self,
+            content: str,
+            description: str,
+            editor: str,
+            isPublished: bool,
+            isPrivate: bool,
+            locale: str,
+            path: str,
+            tags: list[str],
+            title: str,
+            publishEndDate: str = None,
+            publishStartDate: str = None,
+            scriptCss: str = None,
+            scriptJs: str = None,
+    ) -> dict:
+        with self._lock:
+            if (locale, path) in self._by_path:
+                return dict(
+                    responseResult=_response(False, 'Cannot create this page because an entry already exists at the same path.', 6002),
+                    page=None,
+                )
+            date = _now()
+            state = _State(
+                path=path,
+                locale=locale,
+                title=title,
+                description=description,
+                tags=list(tags or []),
+                content=content,
+                generation=0,
+                date=date,
+                isPublished=isPublished,
+                isPrivate=isPrivate,
+                contentType=editor,
+            )
+            page = _Page(id=max(self._pages, default=0) + 1, createdAt=date, state=state)
+            self._pages[page.id] = page
+            self._by_path[(locale, path)] = page.id
+            self._tree = None
+            return dict(responseResult=_response(), page=self._page_object(page))
+
+    def _update(
+            self,
+            id: int,
+            content: str = None,
+            description: str = None,
+            editor: str = None,
+            isPrivate: bool = None,
+            isPublished: bool = None,
+            locale: str = None,
+            path: str = None,
+            tags: list[str] = None,
+            title: str = None,
+            publishEndDate: str = None,
+            publishStartDate: str = None,
+            scriptCss: str = None,
+            scriptJs: str = None,
+    ) -> dict:
+        with self._lock:
+            page = self._page(id)
+            state = self._new_version(page, 'updated', 'edit')
+            for name, value in (
+                    ('content', content),
+                    ('description', description),
+                    ('isPrivate', isPrivate),
+                    ('isPublished', isPublished),
+                    ('tags', tags),
+                    ('title', title),
+            ):
+                if value is not None:
+                    setattr(state, name, value)
+            return dict(responseResult=_response(), page=self._page_object(page))
+
+    def _move(self, id: int, destinationPath: str, destinationLocale: str) -> dict:
+        with self._lock:
+            page = self._page(id)
+            old_key = (page.state.locale, page.state.path)
+            new_key = (destinationLocale, destinationPath)
+            if new_key in self._by_path:
+                return dict(responseResult=_response(False, 'Destination page path already exists.', 6003))
+            content = self.content(page.id, page.state)
+            state = self._new_version(page, 'moved', 'moved')
+            version = page.versions[-1]
+            version.valueBefore = page.state.path
+            version.valueAfter = destinationPath
+            state.path = destinationPath
+            state.locale = destinationLocale
+            state.content = content
+            del self._by_path[old_key]
+            self._by_path[new_key] = page.id
+            self._tree = None
+            return dict(responseResult=_response())
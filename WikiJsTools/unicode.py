@@ -6,20 +6,31 @@
 #
 ####################################################################################################
 
-__all__ = ['usorted']
+__all__ = ['usorted', 'usort_key']
 
 ####################################################################################################
 
-# To sort correctly latin and unicode
-from icu import Collator, Locale
+from functools import cache
 
-# Fixme:
-collator = Collator.createInstance(Locale('fr_FR'))
+####################################################################################################
+
+@cache
+def _collator():
+    # To sort correctly latin and unicode
+    # ICU is loaded on first use, it is slow to import
+    from icu import Collator, Locale
+    # Fixme:
+    return Collator.createInstance(Locale('fr_FR'))
 
 ####################################################################################################
 
 def usorted(iter: list, key: str = None) -> list:
+    get_sort_key = _collator().getSortKey
     if key is not None:
-        return sorted(iter, key=lambda _: collator.getSortKey(getattr(_, key)))
+        return sorted(iter, key=lambda _: get_sort_key(getattr(_, key)))
     else:
-        return sorted(iter, key=collator.getSortKey)
+        return sorted(iter, key=get_sort_key)
+
+
+def usort_key(value: str) -> bytes:
+    return _collator().getSortKey(value)
@@ -0,0 +1,80 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Microbenchmark: list 50k pages as Page dataclasses vs PageListItem records
+
+Run with ``python benchmarks/page_list_item.py [number_of_pages]``
+"""
+
+####################################################################################################
+
+from time import perf_counter
+import sys
+import tracemalloc
+
+from WikiJsTools.WikiJsApi import Page, PageListItem
+
+####################################################################################################
+
+NUMBER_OF_PAGES = 50_000
+
+####################################################################################################
+
+def make_rows(number_of_pages: int) -> list[dict]:
+    return [
+        dict(
+            id=i,
+            path=f'folder{i % 100}/sub{i % 7}/page-{i}',
+            locale='fr',
+            title=f'Page {i}',
+            description='',
+            contentType='markdown',
+            isPublished=True,
+            isPrivate=False,
+            privateNS=None,
+            createdAt='2024-01-01T10:00:00.000Z',
+            updatedAt=f'2024-{1 + i % 12:02}-{1 + i % 28:02}T10:00:00.000Z',
+            tags=['tag1', 'tag2'],
+        )
+        for i in range(number_of_pages)
+    ]
+
+####################################################################################################
+
+def bench(name: str, cls, rows: list[dict]) -> None:
+    tracemalloc.start()
+    start = perf_counter()
+    pages = [cls(None, **_) for _ in rows]
+    build_time = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # what bulk consumers read: build_page_tree, movep, check, with_path, last
+    start = perf_counter()
+    for _ in range(3):
+        for page in pages:
+            page.split_path
+            page.path_str.startswith('folder1')
+            page.updated_at
+    read_time = perf_counter() - start
+
+    print(f'{name:15} build {build_time*1000:8.1f} ms   read x3 {read_time*1000:8.1f} ms   peak {peak/2**20:6.1f} MB')
+
+####################################################################################################
+
+def main() -> None:
+    number_of_pages = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_PAGES
+    rows = make_rows(number_of_pages)
+    print(f'{number_of_pages} pages')
+    bench('Page', Page, rows)
+    bench('PageListItem', PageListItem, rows)
+
+####################################################################################################
+
+if __name__ == '__main__':
+    main()
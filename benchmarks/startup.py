@@ -0,0 +1,160 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Startup time of the entry points
+
+The entry points are run with ``-X importtime`` for ``--help`` and for a one-shot command sent to
+a daemon serving a stand-in server.  The script fails when a startup exceeds its time budget, or
+when a heavy module is imported although the entry point doesn't need it.
+
+Run with ``python benchmarks/startup.py [--repeat N] [--top N]``.
+"""
+
+####################################################################################################
+
+from pathlib import Path
+from statistics import median
+from time import perf_counter, sleep
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from WikiJsTools.standin import StandInServer
+from WikiJsTools.synthetic import SyntheticWiki
+
+####################################################################################################
+
+BIN_PATH = Path(__file__).resolve().parents[1].joinpath('bin')
+
+REPEAT = 5
+DAEMON_TIMEOUT = 60   # s
+
+# budget of the wall time in ms, the interpreter startup included
+BUDGETS = {
+    'wikijs-cli --help': 150,
+    'wikijs-fuse --help': 150,
+    'wikijs-cli -c': 200,
+}
+
+# modules loaded on first use
+HEAVY_MODULES = ('prompt_toolkit', 'requests', 'icu', 'yaml', 'dateutil', 'fuse')
+
+FORBIDDEN_MODULES = {
+    'wikijs-cli --help': HEAVY_MODULES,
+    'wikijs-fuse --help': HEAVY_MODULES,
+    # the output is piped, thus printed without style
+    'wikijs-cli -c': HEAVY_MODULES,
+}
+
+####################################################################################################
+
+_IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def parse_import_time(stderr: str) -> dict[str, tuple[int, int]]:
+    """Return the cumulative time in us and the nesting level of the imported modules"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if match is not None:
+            _, cumulative, indent, name = match.groups()
+            modules[name] = (int(cumulative), (len(indent) - 1) // 2)
+    return modules
+
+def run(args: list[str], repeat: int) -> tuple[list[float], dict]:
+    timings = []
+    modules = None
+    for _ in range(repeat):
+        start = perf_counter()
+        _ = subprocess.run(
+            [sys.executable, '-X', 'importtime', *args],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        )
+        timings.append(perf_counter() - start)
+        if _.returncode:
+            raise NameError(f"{' '.join(args)} failed{os.linesep}{_.stderr}")
+        modules = parse_import_time(_.stderr)
+    return timings, modules
+
+####################################################################################################
+
+class Daemon:
+
+    """A daemon serving a stand-in server"""
+
+    ##############################################
+
+    def __init__(self, tmp_path: Path) -> None:
+        self.server = StandInServer(SyntheticWiki(pages=1000)).start()
+        config_path = tmp_path.joinpath('config.yaml')
+        config_path.write_text(f'API_URL: {self.server.url}\nAPI_KEY: startup\n')
+        self.socket_path = tmp_path.joinpath('daemon.sock')
+        self._process = subprocess.Popen(
+            [sys.executable, BIN_PATH.joinpath('wikijs-cli'), '--config', config_path, '--socket', self.socket_path, '--daemon'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        start = perf_counter()
+        while not self.socket_path.exists():
+            if self._process.poll() is not None or perf_counter() - start > DAEMON_TIMEOUT:
+                self.close()
+                raise NameError('The daemon failed to start')
+            sleep(.1)
+
+    def close(self) -> None:
+        if self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+        self.server.stop()
+
+####################################################################################################
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Startup time of the entry points')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--top', type=int, default=5, help='number of the slowest imports shown')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='wikijs-startup-') as tmp_path:
+        daemon = Daemon(Path(tmp_path))
+        try:
+            cases = {
+                'wikijs-cli --help': [BIN_PATH.joinpath('wikijs-cli'), '--help'],
+                'wikijs-fuse --help': [BIN_PATH.joinpath('wikijs-fuse'), '--help'],
+                'wikijs-cli -c': [BIN_PATH.joinpath('wikijs-cli'), '--socket', daemon.socket_path, '-c', 'cwd'],
+            }
+            for name, case_args in cases.items():
+                timings, modules = run([str(_) for _ in case_args], args.repeat)
+                time_ms = median(timings) * 1000
+                budget = BUDGETS[name]
+                line = f'{name:24} {time_ms:8.1f} ms  budget {budget} ms'
+                if time_ms > budget:
+                    line += '  OVER BUDGET'
+                    failures.append(name)
+                print(line)
+                for module in FORBIDDEN_MODULES[name]:
+                    if module in modules:
+                        print(f'  imports {module}')
+                        failures.append(f'{name} imports {module}')
+                top_level = [(time, _) for _, (time, level) in modules.items() if level == 0]
+                for time, module in sorted(top_level, reverse=True)[:args.top]:
+                    print(f'  {time / 1000:8.1f} ms  {module}')
+        finally:
+            daemon.close()
+
+    if failures:
+        print(f"{len(failures)} failures: {', '.join(failures)}")
+        return 1
+    return 0
+
+####################################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,460 @@
+####################################################################################################
+#
+# wikijs-cli - A CLI for Wiki.js
+# Copyright (C) 2025 Fabrice SALVAIRE
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+####################################################################################################
+
+"""Benchmark suite of the hot paths
+
+The benchmarks run against synthetic wikis served by the stand-in server, at several scales.  The
+results are appended to a JSON history and compared to the previous run, a benchmark slower than
+the threshold is reported as a regression.
+
+Run with ``python benchmarks/suite.py [--scale small medium large] [--filter REGEX]``, see
+``--help``.
+"""
+
+####################################################################################################
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from WikiJsTools import query as Q
+from WikiJsTools import sync
+from WikiJsTools.Cli import Cli
+from WikiJsTools.WikiJsApi import WikiJsApi, Page
+from WikiJsTools.bulk import fetch_pages
+from WikiJsTools.diff import unified_diff
+from WikiJsTools.node import Node
+from WikiJsTools.standin import StandInServer
+from WikiJsTools.synthetic import SyntheticWiki
+from WikiJsTools.unicode import usorted
+
+####################################################################################################
+
+SCALES = dict(small=100, medium=1000, large=5000)   # number of pages
+VERSIONS = 3   # per page
+REPEAT = 5
+THRESHOLD = .10   # relative slowdown reported as a regression
+HISTORY_PATH = Path(__file__).parent.joinpath('results.json')
+
+####################################################################################################
+
+BENCHMARKS = {}
+
+def benchmark(name: str, scaled: bool = True, max_pages: int = None, repeat: int = None):
+    """Register a benchmark
+
+    The function takes a `Context` and returns the function to time.  An unscaled benchmark runs
+    once, `max_pages` limits the size of the wiki for the slow benchmarks.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = dict(func=func, scaled=scaled, max_pages=max_pages, repeat=repeat)
+        return func
+    return decorator
+
+class Skip(Exception):
+    pass
+
+####################################################################################################
+
+class Context:
+
+    """A synthetic wiki served by a stand-in server, the data are loaded on demand"""
+
+    ##############################################
+
+    def __init__(self, pages: int, tmp_path: Path) -> None:
+        self.number_of_pages = pages
+        self.wiki = SyntheticWiki(pages=pages, versions=VERSIONS, assets=max(1, pages // 10))
+        self.server = StandInServer(self.wiki).start()
+        self._tmp_path = tmp_path
+        self._counter = 0
+        self._items = None
+        self._pages = None
+        self.api = self.new_api()
+
+    def close(self) -> None:
+        self.server.stop()
+
+    ##############################################
+
+    def new_api(self) -> WikiJsApi:
+        """Return an api with empty caches"""
+        return WikiJsApi(self.server.url, 'benchmark')
+
+    def new_path(self, name: str) -> Path:
+        """Return a path that doesn't exist"""
+        self._counter += 1
+        return self._tmp_path.joinpath(f'{name}-{self.number_of_pages}-{self._counter}')
+
+    ##############################################
+
+    @property
+    def items(self) -> list:
+        if self._items is None:
+            self._items = list(self.api.list_pages())
+        return self._items
+
+    @property
+    def paths(self) -> list[str]:
+        return [_.path_str for _ in self.items]
+
+    @property
+    def pages(self) -> list[Page]:
+        """The pages with their metadata and their content"""
+        if self._pages is None:
+            self._pages = list(fetch_pages(self.api, self.items))
+        return self._pages
+
+####################################################################################################
+
+@contextmanager
+def quiet():
+    """Mute the print and printc calls of the timed code, and the output of the subprocesses"""
+    modules = [
+        _ for name, _ in list(sys.modules.items())
+        if name.startswith('WikiJsTools') and hasattr(_, 'printc')
+    ]
+    printcs = [_.printc for _ in modules]
+    for _ in modules:
+        _.printc = lambda *args, **kwargs: None
+    sys.stdout.flush()
+    stdout_fd = os.dup(1)
+    try:
+        with open(os.devnull, 'w') as fh, redirect_stdout(fh):
+            os.dup2(fh.fileno(), 1)
+            yield
+    finally:
+        os.dup2(stdout_fd, 1)
+        os.close(stdout_fd)
+        for module, printc in zip(modules, printcs):
+            module.printc = printc
+
+####################################################################################################
+#
+# Benchmarks
+#
+
+@benchmark('query.clean_query', scaled=False)
+def _(ctx: Context):
+    queries = [Q.CREATE_PAGE, Q.UPDATE_PAGE, Q.PAGE_VERSION, Q.PAGE('full', True), Q.PAGES_BY_PATH(16, 'metadata', True)]
+    def run():
+        for _ in range(200):
+            for query in queries:
+                Q.clean_query(query)
+    return run
+
+##############################################
+
+def build_node_tree(paths: list[str]) -> Node:
+    # as WikiJsApi.build_page_tree
+    root = Node()
+    for path in paths:
+        parent = root
+        for _ in path.split('/'):
+            try:
+                node = parent[_]
+            except KeyError:
+                node = Node(_)
+                parent.add_child(node)
+            parent = node
+    return root
+
+@benchmark('node.build')
+def _(ctx: Context):
+    paths = ctx.paths
+    return lambda: build_node_tree(paths)
+
+@benchmark('node.find')
+def _(ctx: Context):
+    paths = ctx.paths
+    root = build_node_tree(paths)
+    def run():
+        for path in paths:
+            root.find(path)
+    return run
+
+@benchmark('node.childs')
+def _(ctx: Context):
+    root = build_node_tree(ctx.paths)
+    def run():
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.folder_childs)
+            node.leaf_names
+    return run
+
+##############################################
+
+@benchmark('unicode.usorted')
+def _(ctx: Context):
+    items = ctx.items
+    return lambda: usorted(items, 'title')
+
+##############################################
+
+@benchmark('page.export')
+def _(ctx: Context):
+    pages = ctx.pages
+    def run():
+        for page in pages:
+            page.export()
+    return run
+
+@benchmark('page.import')
+def _(ctx: Context):
+    api = ctx.api
+    texts = [_.export() for _ in ctx.pages]
+    def run():
+        for text in texts:
+            Page.import_(text, api)
+    return run
+
+##############################################
+
+DIFF_LINES = 100_000
+DIFF_EDITS = 1000
+
+def _edited(lines: list[str], pool: list[str]) -> list[str]:
+    """Return a copy having DIFF_EDITS random replacements, insertions and deletions"""
+    rng = random.Random(0)
+    lines = list(lines)
+    for _ in range(DIFF_EDITS):
+        i = rng.randrange(len(lines))
+        match rng.randrange(3):
+            case 0:
+                lines[i] = rng.choice(pool)
+            case 1:
+                lines.insert(i, rng.choice(pool))
+            case 2:
+                del lines[i]
+    return lines
+
+@benchmark('diff.scattered', scaled=False)
+def _(ctx: Context):
+    # each line occurs about 20 times
+    pool = [f'line {_} of the page' for _ in range(DIFF_LINES // 20)]
+    rng = random.Random(1)
+    a = [rng.choice(pool) for _ in range(DIFF_LINES)]
+    b = _edited(a, pool)
+    return lambda: list(unified_diff(a, b))
+
+@benchmark('diff.table', scaled=False)
+def _(ctx: Context):
+    # few distinct rows, thus no unique line
+    pool = [f'| {_} | x | y |' for _ in range(20)] + ['']
+    rng = random.Random(1)
+    a = [rng.choice(pool) for _ in range(DIFF_LINES)]
+    b = _edited(a, pool)
+    return lambda: list(unified_diff(a, b))
+
+##############################################
+
+@benchmark('check.links')
+def _(ctx: Context):
+    page_paths = ctx.paths
+    page_path_set = set(page_paths)
+    contents = [_.content for _ in ctx.pages]
+    def run():
+        for content in contents:
+            Cli._dead_links(content, page_paths, page_path_set)
+    return run
+
+##############################################
+
+@benchmark('api.build_page_tree')
+def _(ctx: Context):
+    api = ctx.api
+    return lambda: api.build_page_tree(None)
+
+##############################################
+
+@benchmark('sync.sync', max_pages=1000, repeat=3)
+def _(ctx: Context):
+    def run():
+        sync.sync(ctx.new_api(), ctx.new_path('sync'))
+    return run
+
+@benchmark('sync.git_sync', max_pages=100, repeat=1)
+def _(ctx: Context):
+    if shutil.which('git') is None:
+        raise Skip('git is not installed')
+    for _ in ('AUTHOR', 'COMMITTER'):
+        os.environ.setdefault(f'GIT_{_}_NAME', 'benchmark')
+        os.environ.setdefault(f'GIT_{_}_EMAIL', 'benchmark@localhost')
+    # silence the hint of git init
+    os.environ.setdefault('GIT_CONFIG_COUNT', '1')
+    os.environ.setdefault('GIT_CONFIG_KEY_0', 'init.defaultBranch')
+    os.environ.setdefault('GIT_CONFIG_VALUE_0', 'master')
+    def run():
+        sync.git_sync(ctx.new_api(), ctx.new_path('git_sync'))
+    return run
+
+##############################################
+
+def _wikijs_fuse(ctx: Context):
+    try:
+        from WikiJsTools.fuse import WikiJsFuse
+    except (ImportError, OSError) as e:
+        raise Skip(f'fuse is not available: {e}')
+    return WikiJsFuse(ctx.new_api(), prefetch_depth=0)
+
+@benchmark('fuse.getattr', max_pages=1000)
+def _(ctx: Context):
+    _wikijs_fuse(ctx)
+    paths = ['/' + _ for _ in ctx.paths]
+    def run():
+        # cold caches
+        wfuse = _wikijs_fuse(ctx)
+        for path in paths:
+            wfuse.getattr(path)
+    return run
+
+@benchmark('fuse.read', max_pages=1000)
+def _(ctx: Context):
+    _wikijs_fuse(ctx)
+    paths = ['/' + _ for _ in ctx.paths]
+    def run():
+        wfuse = _wikijs_fuse(ctx)
+        for path in paths:
+            fd = wfuse.open(path, os.O_RDONLY)
+            wfuse.read(path, 128 * 1024, 0, fd)
+            wfuse.release(path, fd)
+    return run
+
+####################################################################################################
+#
+# Runner
+#
+
+def time_it(run, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        with quiet():
+            start = perf_counter()
+            run()
+            timings.append(perf_counter() - start)
+    return timings
+
+##############################################
+
+def git_commit() -> str | None:
+    try:
+        _ = subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+        )
+        return _.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path: Path) -> list[dict]:
+    if path.exists():
+        return json.loads(path.read_text(encoding='utf8'))
+    return []
+
+def previous_result(history: list[dict], key: str) -> dict | None:
+    for run in reversed(history):
+        _ = run['results'].get(key)
+        if _ is not None:
+            return _
+    return None
+
+##############################################
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark suite of the hot paths')
+    parser.add_argument('--scale', nargs='+', choices=SCALES, default=['small', 'medium'])
+    parser.add_argument('--filter', default='', help='run the benchmarks matching this regular expression')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='relative slowdown reported as a regression')
+    parser.add_argument('--history', type=Path, default=HISTORY_PATH)
+    parser.add_argument('--no-save', action='store_true', help="don't append the results to the history")
+    parser.add_argument('--list', action='store_true', help='list the benchmarks')
+    args = parser.parse_args()
+
+    names = [_ for _ in BENCHMARKS if re.search(args.filter, _)]
+    if args.list:
+        for _ in names:
+            print(_)
+        return 0
+
+    history = load_history(args.history)
+    results = {}
+    regressions = []
+    contexts = {}
+    tmp_path = Path(tempfile.mkdtemp(prefix='wikijs-benchmark-'))
+    print(f"{'benchmark':24} {'pages':>6} {'min ms':>10} {'median ms':>10} {'previous':>10} {'change':>8}")
+    try:
+        for name in names:
+            spec = BENCHMARKS[name]
+            scales = args.scale if spec['scaled'] else args.scale[:1]
+            done = set()
+            for scale in scales:
+                pages = SCALES[scale]
+                if spec['max_pages'] is not None:
+                    pages = min(pages, spec['max_pages'])
+                if pages in done:
+                    continue
+                done.add(pages)
+                if pages not in contexts:
+                    contexts[pages] = Context(pages, tmp_path)
+                try:
+                    with quiet():
+                        run = spec['func'](contexts[pages])
+                except Skip as e:
+                    print(f'{name:24} skipped: {e}')
+                    break
+                timings = time_it(run, spec['repeat'] or args.repeat)
+                key = f'{name}[{pages}]' if spec['scaled'] else name
+                result = dict(min=min(timings), median=median(timings), repeat=len(timings))
+                results[key] = result
+                previous = previous_result(history, key)
+                line = f"{name:24} {pages if spec['scaled'] else '':>6} {result['min'] * 1000:10.2f} {result['median'] * 1000:10.2f}"
+                if previous is not None:
+                    change = result['min'] / previous['min'] - 1
+                    line += f" {previous['min'] * 1000:10.2f} {change:+8.1%}"
+                    if change > args.threshold:
+                        line += '  REGRESSION'
+                        regressions.append(key)
+                print(line, flush=True)
+    finally:
+        for _ in contexts.values():
+            _.close()
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    if not args.no_save and results:
+        history.append(dict(
+            date=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            commit=git_commit(),
+            python=platform.python_version(),
+            machine=platform.machine(),
+            results=results,
+        ))
+        args.history.write_text(json.dumps(history, indent=2), encoding='utf8')
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+####################################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())